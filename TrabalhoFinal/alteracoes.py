@@ -0,0 +1,11 @@
+_ouvintes = []
+
+def ao_alterar(ouvinte):
+    _ouvintes.append(ouvinte)
+    return ouvinte
+
+def notificar_alteracao(*tabelas):
+    # Chamado pelos routers depois do commit de uma escrita, com os nomes das
+    # tabelas afetadas.
+    for ouvinte in _ouvintes:
+        ouvinte(tabelas)
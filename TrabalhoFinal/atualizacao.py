@@ -0,0 +1,19 @@
+from enum import Enum
+
+# PATCH em um único comando: só as colunas enviadas no corpo entram no SET e a
+# linha atualizada volta pelo RETURNING, sem SELECT antes nem releitura depois.
+
+def campos_alterados(update, ignorar=()):
+    return {
+        coluna: valor.value if isinstance(valor, Enum) else valor
+        for coluna, valor in update.dict(exclude_unset=True).items()
+        if coluna not in ignorar
+    }
+
+def sql_atualizar(tabela, campos, chave, retorno):
+    sql = (
+        f"UPDATE {tabela} SET " + ", ".join(f"{coluna}=%s" for coluna in campos)
+        + " WHERE " + " AND ".join(f"{coluna}=%s" for coluna in chave)
+        + " RETURNING " + ", ".join(retorno)
+    )
+    return sql, list(campos.values()) + list(chave.values())
@@ -0,0 +1,116 @@
+"""Compara o caminho síncrono (psycopg2 + threadpool) com o assíncrono (DB_MODE=async).
+
+Sobe a API duas vezes com uvicorn (um worker cada), dispara as mesmas leituras
+com a concorrência pedida e imprime throughput e latências por modo.
+
+    python benchmarks/bench_async.py --concorrencia 200 --requisicoes 5000
+
+Requer uma base SistemaClinico populada (DATABASE_URL) e os pacotes httpx e uvicorn.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ROTAS = [
+    "/agendamentos/?limit=50",
+    "/consultas/?limit=50",
+    "/pacientes/?limit=50",
+    "/medicos/?limit=50",
+    "/relatorios/agendamentos-por-status",
+]
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    valores = sorted(valores)
+    k = min(len(valores) - 1, int(round(p / 100 * (len(valores) - 1))))
+    return valores[k]
+
+async def esperar_api(base_url, timeout=30):
+    limite = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < limite:
+            try:
+                await client.get(base_url + "/admin/pool")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError("API não respondeu a tempo.")
+
+async def carga(base_url, requisicoes, concorrencia):
+    latencias = []
+    erros = 0
+    fila = asyncio.Queue()
+    for i in range(requisicoes):
+        fila.put_nowait(ROTAS[i % len(ROTAS)])
+
+    async def trabalhador(client):
+        nonlocal erros
+        while True:
+            try:
+                rota = fila.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            inicio = time.perf_counter()
+            try:
+                resposta = await client.get(base_url + rota)
+                if resposta.status_code >= 400:
+                    erros += 1
+            except httpx.HTTPError:
+                erros += 1
+            latencias.append(time.perf_counter() - inicio)
+
+    limites = httpx.Limits(max_connections=concorrencia, max_keepalive_connections=concorrencia)
+    async with httpx.AsyncClient(limits=limites, timeout=60) as client:
+        inicio = time.perf_counter()
+        await asyncio.gather(*(trabalhador(client) for _ in range(concorrencia)))
+        duracao = time.perf_counter() - inicio
+
+    return {
+        "requisicoes": requisicoes,
+        "erros": erros,
+        "duracao_s": round(duracao, 3),
+        "req_s": round(requisicoes / duracao, 1),
+        "p50_ms": round(percentil(latencias, 50) * 1000, 2),
+        "p95_ms": round(percentil(latencias, 95) * 1000, 2),
+        "p99_ms": round(percentil(latencias, 99) * 1000, 2),
+        "media_ms": round(statistics.mean(latencias) * 1000, 2) if latencias else 0.0,
+    }
+
+def executar_modo(modo, args):
+    env = dict(os.environ, DB_MODE=modo, MV_REFRESH_ENABLED="0", REPORT_CACHE_TTL="0")
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.porta), "--log-level", "warning"],
+        cwd=APP_DIR,
+        env=env
+    )
+    base_url = f"http://127.0.0.1:{args.porta}"
+    try:
+        asyncio.run(esperar_api(base_url))
+        asyncio.run(carga(base_url, min(200, args.requisicoes), args.concorrencia))
+        return asyncio.run(carga(base_url, args.requisicoes, args.concorrencia))
+    finally:
+        processo.terminate()
+        processo.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concorrencia", type=int, default=100)
+    parser.add_argument("--requisicoes", type=int, default=2000)
+    parser.add_argument("--porta", type=int, default=8765)
+    args = parser.parse_args()
+
+    for modo in ("sync", "async"):
+        resultado = executar_modo(modo, args)
+        print(modo.ljust(6), " ".join(f"{k}={v}" for k, v in resultado.items()))
+
+if __name__ == "__main__":
+    main()
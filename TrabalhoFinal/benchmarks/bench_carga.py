@@ -0,0 +1,244 @@
+"""Teste de carga ponta a ponta da API com latências por rota.
+
+Sobe `main:app` com uvicorn (ou usa --base-url de uma API já no ar), popula a
+base pelos endpoints de lote, roda uma mistura de leituras da agenda, consultas
+de paciente, criação de agendamentos e o painel de relatórios com a
+concorrência pedida e imprime throughput e p50/p95/p99 por rota. O resultado
+vai para um JSON que pode ser comparado com o de outra versão:
+
+    python benchmarks/bench_carga.py --concorrencia 50 --duracao 60 --saida atual.json
+    python benchmarks/bench_carga.py --comparar base.json --saida atual.json
+
+Requer uma base SistemaClinico acessível (DATABASE_URL) e os pacotes httpx e uvicorn.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+import httpx
+
+from bench_async import APP_DIR, esperar_api, percentil
+
+AGENDA_INICIO = datetime(2025, 1, 6, 8, 0)
+AGENDA_DIAS = 90
+LOTE = 5000
+
+MIX_PADRAO = "agenda=35,calendario=10,paciente=25,busca=10,criacao=10,dashboard=10"
+
+
+def gerar_pacientes(n, rng, prefixo):
+    return [
+        {
+            "nome": f"Carga Paciente {i}",
+            "data_nascimento": (date(1940, 1, 1) + timedelta(days=rng.randrange(30000))).isoformat(),
+            "sexo": rng.choice("FMO"),
+            "email": f"carga{prefixo}.{i}@exemplo.com",
+            "cpf": f"{prefixo}{i:08d}",
+        }
+        for i in range(n)
+    ]
+
+def horario_aleatorio(rng):
+    return AGENDA_INICIO + timedelta(days=rng.randrange(AGENDA_DIAS), minutes=30 * rng.randrange(20))
+
+async def enviar_lotes(client, rota, itens):
+    ids = []
+    for i in range(0, len(itens), LOTE):
+        resposta = await client.post(rota, json=itens[i:i + LOTE])
+        resposta.raise_for_status()
+        ids += [c["id"] for c in resposta.json()["criados"]]
+    return ids
+
+async def popular(base_url, args, rng):
+    prefixo = f"{int(time.time()) % 1000:03d}"
+    async with httpx.AsyncClient(base_url=base_url, timeout=300) as client:
+        ids = await enviar_lotes(client, "/pacientes/bulk", gerar_pacientes(args.pacientes, rng, prefixo))
+        if not ids:
+            raise RuntimeError("Nenhum paciente criado na preparação da base.")
+        agendamentos = [
+            {"id_paciente": id_paciente, "data": horario_aleatorio(rng).isoformat(), "observacoes": "carga"}
+            for id_paciente in ids
+            for _ in range(args.agendamentos_por_paciente)
+        ]
+        await enviar_lotes(client, "/agendamentos/bulk", agendamentos)
+    return {"pacientes": ids}
+
+
+def op_agenda(rng, ctx):
+    inicio = AGENDA_INICIO + timedelta(days=rng.randrange(AGENDA_DIAS))
+    fim = inicio + timedelta(days=7)
+    return "GET /agendamentos/?inicio&fim", "GET", f"/agendamentos/?inicio={inicio.isoformat()}&fim={fim.isoformat()}&limit=50", None
+
+def op_calendario(rng, ctx):
+    inicio = AGENDA_INICIO + timedelta(days=rng.randrange(AGENDA_DIAS))
+    fim = inicio + timedelta(days=30)
+    return "GET /agendamentos/calendario", "GET", f"/agendamentos/calendario?inicio={inicio.isoformat()}&fim={fim.isoformat()}&incluir_horarios=false", None
+
+def op_paciente(rng, ctx):
+    return "GET /pacientes/{id}", "GET", f"/pacientes/{rng.choice(ctx['pacientes'])}", None
+
+def op_busca(rng, ctx):
+    return "GET /pacientes/search", "GET", f"/pacientes/search?q=Carga Paciente {rng.randrange(len(ctx['pacientes']))}", None
+
+def op_criacao(rng, ctx):
+    corpo = {"id_paciente": rng.choice(ctx["pacientes"]), "data": horario_aleatorio(rng).isoformat(), "observacoes": "carga"}
+    return "POST /agendamentos/", "POST", "/agendamentos/", corpo
+
+def op_dashboard(rng, ctx):
+    return "GET /relatorios/dashboard", "GET", "/relatorios/dashboard", None
+
+OPERACOES = {
+    "agenda": op_agenda,
+    "calendario": op_calendario,
+    "paciente": op_paciente,
+    "busca": op_busca,
+    "criacao": op_criacao,
+    "dashboard": op_dashboard,
+}
+
+def ler_mix(texto):
+    mix = {}
+    for parte in texto.split(","):
+        nome, _, peso = parte.partition("=")
+        if nome not in OPERACOES:
+            raise SystemExit(f"Operação desconhecida no --mix: {nome} (use {', '.join(OPERACOES)}).")
+        mix[nome] = float(peso)
+    return mix
+
+
+def resumir(latencias, erros, duracao):
+    return {
+        "requisicoes": len(latencias),
+        "erros": erros,
+        "req_s": round(len(latencias) / duracao, 1) if duracao else 0.0,
+        "p50_ms": round(percentil(latencias, 50) * 1000, 2),
+        "p95_ms": round(percentil(latencias, 95) * 1000, 2),
+        "p99_ms": round(percentil(latencias, 99) * 1000, 2),
+        "media_ms": round(statistics.mean(latencias) * 1000, 2) if latencias else 0.0,
+    }
+
+async def carga(base_url, ctx, mix, concorrencia, duracao, semente):
+    latencias = {}
+    erros = {}
+    nomes = list(mix)
+    pesos = [mix[n] for n in nomes]
+
+    async def trabalhador(client, indice):
+        rng = random.Random(semente * 1000 + indice)
+        while time.monotonic() < limite:
+            rota, metodo, url, corpo = OPERACOES[rng.choices(nomes, pesos)[0]](rng, ctx)
+            inicio = time.perf_counter()
+            try:
+                resposta = await client.request(metodo, url, json=corpo)
+                falhou = resposta.status_code >= 400
+            except httpx.HTTPError:
+                falhou = True
+            latencias.setdefault(rota, []).append(time.perf_counter() - inicio)
+            if falhou:
+                erros[rota] = erros.get(rota, 0) + 1
+
+    limites = httpx.Limits(max_connections=concorrencia, max_keepalive_connections=concorrencia)
+    async with httpx.AsyncClient(base_url=base_url, limits=limites, timeout=60) as client:
+        inicio = time.perf_counter()
+        limite = time.monotonic() + duracao
+        await asyncio.gather(*(trabalhador(client, i) for i in range(concorrencia)))
+        decorrido = time.perf_counter() - inicio
+
+    todas = [l for valores in latencias.values() for l in valores]
+    return {
+        "duracao_s": round(decorrido, 3),
+        "total": resumir(todas, sum(erros.values()), decorrido),
+        "rotas": {rota: resumir(valores, erros.get(rota, 0), decorrido) for rota, valores in sorted(latencias.items())},
+    }
+
+
+def versao_atual():
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], cwd=APP_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def comparar(anterior, atual):
+    print(f"\n{'rota':<32} {'req/s':>16} {'p50 ms':>18} {'p99 ms':>18}")
+    rotas = dict(atual["rotas"], TOTAL=atual["total"])
+    rotas_anteriores = dict(anterior["rotas"], TOTAL=anterior["total"])
+    for rota, r in rotas.items():
+        a = rotas_anteriores.get(rota)
+        if a is None:
+            continue
+        colunas = []
+        for chave in ("req_s", "p50_ms", "p99_ms"):
+            delta = (r[chave] - a[chave]) / a[chave] * 100 if a[chave] else 0.0
+            colunas.append(f"{a[chave]:>7} → {r[chave]:<7}{delta:+.0f}%")
+        print(f"{rota:<32} " + " ".join(colunas))
+
+def executar(args, base_url):
+    rng = random.Random(args.semente)
+    asyncio.run(esperar_api(base_url))
+    ctx = asyncio.run(popular(base_url, args, rng))
+    mix = ler_mix(args.mix)
+    if args.aquecimento > 0:
+        asyncio.run(carga(base_url, ctx, mix, args.concorrencia, args.aquecimento, args.semente + 1))
+    return asyncio.run(carga(base_url, ctx, mix, args.concorrencia, args.duracao, args.semente))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concorrencia", type=int, default=50)
+    parser.add_argument("--duracao", type=float, default=30, help="segundos de medição")
+    parser.add_argument("--aquecimento", type=float, default=5, help="segundos de carga antes da medição")
+    parser.add_argument("--pacientes", type=int, default=2000, help="pacientes criados na preparação")
+    parser.add_argument("--agendamentos-por-paciente", type=int, default=5)
+    parser.add_argument("--mix", default=MIX_PADRAO, help="pesos por operação: " + ", ".join(OPERACOES))
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--base-url", help="usa uma API já no ar em vez de subir uma")
+    parser.add_argument("--porta", type=int, default=8766)
+    parser.add_argument("--workers", type=int, default=1, help="workers do uvicorn")
+    parser.add_argument("--saida", help="arquivo JSON com o resultado")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para comparar")
+    args = parser.parse_args()
+
+    if args.base_url:
+        resultado = executar(args, args.base_url)
+    else:
+        processo = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.porta),
+             "--workers", str(args.workers), "--log-level", "warning"],
+            cwd=APP_DIR,
+            env=dict(os.environ, MV_REFRESH_ENABLED=os.getenv("MV_REFRESH_ENABLED", "0"))
+        )
+        try:
+            resultado = executar(args, f"http://127.0.0.1:{args.porta}")
+        finally:
+            processo.terminate()
+            processo.wait()
+
+    resultado = {
+        "versao": versao_atual(),
+        "executado_em": datetime.now().isoformat(timespec="seconds"),
+        "config": {k: v for k, v in vars(args).items() if k not in ("saida", "comparar")},
+        "ambiente": {k: os.environ[k] for k in ("DB_MODE", "JSON_FAST", "COMPRESSION", "DB_PREPARE", "DB_POOL_MAX") if k in os.environ},
+        **resultado,
+    }
+
+    print(f"{'rota':<32} " + " ".join(f"{k:>11}" for k in resultado["total"]))
+    for rota, r in dict(resultado["rotas"], TOTAL=resultado["total"]).items():
+        print(f"{rota:<32} " + " ".join(f"{v:>11}" for v in r.values()))
+
+    if args.comparar:
+        with open(args.comparar) as f:
+            comparar(json.load(f), resultado)
+    if args.saida:
+        with open(args.saida, "w") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Mede o custo de serializar listagens grandes e o tamanho no fio com compressão.
+
+Para páginas sintéticas de agendamentos, consultas e pacientes compara o caminho
+padrão (modelos pydantic + revalidação do response_model + dump_json, como o
+FastAPI faz) com o caminho JSON_FAST (dicts + orjson) e mostra os bytes sem
+compressão, com gzip e com brotli.
+
+    python benchmarks/bench_json.py --linhas 10000 --repeticoes 20
+
+Não precisa de banco. Requer orjson; brotli é opcional.
+"""
+import argparse
+import gzip
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["JSON_FAST"] = "1"
+
+import orjson
+from pydantic import TypeAdapter
+
+from crud_agendamento import agendamento_from_row, agendamento_dict_from_row
+from crud_clinica import consulta_from_row, consulta_dict_from_row
+from crud_paciente import paciente_response_from_row, paciente_dict_from_row
+from models import AgendamentoPage, ConsultaPage, PacientePage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+INICIO = datetime(2024, 1, 1, 8, 0)
+STATUS = ["Marcada", "Realizada", "Cancelada", "Ausente", "Remarcada"]
+
+def linhas_agendamento(n):
+    return [
+        (i, i % 5000 + 1, INICIO + timedelta(minutes=30 * i), "Retorno" if i % 3 else None, STATUS[i % 5])
+        for i in range(1, n + 1)
+    ]
+
+def linhas_consulta(n):
+    return [
+        (f"CRM{i % 300:05d}", i, i % 5000 + 1, INICIO + timedelta(minutes=30 * i), "Diagnóstico de rotina", None)
+        for i in range(1, n + 1)
+    ]
+
+def linhas_paciente(n):
+    return [
+        (
+            i, f"Paciente {i}", date(1950, 1, 1) + timedelta(days=i % 20000), "FMO"[i % 3],
+            f"paciente{i}@exemplo.com", f"{i:011d}",
+            [{"numero": f"1199{i:07d}", "tipo": "Celular"}, {"numero": f"113{i:07d}", "tipo": "Residencial"}][: i % 3]
+        )
+        for i in range(1, n + 1)
+    ]
+
+CASOS = [
+    ("agendamentos", linhas_agendamento, AgendamentoPage, agendamento_from_row, agendamento_dict_from_row),
+    ("consultas", linhas_consulta, ConsultaPage, consulta_from_row, consulta_dict_from_row),
+    ("pacientes", linhas_paciente, PacientePage, paciente_response_from_row, paciente_dict_from_row),
+]
+
+def medir(funcao, repeticoes):
+    funcao()
+    inicio = time.process_time()
+    for _ in range(repeticoes):
+        corpo = funcao()
+    return (time.process_time() - inicio) / repeticoes * 1000, corpo
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=10000)
+    parser.add_argument("--repeticoes", type=int, default=20)
+    args = parser.parse_args()
+
+    for nome, gerar, page_model, from_row, dict_from_row in CASOS:
+        rows = gerar(args.linhas)
+        adapter = TypeAdapter(page_model)
+
+        def padrao():
+            page = page_model(items=[from_row(r) for r in rows], next_cursor=None)
+            return adapter.dump_json(adapter.validate_python(page))
+
+        def rapido():
+            return orjson.dumps({"items": [dict_from_row(r) for r in rows], "next_cursor": None})
+
+        ms_padrao, corpo_padrao = medir(padrao, args.repeticoes)
+        ms_rapido, corpo_rapido = medir(rapido, args.repeticoes)
+        if orjson.loads(corpo_padrao) != orjson.loads(corpo_rapido):
+            raise SystemExit(f"{nome}: os dois caminhos produziram JSON diferente.")
+
+        tamanhos = {"bruto": len(corpo_rapido), "gzip": len(gzip.compress(corpo_rapido, 6))}
+        if brotli is not None:
+            tamanhos["br"] = len(brotli.compress(corpo_rapido, quality=4))
+        print(
+            f"{nome:<13} padrao={ms_padrao:.1f}ms rapido={ms_rapido:.1f}ms "
+            f"({ms_padrao / ms_rapido:.1f}x) " + " ".join(f"{k}={v}B" for k, v in tamanhos.items())
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+"""Gera uma massa de dados sintética e reprodutível para o SistemaClinico e carrega via COPY.
+
+Os pacientes são divididos em blocos; cada bloco gera, com um RNG derivado de
+(semente, bloco), os pacientes, telefones, agendamentos, consultas,
+encaminhamentos (com exames e consultas de retorno) e remarcações desses
+pacientes e os grava com COPY em uma transação própria. Os blocos rodam em
+paralelo (--jobs) e o resultado não depende da ordem em que terminam: com a
+mesma semente e o mesmo preset, a base gerada é a mesma.
+
+    python benchmarks/gerar_dados.py --preset 100k --limpar
+    python benchmarks/gerar_dados.py --preset 10m --jobs 8 --semente 7
+
+Sem --limpar os ids começam depois dos já existentes. Os ids de Encaminhamento e
+Remarca são derivados do id do agendamento de origem, então têm lacunas. O
+esquema vem das migrações (python migrar.py aplicar).
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import get_connection
+from views_materializadas import VIEWS
+
+PRESETS = {
+    "1k": {"agendamentos": 1_000, "pacientes": 300, "medicos": 20},
+    "100k": {"agendamentos": 100_000, "pacientes": 25_000, "medicos": 300},
+    "10m": {"agendamentos": 10_000_000, "pacientes": 2_000_000, "medicos": 10_000},
+}
+
+PACIENTES_POR_BLOCO = 5000
+HISTORICO_DIAS = 730
+FUTURO_DIAS = 90
+
+PRENOMES = [
+    "Ana", "Maria", "Juliana", "Fernanda", "Camila", "Beatriz", "Larissa", "Patrícia", "Aline", "Mariana",
+    "José", "João", "Carlos", "Paulo", "Lucas", "Pedro", "Rafael", "Gabriel", "Marcos", "Felipe",
+    "Antônio", "Luiz", "Bruno", "Rodrigo", "Gustavo", "Letícia", "Vitória", "Amanda", "Bruna", "Sofia",
+]
+SOBRENOMES = [
+    "Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves", "Pereira", "Lima", "Gomes",
+    "Costa", "Ribeiro", "Martins", "Carvalho", "Almeida", "Lopes", "Soares", "Fernandes", "Vieira", "Barbosa",
+    "Rocha", "Dias", "Nascimento", "Andrade", "Moreira", "Nunes", "Marques", "Machado", "Mendes", "Freitas",
+]
+DOMINIOS = ["gmail.com", "hotmail.com", "outlook.com", "yahoo.com.br", "uol.com.br"]
+ESPECIALIDADES = [
+    ("Clínica Geral", 30), ("Cardiologia", 10), ("Pediatria", 10), ("Ginecologia", 9), ("Ortopedia", 9),
+    ("Dermatologia", 8), ("Oftalmologia", 7), ("Psiquiatria", 6), ("Neurologia", 5), ("Endocrinologia", 6),
+]
+EXAMES = [
+    ("Hemograma completo", "Contagem de células sanguíneas"),
+    ("Glicemia em jejum", "Dosagem de glicose"),
+    ("Colesterol total e frações", "Perfil lipídico"),
+    ("TSH", "Hormônio tireoestimulante"),
+    ("Urina tipo I", "Exame de urina de rotina"),
+    ("Creatinina", "Função renal"),
+    ("Eletrocardiograma", "Atividade elétrica do coração"),
+    ("Ecocardiograma", "Ultrassom do coração"),
+    ("Raio-X de tórax", None),
+    ("Ultrassonografia abdominal", None),
+    ("Ressonância magnética", None),
+    ("Tomografia computadorizada", None),
+    ("Mamografia", None),
+    ("Densitometria óssea", None),
+    ("Teste ergométrico", "Esforço em esteira"),
+    ("Holter 24h", "Monitoramento cardíaco contínuo"),
+    ("Papanicolau", None),
+    ("PSA", "Antígeno prostático específico"),
+    ("Vitamina D", None),
+    ("Ferritina", None),
+]
+DIAGNOSTICOS = [
+    "Hipertensão arterial", "Diabetes tipo 2", "Infecção das vias aéreas superiores", "Lombalgia",
+    "Ansiedade", "Enxaqueca", "Dermatite", "Hipotireoidismo", "Gastrite", "Check-up sem alterações",
+    "Arritmia", "Conjuntivite", "Tendinite", "Rinite alérgica", "Dislipidemia",
+]
+OBSERVACOES = [None, None, None, "Primeira consulta", "Retorno", "Trazer exames anteriores", "Paciente em jejum"]
+MOTIVOS_REMARCA = ["Conflito de horário", "Médico indisponível", "Problema de saúde", "Viagem", "Pedido do paciente"]
+STATUS_PASSADO = [("Realizada", 70), ("Cancelada", 12), ("Ausente", 10), ("Remarcada", 8)]
+
+
+def escolher(rng, pesos):
+    return rng.choices([v for v, _ in pesos], [p for _, p in pesos])[0]
+
+def cpf(numero):
+    base = [int(d) for d in f"{numero % 10**9:09d}"]
+    for tamanho in (9, 10):
+        soma = sum(d * (tamanho + 1 - i) for i, d in enumerate(base[:tamanho]))
+        base.append(soma * 10 % 11 % 10)
+    return "".join(map(str, base))
+
+def sem_acentos(texto):
+    return unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode()
+
+def copiar(cursor, tabela, colunas, linhas):
+    if not linhas:
+        return
+    buffer = io.StringIO()
+    for linha in linhas:
+        buffer.write("\t".join(
+            "\\N" if v is None else str(v).replace("\\", "\\\\").replace("\t", " ").replace("\n", " ")
+            for v in linha
+        ))
+        buffer.write("\n")
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {tabela} ({', '.join(colunas)}) FROM STDIN", buffer)
+
+def contagens_bloco(semente, bloco, quantidade, media):
+    # Agendamentos por paciente; o coordenador usa isso para reservar os ids de cada bloco.
+    rng = random.Random(f"{semente}:contagem:{bloco}")
+    if media <= 1:
+        return [1] * quantidade
+    return [1 + int(rng.expovariate(1 / (media - 1))) for _ in range(quantidade)]
+
+
+def gerar_catalogo(cfg):
+    rng = random.Random(f"{cfg['semente']}:catalogo")
+    medicos = [
+        (
+            f"CRM{cfg['medico_base'] + i:07d}",
+            f"Dr(a). {rng.choice(PRENOMES)} {rng.choice(SOBRENOMES)}",
+            escolher(rng, ESPECIALIDADES),
+        )
+        for i in range(cfg["medicos"])
+    ]
+    exames = [(cfg["exame_base"] + i, nome, descricao) for i, (nome, descricao) in enumerate(EXAMES)]
+    return medicos, exames
+
+def carregar_catalogo(cfg):
+    medicos, exames = gerar_catalogo(cfg)
+    conn = get_connection(cfg["dsn"])
+    try:
+        cursor = conn.cursor()
+        copiar(cursor, "Medico", ["crm", "nome", "especialidade"], medicos)
+        copiar(cursor, "Exame", ["id_exame", "nome", "descricao"], exames)
+        conn.commit()
+    finally:
+        conn.close()
+    return {"Medico": len(medicos), "Exame": len(exames)}
+
+def gerar_bloco(cfg, bloco, primeiro_agendamento):
+    rng = random.Random(f"{cfg['semente']}:bloco:{bloco}")
+    inicio = bloco * PACIENTES_POR_BLOCO
+    quantidade = min(PACIENTES_POR_BLOCO, cfg["pacientes"] - inicio)
+    contagens = contagens_bloco(cfg["semente"], bloco, quantidade, cfg["media_agendamentos"])
+    medicos, exames = gerar_catalogo(cfg)
+    crms = [m[0] for m in medicos]
+    ids_exames = [e[0] for e in exames]
+    referencia = cfg["referencia"]
+
+    t = {nome: [] for nome in (
+        "Paciente", "Telefone_Paciente", "Agendamento", "Consulta", "Remarca",
+        "Encaminhamento", "Encaminhamento_Exame", "Encaminhamento_Consulta",
+    )}
+    id_agendamento = primeiro_agendamento
+
+    for i in range(quantidade):
+        id_paciente = cfg["paciente_base"] + inicio + i
+        prenome, sobrenome = rng.choice(PRENOMES), rng.choice(SOBRENOMES)
+        nascimento = date(1935, 1, 1) + timedelta(days=rng.randrange(32000))
+        email = f"{sem_acentos(prenome).lower()}.{sem_acentos(sobrenome).lower()}{id_paciente}@{rng.choice(DOMINIOS)}" if rng.random() < 0.8 else None
+        sexo = escolher(rng, [("F", 52), ("M", 46), ("O", 2)])
+        t["Paciente"].append((id_paciente, f"{prenome} {rng.choice(SOBRENOMES)} {sobrenome}", nascimento, sexo, email, cpf(id_paciente)))
+
+        numeros = set()
+        for n in range(escolher(rng, [(0, 10), (1, 55), (2, 30), (3, 5)])):
+            tipo = "Celular" if n == 0 or rng.random() < 0.6 else "Residencial"
+            numero = f"{rng.randint(11, 99)}{'9' if tipo == 'Celular' else '3'}{rng.randrange(10**7, 10**8)}"
+            if numero not in numeros:
+                numeros.add(numero)
+                t["Telefone_Paciente"].append((id_paciente, numero, tipo))
+
+        datas = sorted(
+            referencia + timedelta(days=rng.randrange(-HISTORICO_DIAS, FUTURO_DIAS), minutes=rng.randrange(7 * 60, 19 * 60, 30))
+            for _ in range(contagens[i])
+        )
+        ids = list(range(id_agendamento, id_agendamento + len(datas)))
+        id_agendamento += len(datas)
+
+        for k, (id_ag, data) in enumerate(zip(ids, datas)):
+            proximo = ids[k + 1] if k + 1 < len(ids) else None
+            if data >= referencia:
+                status = "Cancelada" if rng.random() < 0.05 else "Marcada"
+            else:
+                status = escolher(rng, STATUS_PASSADO)
+                if status == "Remarcada" and proximo is None:
+                    status = "Realizada"
+            t["Agendamento"].append((id_ag, id_paciente, data, rng.choice(OBSERVACOES), status))
+
+            if status == "Remarcada":
+                t["Remarca"].append((
+                    cfg["remarca_base"] + id_ag, id_ag, id_paciente, proximo, id_paciente,
+                    rng.choice(MOTIVOS_REMARCA), (data - timedelta(days=rng.randint(1, 10))).date(),
+                    rng.choice(["Paciente", "Clínica"]),
+                ))
+            if status != "Realizada":
+                continue
+
+            t["Consulta"].append((rng.choice(crms), id_ag, id_paciente, data, rng.choice(DIAGNOSTICOS), rng.choice(OBSERVACOES)))
+            if rng.random() >= 0.35:
+                continue
+            tipo = escolher(rng, [("Exame", 50), ("Consulta", 30), ("Ambos", 20)])
+            if proximo is None:
+                tipo = "Exame"
+            id_enc = cfg["encaminhamento_base"] + id_ag
+            t["Encaminhamento"].append((id_enc, id_ag, id_paciente, tipo, None))
+            if tipo in ("Exame", "Ambos"):
+                for id_exame in rng.sample(ids_exames, rng.randint(1, 3)):
+                    t["Encaminhamento_Exame"].append((id_enc, id_exame))
+            if tipo in ("Consulta", "Ambos"):
+                t["Encaminhamento_Consulta"].append((id_enc, proximo, id_paciente))
+    return t
+
+COLUNAS = {
+    "Paciente": ["id_paciente", "nome", "data_nascimento", "sexo", "email", "cpf"],
+    "Telefone_Paciente": ["id_paciente", "numero", "tipo"],
+    "Agendamento": ["id_agendamento", "id_paciente", "data", "observacoes", "status"],
+    "Consulta": ["crm", "id_agendamento", "id_paciente", "data_hora", "diagnostico", "observacoes"],
+    "Remarca": ["id_remarca", "antigo_id_agendamento", "antigo_id_paciente", "novo_id_agendamento",
+                "novo_id_paciente", "motivo", "data_remarcacao", "quem_solicitou"],
+    "Encaminhamento": ["id_encaminhamento", "id_agendamento", "id_paciente", "tipo", "observacoes"],
+    "Encaminhamento_Exame": ["id_encaminhamento", "id_exame"],
+    "Encaminhamento_Consulta": ["id_encaminhamento", "id_agendamento", "id_paciente"],
+}
+
+def carregar_bloco(cfg, bloco, primeiro_agendamento):
+    tabelas = gerar_bloco(cfg, bloco, primeiro_agendamento)
+    conn = get_connection(cfg["dsn"])
+    try:
+        cursor = conn.cursor()
+        for tabela, colunas in COLUNAS.items():
+            copiar(cursor, tabela, colunas, tabelas[tabela])
+        conn.commit()
+    finally:
+        conn.close()
+    return {tabela: len(linhas) for tabela, linhas in tabelas.items()}
+
+
+SEQUENCIAS = [
+    ("Paciente", "id_paciente"), ("Agendamento", "id_agendamento"), ("Exame", "id_exame"),
+    ("Encaminhamento", "id_encaminhamento"), ("Remarca", "id_remarca"),
+]
+
+def proximo_id(cursor, tabela, coluna):
+    cursor.execute(f"SELECT COALESCE(MAX({coluna}), 0) + 1 FROM {tabela}")
+    return cursor.fetchone()[0]
+
+def preparar(args):
+    conn = get_connection(args.dsn)
+    try:
+        cursor = conn.cursor()
+        if args.limpar:
+            cursor.execute(
+                "TRUNCATE " + ", ".join(reversed(list(COLUNAS))) + ", Medico, Exame RESTART IDENTITY CASCADE"
+            )
+        preset = PRESETS[args.preset]
+        cfg = {
+            "dsn": args.dsn,
+            "semente": args.semente,
+            "referencia": datetime.combine(args.referencia, datetime.min.time()),
+            "pacientes": args.pacientes or preset["pacientes"],
+            "medicos": preset["medicos"],
+            "paciente_base": proximo_id(cursor, "Paciente", "id_paciente"),
+            "exame_base": proximo_id(cursor, "Exame", "id_exame"),
+            "encaminhamento_base": proximo_id(cursor, "Encaminhamento", "id_encaminhamento"),
+            "remarca_base": proximo_id(cursor, "Remarca", "id_remarca"),
+        }
+        cursor.execute("SELECT COUNT(*) FROM Medico")
+        cfg["medico_base"] = cursor.fetchone()[0] + 1
+        cfg["media_agendamentos"] = (args.agendamentos or preset["agendamentos"]) / cfg["pacientes"]
+        agendamento_base = proximo_id(cursor, "Agendamento", "id_agendamento")
+        conn.commit()
+    finally:
+        conn.close()
+
+    blocos = []
+    for bloco in range((cfg["pacientes"] + PACIENTES_POR_BLOCO - 1) // PACIENTES_POR_BLOCO):
+        quantidade = min(PACIENTES_POR_BLOCO, cfg["pacientes"] - bloco * PACIENTES_POR_BLOCO)
+        blocos.append((bloco, agendamento_base))
+        agendamento_base += sum(contagens_bloco(cfg["semente"], bloco, quantidade, cfg["media_agendamentos"]))
+    return cfg, blocos
+
+def finalizar(args):
+    conn = get_connection(args.dsn)
+    conn.autocommit = True
+    try:
+        cursor = conn.cursor()
+        for tabela, coluna in SEQUENCIAS:
+            cursor.execute(
+                f"SELECT setval(pg_get_serial_sequence(%s, %s), (SELECT MAX({coluna}) FROM {tabela}))",
+                (tabela.lower(), coluna)
+            )
+        cursor.execute("ANALYZE " + ", ".join(list(COLUNAS) + ["Medico", "Exame"]))
+        if args.refresh_views:
+            for view in VIEWS:
+                cursor.execute(f"REFRESH MATERIALIZED VIEW {view}")
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--preset", choices=PRESETS, default="1k")
+    parser.add_argument("--agendamentos", type=int, help="sobrescreve o total aproximado de agendamentos do preset")
+    parser.add_argument("--pacientes", type=int, help="sobrescreve o número de pacientes do preset")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--referencia", type=date.fromisoformat, default=date(2025, 1, 1),
+                        help="data que separa histórico (realizados, faltas...) de agenda futura")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--limpar", action="store_true", help="esvazia as tabelas antes (TRUNCATE ... CASCADE)")
+    parser.add_argument("--refresh-views", action="store_true", help="atualiza as views materializadas no fim")
+    parser.add_argument("--dsn", default=None, help="padrão: DATABASE_URL")
+    args = parser.parse_args()
+
+    inicio = time.monotonic()
+    cfg, blocos = preparar(args)
+    totais = carregar_catalogo(cfg)
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        futuros = [executor.submit(carregar_bloco, cfg, bloco, base) for bloco, base in blocos]
+        for n, futuro in enumerate(futuros, 1):
+            for tabela, linhas in futuro.result().items():
+                totais[tabela] = totais.get(tabela, 0) + linhas
+            print(f"\rblocos {n}/{len(futuros)}", end="", file=sys.stderr, flush=True)
+    print(file=sys.stderr)
+    finalizar(args)
+
+    for tabela, linhas in totais.items():
+        print(f"{tabela:<24} {linhas:>12,}")
+    print(f"{'tempo':<24} {time.monotonic() - inicio:>11.1f}s")
+
+if __name__ == "__main__":
+    main()
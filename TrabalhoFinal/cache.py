@@ -0,0 +1,121 @@
+from collections import OrderedDict
+from functools import wraps
+from alteracoes import ao_alterar
+from etag import versoes_lidas
+import inspect
+import os
+import threading
+import time
+
+
+class CacheRelatorios:
+    def __init__(self, ttl=60.0, max_entradas=128):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self._geracao = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, chave):
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is not None:
+                valor, tabelas, expira_em = entrada
+                if time.monotonic() < expira_em:
+                    self._entradas.move_to_end(chave)
+                    self.hits += 1
+                    return True, valor
+                del self._entradas[chave]
+            self.misses += 1
+            return False, None
+
+    def geracao(self):
+        return self._geracao
+
+    def set(self, chave, valor, tabelas, geracao=None):
+        with self._lock:
+            if geracao is not None and geracao != self._geracao:
+                # Houve escrita enquanto o valor era calculado; ele pode estar desatualizado.
+                return
+            self._entradas[chave] = (valor, frozenset(tabelas), time.monotonic() + self.ttl)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+                self.evictions += 1
+
+    def invalidar(self, tabelas):
+        tabelas = set(tabelas)
+        with self._lock:
+            self._geracao += 1
+            for chave in [c for c, e in self._entradas.items() if e[1] & tabelas]:
+                del self._entradas[chave]
+                self.invalidations += 1
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entradas": len(self._entradas),
+                "max_entradas": self.max_entradas,
+                "ttl_s": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+cache_relatorios = CacheRelatorios(
+    ttl=float(os.getenv("REPORT_CACHE_TTL", "60")),
+    max_entradas=int(os.getenv("REPORT_CACHE_SIZE", "128"))
+)
+
+@ao_alterar
+def _invalidar_relatorios(tabelas):
+    cache_relatorios.invalidar(tabelas)
+
+def cacheado(*tabelas):
+    # Guarda o resultado do handler até uma escrita em uma das tabelas (ou o
+    # refresh de uma das views) ou até o TTL expirar. O argumento `db` não
+    # entra na chave; as versões lidas pela ETag entram, então uma escrita de
+    # outro processo também troca a entrada, e o valor servido nunca é mais
+    # antigo que a ETag que o acompanha.
+    def decorator(func):
+        def chave(args, kwargs):
+            return (
+                func.__name__, args, tuple(sorted((k, v) for k, v in kwargs.items() if k != "db")),
+                versoes_lidas.get()
+            )
+
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def wrapper_async(*args, **kwargs):
+                encontrado, valor = cache_relatorios.get(chave(args, kwargs))
+                if encontrado:
+                    return valor
+                geracao = cache_relatorios.geracao()
+                valor = await func(*args, **kwargs)
+                cache_relatorios.set(chave(args, kwargs), valor, tabelas, geracao)
+                return valor
+            return wrapper_async
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            encontrado, valor = cache_relatorios.get(chave(args, kwargs))
+            if encontrado:
+                return valor
+            geracao = cache_relatorios.geracao()
+            valor = func(*args, **kwargs)
+            cache_relatorios.set(chave(args, kwargs), valor, tabelas, geracao)
+            return valor
+        return wrapper
+    return decorator
@@ -0,0 +1,166 @@
+from collections import deque
+from datetime import datetime, timezone
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Log de consultas lentas: toda query acima de SLOW_QUERY_MS entra em um buffer
+# circular com o SQL, o formato dos parâmetros (tipos, não valores), a duração e
+# a rota. Uma amostra (SLOW_QUERY_EXPLAIN_SAMPLE) das leituras puras ganha um
+# EXPLAIN (ANALYZE, BUFFERS), executado em segundo plano numa conexão própria e
+# somente leitura, no máximo uma vez por SQL a cada SLOW_QUERY_EXPLAIN_INTERVAL s.
+
+_LEITURA = re.compile(r"\s*(SELECT|WITH)\b", re.IGNORECASE)
+# O que faz um SELECT/WITH escrever ou travar: CTEs com INSERT/UPDATE/DELETE/
+# MERGE (ex.: SQL_REAGENDAR, o PATCH de paciente), SELECT ... INTO, cláusulas
+# FOR UPDATE/SHARE e funções com efeito (travas advisory, sequências, versões).
+# Reexecutar esses comandos no EXPLAIN ANALYZE repetiria o efeito (ou a trava).
+_EFEITO = re.compile(
+    r"\b(INSERT|UPDATE|DELETE|MERGE|INTO|FOR\s+(NO\s+KEY\s+)?UPDATE|FOR\s+(KEY\s+)?SHARE"
+    r"|pg_(try_)?advisory\w*|nextval|setval|incrementar_versao)\b",
+    re.IGNORECASE,
+)
+_LITERAL = re.compile(r"'(?:[^']|'')*'")
+
+def explicavel(sql):
+    return _LEITURA.match(sql) is not None and _EFEITO.search(_LITERAL.sub("''", sql)) is None
+
+def normalizar_sql(sql):
+    if isinstance(sql, bytes):
+        sql = sql.decode(errors="replace")
+    return " ".join(str(sql).split())
+
+def formato_parametros(params):
+    def tipo(valor):
+        if isinstance(valor, (list, tuple)):
+            return f"{type(valor).__name__}[{len(valor)}]"
+        return type(valor).__name__
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {k: tipo(v) for k, v in params.items()}
+    return [tipo(v) for v in params]
+
+
+class LogConsultasLentas:
+    def __init__(self, limiar_ms=500.0, amostragem=0.1, tamanho=200, intervalo_explain=60.0, timeout_explain_ms=30000):
+        self.limiar_ms = limiar_ms
+        self.amostragem = amostragem
+        self.intervalo_explain = intervalo_explain
+        self.timeout_explain_ms = timeout_explain_ms
+        self._entradas = deque(maxlen=tamanho)
+        self._lock = threading.Lock()
+        self._ultimo_explain = {}
+        self._fila = queue.Queue(maxsize=20)
+        self._thread = None
+        self.total = 0
+
+    def observar(self, sql, params, duracao, rota=None):
+        if self.limiar_ms <= 0 or duracao * 1000 < self.limiar_ms:
+            return
+        texto = normalizar_sql(sql)
+        entrada = {
+            "em": datetime.now(timezone.utc).isoformat(),
+            "duracao_ms": round(duracao * 1000, 2),
+            "rota": rota,
+            "sql": texto[:4000],
+            "parametros": formato_parametros(params),
+            "explain": None,
+            "explain_status": "não amostrada",
+        }
+        if explicavel(texto) and self._sortear(texto):
+            entrada["explain_status"] = "pendente"
+            try:
+                self._fila.put_nowait((entrada, sql, params))
+                self._iniciar_worker()
+            except queue.Full:
+                entrada["explain_status"] = "descartada (fila cheia)"
+        with self._lock:
+            self._entradas.append(entrada)
+            self.total += 1
+        logger.warning("Consulta lenta (%.0f ms) em %s: %s", duracao * 1000, rota, texto[:200])
+
+    def _sortear(self, texto):
+        if random.random() >= self.amostragem:
+            return False
+        agora = time.monotonic()
+        with self._lock:
+            ultimo = self._ultimo_explain.get(texto)
+            if ultimo is not None and agora - ultimo < self.intervalo_explain:
+                return False
+            self._ultimo_explain[texto] = agora
+        return True
+
+    def _iniciar_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="explain-consultas-lentas", daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        conn = None
+        while True:
+            entrada, sql, params = self._fila.get()
+            try:
+                if conn is None or conn.closed:
+                    conn = self._conectar()
+                cursor = conn.cursor()
+                try:
+                    cursor.execute("EXPLAIN (ANALYZE, BUFFERS) " + sql, params)
+                    entrada["explain"] = "\n".join(r[0] for r in cursor.fetchall())
+                    entrada["explain_status"] = "ok"
+                finally:
+                    cursor.close()
+                    conn.rollback()
+            except Exception as e:
+                entrada["explain_status"] = f"erro: {e}"
+                if conn is not None and not conn.closed:
+                    conn.close()
+                conn = None
+
+    def _conectar(self):
+        # Conexão fora do pool e sem o cursor instrumentado, para que o próprio
+        # EXPLAIN não concorra com as requisições nem entre no log.
+        import psycopg2
+        from db import DATABASE_URL
+        conn = psycopg2.connect(DATABASE_URL)
+        conn.set_session(readonly=True)
+        cursor = conn.cursor()
+        cursor.execute("SET statement_timeout = %s", (int(self.timeout_explain_ms),))
+        cursor.close()
+        conn.commit()
+        return conn
+
+    def listar(self, limit=None):
+        with self._lock:
+            entradas = list(reversed(self._entradas))
+        return entradas[:limit] if limit else entradas
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._ultimo_explain.clear()
+
+    def config(self):
+        return {
+            "limiar_ms": self.limiar_ms,
+            "amostragem_explain": self.amostragem,
+            "intervalo_explain_s": self.intervalo_explain,
+            "capacidade": self._entradas.maxlen,
+            "total_registradas": self.total,
+        }
+
+
+log_consultas_lentas = LogConsultasLentas(
+    limiar_ms=float(os.getenv("SLOW_QUERY_MS", "500")),
+    amostragem=float(os.getenv("SLOW_QUERY_EXPLAIN_SAMPLE", "0.1")),
+    tamanho=int(os.getenv("SLOW_QUERY_BUFFER", "200")),
+    intervalo_explain=float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL", "60")),
+    timeout_explain_ms=int(os.getenv("SLOW_QUERY_EXPLAIN_TIMEOUT_MS", "30000")),
+)
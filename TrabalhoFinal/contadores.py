@@ -0,0 +1,101 @@
+"""Confere e reconstrói as contagens mantidas por gatilho (migracoes/0007_contadores.sql).
+
+    python contadores.py verificar      # compara com COUNT(*) ... GROUP BY; sai com 1 se divergir
+    python contadores.py reconciliar    # reconstrói as contagens divergentes
+    python contadores.py reconciliar --todas   # reconstrói todas (compacta os slots)
+
+A reconstrução bloqueia escritas na tabela de origem (LOCK ... IN SHARE MODE)
+só durante a recontagem; leituras seguem normalmente.
+"""
+import argparse
+import os
+import sys
+
+from db import get_connection
+
+# tabela de contagem -> (tabela de origem, coluna agrupada)
+CONTADORES = {
+    "contagem_agendamento_status": ("Agendamento", "status"),
+    "contagem_encaminhamento_tipo": ("Encaminhamento", "tipo"),
+    "contagem_consultas_medico": ("Consulta", "crm"),
+}
+
+def sql_divergencias(contagem, tabela, coluna):
+    # Uma consulta só: origem e contagem lidas no mesmo snapshot.
+    return f"""
+        SELECT COALESCE(r.chave, c.chave), COALESCE(r.total, 0), COALESCE(c.total, 0)
+        FROM (SELECT {coluna}::text AS chave, COUNT(*) AS total FROM {tabela} GROUP BY 1) r
+        FULL JOIN (SELECT {coluna} AS chave, SUM(total) AS total FROM {contagem} GROUP BY 1) c
+            ON c.chave = r.chave
+        WHERE COALESCE(r.total, 0) <> COALESCE(c.total, 0)
+        ORDER BY 1
+    """
+
+def divergencias(conn):
+    resultado = {}
+    cursor = conn.cursor()
+    try:
+        for contagem, (tabela, coluna) in CONTADORES.items():
+            cursor.execute(sql_divergencias(contagem, tabela, coluna))
+            resultado[contagem] = [
+                {"chave": r[0], "esperado": int(r[1]), "contado": int(r[2])} for r in cursor.fetchall()
+            ]
+    finally:
+        cursor.close()
+        conn.rollback()
+    return resultado
+
+def reconstruir(conn, contagem):
+    tabela, coluna = CONTADORES[contagem]
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"LOCK TABLE {tabela} IN SHARE MODE")
+        cursor.execute(f"DELETE FROM {contagem}")
+        cursor.execute(
+            f"INSERT INTO {contagem} ({coluna}, slot, total) SELECT {coluna}::text, 0, COUNT(*) FROM {tabela} GROUP BY 1"
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def reconciliar(conn, todas=False):
+    diferencas = divergencias(conn)
+    reconstruidas = [c for c in CONTADORES if todas or diferencas[c]]
+    for contagem in reconstruidas:
+        reconstruir(conn, contagem)
+    return diferencas, reconstruidas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("comando", choices=["verificar", "reconciliar"])
+    parser.add_argument("--todas", action="store_true", help="reconstrói mesmo sem divergência")
+    parser.add_argument("--dsn", default=os.getenv("DATABASE_URL"))
+    args = parser.parse_args()
+
+    conn = get_connection(args.dsn)
+    try:
+        if args.comando == "verificar":
+            diferencas = divergencias(conn)
+            reconstruidas = []
+        else:
+            diferencas, reconstruidas = reconciliar(conn, args.todas)
+    finally:
+        conn.close()
+
+    for contagem, linhas in diferencas.items():
+        situacao = "ok" if not linhas else f"{len(linhas)} divergência(s)"
+        if contagem in reconstruidas:
+            situacao += ", reconstruída"
+        print(f"{contagem:<32} {situacao}")
+        for d in linhas:
+            print(f"    {d['chave']}: esperado {d['esperado']}, contado {d['contado']}")
+    if args.comando == "verificar" and any(diferencas.values()):
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
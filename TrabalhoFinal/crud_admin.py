@@ -0,0 +1,55 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+from db import get_pool
+from replica import monitor
+from metricas import RotaInstrumentada
+import db_async
+from views_materializadas import scheduler
+from cache import cache_relatorios
+from preparadas import preparadas
+from consultas_lentas import log_consultas_lentas
+
+router = APIRouter(route_class=RotaInstrumentada)
+
+@router.get("/pool", summary="Estatísticas do pool de conexões")
+def get_pool_stats():
+    stats = get_pool().stats()
+    if db_async.DB_MODE == "async":
+        stats["async"] = db_async.pool_stats()
+    stats["replica"] = monitor.stats()
+    return stats
+
+@router.get("/views", summary="Estado das views materializadas (último refresh, staleness)")
+def get_views():
+    return scheduler.estado()
+
+@router.post("/views/refresh", summary="Atualiza agora uma view materializada (ou todas)")
+def refresh_views(view: Optional[str] = None):
+    nomes = [view] if view else list(scheduler.estados)
+    for nome in nomes:
+        if nome not in scheduler.estados:
+            raise HTTPException(status_code=404, detail=f"View '{nome}' não encontrada.")
+    try:
+        return [scheduler.refresh(nome) for nome in nomes]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao atualizar views: {e}")
+
+@router.get("/cache", summary="Estatísticas do cache de relatórios")
+def get_cache_stats():
+    return cache_relatorios.stats()
+
+@router.delete("/cache", status_code=204, summary="Esvazia o cache de relatórios")
+def limpar_cache():
+    cache_relatorios.limpar()
+
+@router.get("/preparadas", summary="Consultas preparadas por conexão e reaproveitamento dos planos")
+def get_preparadas_stats():
+    return preparadas.stats()
+
+@router.get("/consultas-lentas", summary="Consultas acima do limiar, com plano EXPLAIN (ANALYZE, BUFFERS) amostrado")
+def get_consultas_lentas(limit: Optional[int] = Query(None, ge=1)):
+    return dict(log_consultas_lentas.config(), consultas=log_consultas_lentas.listar(limit))
+
+@router.delete("/consultas-lentas", status_code=204, summary="Esvazia o log de consultas lentas")
+def limpar_consultas_lentas():
+    log_consultas_lentas.limpar()
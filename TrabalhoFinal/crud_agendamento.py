@@ -1,9 +1,20 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from typing import List
-from models import Agendamento, AgendamentoCreate, AgendamentoUpdate, StatusAgendamento
+from fastapi import APIRouter, HTTPException, Depends, Query, status
+from typing import List, Optional
+from datetime import datetime, timedelta
+from models import Agendamento, AgendamentoCreate, AgendamentoUpdate, AgendamentoPage, StatusAgendamento, CalendarioDia, CalendarioSlot, BulkCreateResponse, BulkCreatedItem, BulkRowError
 from db import get_db
+from replica import get_db_leitura
+from metricas import RotaInstrumentada
+from db_async import get_db_async, fetchall_async, fetchone_async
+from alteracoes import notificar_alteracao
+from etag import etag, etag_async
+from preparadas import preparadas
+from respostas import JSON_RAPIDO, resposta_pagina
+from paginacao import LIMITE_PADRAO, LIMITE_MAXIMO, keyset, order_by, paginar
+from atualizacao import campos_alterados, sql_atualizar
+from lote import ler_lote, validar_lote, inserir_lote
 
-router = APIRouter()
+router = APIRouter(route_class=RotaInstrumentada, dependencies=[Depends(etag("Agendamento"))])
 
 @router.post("/", response_model=Agendamento, status_code=status.HTTP_201_CREATED)
 def criar_agendamento(agendamento: AgendamentoCreate, db=Depends(get_db)):
@@ -15,6 +26,7 @@ def criar_agendamento(agendamento: AgendamentoCreate, db=Depends(get_db)):
         )
         new_id_agendamento = cursor.fetchone()[0]
         db.commit()
+        notificar_alteracao("Agendamento")
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=f"Erro ao criar agendamento: {e}")
@@ -29,74 +41,200 @@ def criar_agendamento(agendamento: AgendamentoCreate, db=Depends(get_db)):
         status=StatusAgendamento.MARCADA
     )
 
-@router.get("/", response_model=List[Agendamento])
-def listar_agendamentos(db=Depends(get_db)):
+@router.post("/bulk", response_model=BulkCreateResponse, summary="Cria agendamentos em lote (array JSON ou NDJSON)")
+def criar_agendamentos_em_lote(itens=Depends(ler_lote), db=Depends(get_db)):
+    validos, erros = validar_lote(itens, AgendamentoCreate)
+
+    criados = []
+    if validos:
+        cursor = db.cursor()
+        try:
+            cursor.execute(
+                "SELECT id_paciente FROM Paciente WHERE id_paciente = ANY(%s)",
+                (list({a.id_paciente for _, a in validos}),)
+            )
+            existentes = {r[0] for r in cursor.fetchall()}
+            inserir = []
+            for indice, agendamento in validos:
+                if agendamento.id_paciente in existentes:
+                    inserir.append((indice, agendamento))
+                else:
+                    erros.append((indice, "Paciente não encontrado."))
+
+            # O RETURNING de um INSERT ... VALUES devolve as linhas na ordem em que foram enviadas.
+            inseridos, rows, falhas = inserir_lote(
+                cursor,
+                "INSERT INTO Agendamento (id_paciente, data, observacoes, status) VALUES %s RETURNING id_agendamento",
+                inserir,
+                lambda a: (a.id_paciente, a.data, a.observacoes, StatusAgendamento.MARCADA.value)
+            )
+            db.commit()
+            notificar_alteracao("Agendamento")
+        except Exception as e:
+            db.rollback()
+            raise HTTPException(status_code=400, detail=f"Erro ao criar agendamentos em lote: {e}")
+        finally:
+            cursor.close()
+
+        erros += falhas
+        criados = [BulkCreatedItem(indice=indice, id=row[0]) for (indice, _), row in zip(inseridos, rows)]
+
+    return BulkCreateResponse(
+        criados=criados,
+        erros=[BulkRowError(indice=i, detalhe=d) for i, d in sorted(erros)]
+    )
+
+SQL_AGENDAMENTO = "SELECT id_agendamento, id_paciente, data, observacoes, status FROM Agendamento"
+SQL_GET_AGENDAMENTO = SQL_AGENDAMENTO + " WHERE id_agendamento=%s AND id_paciente=%s"
+PREP_GET_AGENDAMENTO = preparadas.registrar("get_agendamento", SQL_GET_AGENDAMENTO)
+CHAVE_AGENDAMENTO = ["id_agendamento", "id_paciente"]
+CHAVE_AGENDAMENTO_POR_DATA = ["data", "id_agendamento", "id_paciente"]
+CALENDARIO_MAX_DIAS = 92
+
+def agendamento_from_row(r):
+    return Agendamento(
+        id_agendamento=r[0],
+        id_paciente=r[1],
+        data=r[2],
+        observacoes=r[3],
+        status=r[4]
+    )
+
+def agendamento_dict_from_row(r):
+    return {"id_agendamento": r[0], "id_paciente": r[1], "data": r[2], "observacoes": r[3], "status": r[4]}
+
+def filtros_agendamento(inicio, fim, status, id_paciente):
+    filtros = []
+    params = []
+    if inicio is not None:
+        filtros.append("data >= %s")
+        params.append(inicio)
+    if fim is not None:
+        filtros.append("data < %s")
+        params.append(fim)
+    if status is not None:
+        filtros.append("status = %s")
+        params.append(status.value)
+    if id_paciente is not None:
+        filtros.append("id_paciente = %s")
+        params.append(id_paciente)
+    return filtros, params
+
+def por_data(inicio, fim):
+    return inicio is not None or fim is not None
+
+def sql_listar_agendamentos(limit, cursor, inicio=None, fim=None, status=None, id_paciente=None):
+    # Com intervalo de datas a página segue a ordem da agenda (data, chave) e a
+    # leitura usa o índice de data; sem intervalo, a ordem da chave primária.
+    chave = CHAVE_AGENDAMENTO_POR_DATA if por_data(inicio, fim) else CHAVE_AGENDAMENTO
+    condicao, params_cursor = keyset(chave, cursor)
+    filtros, params = filtros_agendamento(inicio, fim, status, id_paciente)
+    if condicao:
+        filtros.append(condicao)
+        params += params_cursor
+    sql = SQL_AGENDAMENTO
+    if filtros:
+        sql += " WHERE " + " AND ".join(filtros)
+    sql += order_by(chave) + " LIMIT %s"
+    return sql, params + [limit + 1]
+
+def pagina_agendamentos(rows, limit, inicio=None, fim=None):
+    if por_data(inicio, fim):
+        chave = lambda r: [r[2].isoformat(), r[0], r[1]]
+    else:
+        chave = lambda r: [r[0], r[1]]
+    rows, next_cursor = paginar(rows, limit, chave)
+    if JSON_RAPIDO:
+        return resposta_pagina([agendamento_dict_from_row(r) for r in rows], next_cursor)
+    return AgendamentoPage(items=[agendamento_from_row(r) for r in rows], next_cursor=next_cursor)
+
+def sql_calendario(inicio, fim, status, id_paciente):
+    if fim <= inicio:
+        raise HTTPException(status_code=400, detail="'fim' deve ser posterior a 'inicio'.")
+    if fim - inicio > timedelta(days=CALENDARIO_MAX_DIAS):
+        raise HTTPException(status_code=400, detail=f"Intervalo máximo do calendário é de {CALENDARIO_MAX_DIAS} dias.")
+    filtros, params = filtros_agendamento(inicio, fim, status, id_paciente)
+    sql = "SELECT id_agendamento, id_paciente, data, status FROM Agendamento WHERE " + " AND ".join(filtros) + " ORDER BY data, id_agendamento"
+    return sql, params
+
+def montar_calendario(rows, incluir_horarios):
+    dias = {}
+    for r in rows:
+        dia = dias.get(r[2].date())
+        if dia is None:
+            dia = dias[r[2].date()] = CalendarioDia(dia=r[2].date(), total=0)
+        dia.total += 1
+        dia.por_status[r[3]] = dia.por_status.get(r[3], 0) + 1
+        if incluir_horarios:
+            dia.horarios.append(CalendarioSlot(id_agendamento=r[0], id_paciente=r[1], data=r[2], status=r[3]))
+    return list(dias.values())
+
+@router.get("/calendario", response_model=List[CalendarioDia], summary="Agendamentos por dia (totais e horários) em um intervalo")
+def calendario_agendamentos(
+    inicio: datetime,
+    fim: datetime,
+    status: Optional[StatusAgendamento] = None,
+    id_paciente: Optional[int] = None,
+    incluir_horarios: bool = True,
+    db=Depends(get_db_leitura)
+):
+    sql, params = sql_calendario(inicio, fim, status, id_paciente)
     cursor = db.cursor()
     try:
-        cursor.execute("SELECT id_agendamento, id_paciente, data, observacoes, status FROM Agendamento")
+        cursor.execute(sql, params)
         rows = cursor.fetchall()
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao listar agendamentos: {e}")
+        raise HTTPException(status_code=500, detail=f"Erro ao montar calendário: {e}")
     finally:
         cursor.close()
+    return montar_calendario(rows, incluir_horarios)
 
-    return [
-        Agendamento(
-            id_agendamento=r[0],
-            id_paciente=r[1],
-            data=r[2],
-            observacoes=r[3],
-            status=r[4]
-        ) for r in rows
-    ]
+@router.get("/", response_model=AgendamentoPage)
+def listar_agendamentos(
+    inicio: Optional[datetime] = None,
+    fim: Optional[datetime] = None,
+    status: Optional[StatusAgendamento] = None,
+    id_paciente: Optional[int] = None,
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+    db=Depends(get_db_leitura)
+):
+    sql, params = sql_listar_agendamentos(limit, cursor, inicio, fim, status, id_paciente)
+    db_cursor = db.cursor()
+    try:
+        db_cursor.execute(sql, params)
+        rows = db_cursor.fetchall()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao listar agendamentos: {e}")
+    finally:
+        db_cursor.close()
+
+    return pagina_agendamentos(rows, limit, inicio, fim)
 
 @router.get("/{id_agendamento}/{id_paciente}", response_model=Agendamento)
-def get_agendamento(id_agendamento: int, id_paciente: int, db=Depends(get_db)):
+def get_agendamento(id_agendamento: int, id_paciente: int, db=Depends(get_db_leitura)):
     cursor = db.cursor()
-    cursor.execute(
-        "SELECT id_agendamento, id_paciente, data, observacoes, status FROM Agendamento WHERE id_agendamento=%s AND id_paciente=%s",
-        (id_agendamento, id_paciente)
-    )
+    preparadas.executar(cursor, PREP_GET_AGENDAMENTO, (id_agendamento, id_paciente))
     row = cursor.fetchone()
     cursor.close()
     if not row:
         raise HTTPException(status_code=404, detail="Agendamento não encontrado")
-    return Agendamento(
-        id_agendamento=row[0],
-        id_paciente=row[1],
-        data=row[2],
-        observacoes=row[3],
-        status=row[4]
-    )
+    return agendamento_from_row(row)
 
 @router.patch("/{id_agendamento}/{id_paciente}", response_model=Agendamento)
 def atualizar_agendamento(id_agendamento: int, id_paciente: int, agendamento_update: AgendamentoUpdate, db=Depends(get_db)):
-    cursor = db.cursor()
-    cursor.execute(
-        "SELECT id_agendamento, id_paciente, data, observacoes, status FROM Agendamento WHERE id_agendamento=%s AND id_paciente=%s",
-        (id_agendamento, id_paciente)
-    )
-    row = cursor.fetchone()
-    if not row:
-        cursor.close()
-        raise HTTPException(status_code=404, detail="Agendamento não encontrado")
+    campos = campos_alterados(agendamento_update, ignorar=CHAVE_AGENDAMENTO)
+    if not campos:
+        return get_agendamento(id_agendamento, id_paciente, db)
 
-    agendamento_existente = Agendamento(
-        id_agendamento=row[0],
-        id_paciente=row[1],
-        data=row[2],
-        observacoes=row[3],
-        status=row[4]
+    sql, params = sql_atualizar(
+        "Agendamento", campos, {"id_agendamento": id_agendamento, "id_paciente": id_paciente},
+        ["id_agendamento", "id_paciente", "data", "observacoes", "status"]
     )
-
-    update_data = agendamento_update.dict(exclude_unset=True)
-    agendamento_atualizado = agendamento_existente.copy(update=update_data)
-
+    cursor = db.cursor()
     try:
-        cursor.execute(
-            "UPDATE Agendamento SET data=%s, observacoes=%s, status=%s WHERE id_agendamento=%s AND id_paciente=%s",
-            (agendamento_atualizado.data, agendamento_atualizado.observacoes, agendamento_atualizado.status, id_agendamento, id_paciente)
-        )
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
         db.commit()
     except Exception as e:
         db.rollback()
@@ -104,7 +242,10 @@ def atualizar_agendamento(id_agendamento: int, id_paciente: int, agendamento_upd
     finally:
         cursor.close()
 
-    return agendamento_atualizado
+    if not row:
+        raise HTTPException(status_code=404, detail="Agendamento não encontrado")
+    notificar_alteracao("Agendamento")
+    return agendamento_from_row(row)
 
 @router.delete("/{id_agendamento}/{id_paciente}", status_code=status.HTTP_204_NO_CONTENT)
 def deletar_agendamento(id_agendamento: int, id_paciente: int, db=Depends(get_db)):
@@ -117,10 +258,54 @@ def deletar_agendamento(id_agendamento: int, id_paciente: int, db=Depends(get_db
         if cursor.rowcount == 0:
             raise HTTPException(status_code=404, detail="Agendamento não encontrado")
         db.commit()
+        notificar_alteracao("Agendamento")
     except Exception as e:
         db.rollback()
         if "violates foreign key constraint" in str(e):
              raise HTTPException(status_code=409, detail="Não é possível deletar agendamento com consultas ou remarcas associadas.")
         raise HTTPException(status_code=400, detail=f"Erro ao deletar agendamento: {e}")
     finally:
-        cursor.close()
\ No newline at end of file
+        cursor.close()
+
+
+router_async = APIRouter(route_class=RotaInstrumentada, dependencies=[Depends(etag_async("Agendamento"))])
+
+@router_async.get("/calendario", response_model=List[CalendarioDia], summary="Agendamentos por dia (totais e horários) em um intervalo")
+async def calendario_agendamentos_async(
+    inicio: datetime,
+    fim: datetime,
+    status: Optional[StatusAgendamento] = None,
+    id_paciente: Optional[int] = None,
+    incluir_horarios: bool = True,
+    db=Depends(get_db_async)
+):
+    sql, params = sql_calendario(inicio, fim, status, id_paciente)
+    try:
+        rows = await fetchall_async(db, sql, params)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao montar calendário: {e}")
+    return montar_calendario(rows, incluir_horarios)
+
+@router_async.get("/", response_model=AgendamentoPage)
+async def listar_agendamentos_async(
+    inicio: Optional[datetime] = None,
+    fim: Optional[datetime] = None,
+    status: Optional[StatusAgendamento] = None,
+    id_paciente: Optional[int] = None,
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+    db=Depends(get_db_async)
+):
+    sql, params = sql_listar_agendamentos(limit, cursor, inicio, fim, status, id_paciente)
+    try:
+        rows = await fetchall_async(db, sql, params)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao listar agendamentos: {e}")
+    return pagina_agendamentos(rows, limit, inicio, fim)
+
+@router_async.get("/{id_agendamento}/{id_paciente}", response_model=Agendamento)
+async def get_agendamento_async(id_agendamento: int, id_paciente: int, db=Depends(get_db_async)):
+    row = await fetchone_async(db, SQL_GET_AGENDAMENTO, (id_agendamento, id_paciente))
+    if not row:
+        raise HTTPException(status_code=404, detail="Agendamento não encontrado")
+    return agendamento_from_row(row)
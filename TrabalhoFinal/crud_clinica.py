@@ -1,14 +1,35 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from typing import List
-from models import Consulta, ConsultaCreate, ConsultaUpdate
+from fastapi import APIRouter, HTTPException, Depends, Query, status
+from typing import List, Optional
+from models import Consulta, ConsultaCreate, ConsultaUpdate, ConsultaPage
 from db import get_db
+from replica import get_db_leitura
+from metricas import RotaInstrumentada
+from db_async import get_db_async, fetchall_async, fetchone_async
+from alteracoes import notificar_alteracao
+from respostas import JSON_RAPIDO, resposta_pagina
+from etag import etag, etag_async
+from preparadas import preparadas
+from paginacao import LIMITE_PADRAO, LIMITE_MAXIMO, keyset, order_by, paginar
+from atualizacao import campos_alterados, sql_atualizar
+from disponibilidade import SQL_CONFLITO, SQL_TRAVAR_MEDICO, hora_local, params_conflito
 
-router = APIRouter()
+router = APIRouter(route_class=RotaInstrumentada, dependencies=[Depends(etag("Consulta"))])
 
 @router.post("/", response_model=Consulta, status_code=status.HTTP_201_CREATED)
 def criar_consulta(consulta: ConsultaCreate, db=Depends(get_db)):
+    # Com fuso, o horário é convertido para o local da clínica antes da checagem
+    # de conflito e do INSERT, como na disponibilidade.
+    consulta.data_hora = hora_local(consulta.data_hora)
     cursor = db.cursor()
     try:
+        cursor.execute(SQL_TRAVAR_MEDICO, (consulta.crm,))
+        cursor.execute(SQL_CONFLITO, params_conflito(consulta.crm, consulta.data_hora))
+        conflito = cursor.fetchone()
+        if conflito:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Médico já tem consulta às {conflito[0]:%d/%m/%Y %H:%M}, em conflito com esse horário."
+            )
         cursor.execute(
             """
             INSERT INTO Consulta (crm, id_agendamento, id_paciente, data_hora, diagnostico, observacoes)
@@ -24,6 +45,10 @@ def criar_consulta(consulta: ConsultaCreate, db=Depends(get_db)):
             )
         )
         db.commit()
+        notificar_alteracao("Consulta")
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=f"Erro ao criar consulta: {e}")
@@ -32,83 +57,80 @@ def criar_consulta(consulta: ConsultaCreate, db=Depends(get_db)):
 
     return consulta
 
-@router.get("/", response_model=List[Consulta])
-def listar_consultas(db=Depends(get_db)):
-    cursor = db.cursor()
+SQL_CONSULTA = "SELECT crm, id_agendamento, id_paciente, data_hora, diagnostico, observacoes FROM Consulta"
+SQL_GET_CONSULTA = SQL_CONSULTA + " WHERE crm=%s AND id_agendamento=%s AND id_paciente=%s"
+PREP_GET_CONSULTA = preparadas.registrar("get_consulta", SQL_GET_CONSULTA)
+CHAVE_CONSULTA = ["crm", "id_agendamento", "id_paciente"]
+
+def consulta_from_row(r):
+    return Consulta(
+        crm=r[0],
+        id_agendamento=r[1],
+        id_paciente=r[2],
+        data_hora=r[3],
+        diagnostico=r[4],
+        observacoes=r[5]
+    )
+
+def consulta_dict_from_row(r):
+    return {"crm": r[0], "id_agendamento": r[1], "id_paciente": r[2], "data_hora": r[3], "diagnostico": r[4], "observacoes": r[5]}
+
+def sql_listar_consultas(limit, cursor):
+    condicao, params = keyset(CHAVE_CONSULTA, cursor)
+    sql = SQL_CONSULTA
+    if condicao:
+        sql += " WHERE " + condicao
+    sql += order_by(CHAVE_CONSULTA) + " LIMIT %s"
+    return sql, params + [limit + 1]
+
+def pagina_consultas(rows, limit):
+    rows, next_cursor = paginar(rows, limit, lambda r: [r[0], r[1], r[2]])
+    if JSON_RAPIDO:
+        return resposta_pagina([consulta_dict_from_row(r) for r in rows], next_cursor)
+    return ConsultaPage(items=[consulta_from_row(r) for r in rows], next_cursor=next_cursor)
+
+@router.get("/", response_model=ConsultaPage)
+def listar_consultas(
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+    db=Depends(get_db_leitura)
+):
+    sql, params = sql_listar_consultas(limit, cursor)
+    db_cursor = db.cursor()
     try:
-        cursor.execute(
-            "SELECT crm, id_agendamento, id_paciente, data_hora, diagnostico, observacoes FROM Consulta"
-        )
-        rows = cursor.fetchall()
+        db_cursor.execute(sql, params)
+        rows = db_cursor.fetchall()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao listar consultas: {e}")
     finally:
-        cursor.close()
+        db_cursor.close()
 
-    return [
-        Consulta(
-            crm=r[0],
-            id_agendamento=r[1],
-            id_paciente=r[2],
-            data_hora=r[3],
-            diagnostico=r[4],
-            observacoes=r[5]
-        ) for r in rows
-    ]
+    return pagina_consultas(rows, limit)
 
 @router.get("/{crm}/{id_agendamento}/{id_paciente}", response_model=Consulta)
-def get_consulta(crm: str, id_agendamento: int, id_paciente: int, db=Depends(get_db)):
+def get_consulta(crm: str, id_agendamento: int, id_paciente: int, db=Depends(get_db_leitura)):
     cursor = db.cursor()
-    cursor.execute(
-        "SELECT crm, id_agendamento, id_paciente, data_hora, diagnostico, observacoes FROM Consulta WHERE crm=%s AND id_agendamento=%s AND id_paciente=%s",
-        (crm, id_agendamento, id_paciente)
-    )
+    preparadas.executar(cursor, PREP_GET_CONSULTA, (crm, id_agendamento, id_paciente))
     row = cursor.fetchone()
     cursor.close()
     if not row:
         raise HTTPException(status_code=404, detail="Consulta não encontrada")
-    return Consulta(
-        crm=row[0],
-        id_agendamento=row[1],
-        id_paciente=row[2],
-        data_hora=row[3],
-        diagnostico=row[4],
-        observacoes=row[5]
-    )
+    return consulta_from_row(row)
 
 @router.patch("/{crm}/{id_agendamento}/{id_paciente}", response_model=Consulta)
 def atualizar_consulta(crm: str, id_agendamento: int, id_paciente: int, consulta_update: ConsultaUpdate, db=Depends(get_db)):
-    cursor = db.cursor()
-    cursor.execute(
-        "SELECT crm, id_agendamento, id_paciente, data_hora, diagnostico, observacoes FROM Consulta WHERE crm=%s AND id_agendamento=%s AND id_paciente=%s",
-        (crm, id_agendamento, id_paciente)
-    )
-    row = cursor.fetchone()
-    if not row:
-        cursor.close()
-        raise HTTPException(status_code=404, detail="Consulta não encontrada")
+    campos = campos_alterados(consulta_update)
+    if not campos:
+        return get_consulta(crm, id_agendamento, id_paciente, db)
 
-    consulta_existente = Consulta(
-        crm=row[0],
-        id_agendamento=row[1],
-        id_paciente=row[2],
-        data_hora=row[3],
-        diagnostico=row[4],
-        observacoes=row[5]
+    sql, params = sql_atualizar(
+        "Consulta", campos, {"crm": crm, "id_agendamento": id_agendamento, "id_paciente": id_paciente},
+        ["crm", "id_agendamento", "id_paciente", "data_hora", "diagnostico", "observacoes"]
     )
-
-    update_data = consulta_update.dict(exclude_unset=True)
-    consulta_atualizada = consulta_existente.copy(update=update_data)
-
+    cursor = db.cursor()
     try:
-        cursor.execute(
-            """
-            UPDATE Consulta
-            SET diagnostico=%s, observacoes=%s
-            WHERE crm=%s AND id_agendamento=%s AND id_paciente=%s
-            """,
-            (consulta_atualizada.diagnostico, consulta_atualizada.observacoes, crm, id_agendamento, id_paciente)
-        )
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
         db.commit()
     except Exception as e:
         db.rollback()
@@ -116,7 +138,10 @@ def atualizar_consulta(crm: str, id_agendamento: int, id_paciente: int, consulta
     finally:
         cursor.close()
 
-    return consulta_atualizada
+    if not row:
+        raise HTTPException(status_code=404, detail="Consulta não encontrada")
+    notificar_alteracao("Consulta")
+    return consulta_from_row(row)
 
 @router.delete("/{crm}/{id_agendamento}/{id_paciente}", status_code=status.HTTP_204_NO_CONTENT)
 def deletar_consulta(crm: str, id_agendamento: int, id_paciente: int, db=Depends(get_db)):
@@ -129,10 +154,34 @@ def deletar_consulta(crm: str, id_agendamento: int, id_paciente: int, db=Depends
         if cursor.rowcount == 0:
             raise HTTPException(status_code=404, detail="Consulta não encontrada.")
         db.commit()
+        notificar_alteracao("Consulta")
     except Exception as e:
         db.rollback()
         if "violates foreign key constraint" in str(e):
              raise HTTPException(status_code=409, detail="Não é possível deletar consulta com encaminhamentos associados. Remova as associações primeiro.")
         raise HTTPException(status_code=400, detail=f"Erro ao deletar consulta: {e}")
     finally:
-        cursor.close()
\ No newline at end of file
+        cursor.close()
+
+
+router_async = APIRouter(route_class=RotaInstrumentada, dependencies=[Depends(etag_async("Consulta"))])
+
+@router_async.get("/", response_model=ConsultaPage)
+async def listar_consultas_async(
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+    db=Depends(get_db_async)
+):
+    sql, params = sql_listar_consultas(limit, cursor)
+    try:
+        rows = await fetchall_async(db, sql, params)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao listar consultas: {e}")
+    return pagina_consultas(rows, limit)
+
+@router_async.get("/{crm}/{id_agendamento}/{id_paciente}", response_model=Consulta)
+async def get_consulta_async(crm: str, id_agendamento: int, id_paciente: int, db=Depends(get_db_async)):
+    row = await fetchone_async(db, SQL_GET_CONSULTA, (crm, id_agendamento, id_paciente))
+    if not row:
+        raise HTTPException(status_code=404, detail="Consulta não encontrada")
+    return consulta_from_row(row)
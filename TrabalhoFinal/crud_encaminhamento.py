@@ -1,12 +1,20 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Query, status
 from typing import List, Optional
 from models import (
     Encaminhamento, EncaminhamentoCreate, EncaminhamentoUpdate,
-    EncaminhamentoResponse, ExameInfo, AgendamentoInfo, TipoEncaminhamento
+    EncaminhamentoResponse, EncaminhamentoPage, ExameInfo, AgendamentoInfo, TipoEncaminhamento
 )
 from db import get_db
+from replica import get_db_leitura
+from metricas import RotaInstrumentada
+from db_async import get_db_async, fetchall_async, fetchone_async
+from alteracoes import notificar_alteracao
+from preparadas import preparadas
+from etag import etag, etag_async
+from paginacao import LIMITE_PADRAO, LIMITE_MAXIMO, keyset, order_by, paginar
+from psycopg2.extras import execute_values
 
-router = APIRouter()
+router = APIRouter(route_class=RotaInstrumentada, dependencies=[Depends(etag("Encaminhamento", "Encaminhamento_Exame", "Encaminhamento_Consulta", "Exame", "Agendamento"))])
 
 @router.post("/", response_model=EncaminhamentoResponse, status_code=status.HTTP_201_CREATED)
 def criar_encaminhamento(encaminhamento_data: EncaminhamentoCreate, db=Depends(get_db)):
@@ -37,11 +45,11 @@ def criar_encaminhamento(encaminhamento_data: EncaminhamentoCreate, db=Depends(g
 
         if encaminhamento_data.tipo == TipoEncaminhamento.EXAME or encaminhamento_data.tipo == TipoEncaminhamento.AMBOS:
             if encaminhamento_data.exames_ids:
-                for exame_id in encaminhamento_data.exames_ids:
-                    cursor.execute(
-                        "INSERT INTO Encaminhamento_Exame (id_encaminhamento, id_exame) VALUES (%s, %s)",
-                        (new_enc_id, exame_id)
-                    )
+                execute_values(
+                    cursor,
+                    "INSERT INTO Encaminhamento_Exame (id_encaminhamento, id_exame) VALUES %s",
+                    [(new_enc_id, exame_id) for exame_id in dict.fromkeys(encaminhamento_data.exames_ids)]
+                )
         if encaminhamento_data.tipo == TipoEncaminhamento.CONSULTA or encaminhamento_data.tipo == TipoEncaminhamento.AMBOS:
             if encaminhamento_data.agendamento_novo_id and encaminhamento_data.paciente_novo_id:
                 cursor.execute(
@@ -50,6 +58,7 @@ def criar_encaminhamento(encaminhamento_data: EncaminhamentoCreate, db=Depends(g
                 )
 
         db.commit()
+        notificar_alteracao("Encaminhamento", "Encaminhamento_Exame", "Encaminhamento_Consulta")
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=f"Erro ao criar encaminhamento: {e}")
@@ -58,41 +67,157 @@ def criar_encaminhamento(encaminhamento_data: EncaminhamentoCreate, db=Depends(g
 
     return obter_encaminhamento(new_enc_id, db)
 
+SQL_ENCAMINHAMENTO = "SELECT id_encaminhamento, id_agendamento, id_paciente, tipo, observacoes FROM Encaminhamento"
+SQL_GET_ENCAMINHAMENTO = SQL_ENCAMINHAMENTO + " WHERE id_encaminhamento = %s"
+PREP_GET_ENCAMINHAMENTO = preparadas.registrar("get_encaminhamento", SQL_GET_ENCAMINHAMENTO)
+SQL_EXAMES_ENCAMINHAMENTOS = """
+    SELECT ee.id_encaminhamento, e.id_exame, e.nome FROM Exame e
+    JOIN Encaminhamento_Exame ee ON e.id_exame = ee.id_exame
+    WHERE ee.id_encaminhamento = ANY(%s)
+    ORDER BY ee.id_encaminhamento, e.id_exame
+"""
+SQL_CONSULTAS_ENCAMINHAMENTOS = """
+    SELECT ec.id_encaminhamento, a.id_agendamento, a.id_paciente, a.data FROM Agendamento a
+    JOIN Encaminhamento_Consulta ec ON a.id_agendamento = ec.id_agendamento AND a.id_paciente = ec.id_paciente
+    WHERE ec.id_encaminhamento = ANY(%s)
+"""
+CHAVE_ENCAMINHAMENTO = ["id_encaminhamento"]
+
+def encaminhamento_response_from_row(enc_base):
+    return EncaminhamentoResponse(
+        id_encaminhamento=enc_base[0],
+        id_agendamento=enc_base[1],
+        id_paciente=enc_base[2],
+        tipo=enc_base[3],
+        observacoes=enc_base[4]
+    )
+
+def tem_exames(tipo):
+    return tipo == TipoEncaminhamento.EXAME or tipo == TipoEncaminhamento.AMBOS
+
+def tem_consulta(tipo):
+    return tipo == TipoEncaminhamento.CONSULTA or tipo == TipoEncaminhamento.AMBOS
+
+# Exames e consultas de vários encaminhamentos são carregados em lote: uma
+# consulta para cada relação, qualquer que seja o tamanho da página.
+def ids_com_exames(encaminhamentos):
+    return [e.id_encaminhamento for e in encaminhamentos if tem_exames(e.tipo)]
+
+def ids_com_consulta(encaminhamentos):
+    return [e.id_encaminhamento for e in encaminhamentos if tem_consulta(e.tipo)]
+
+def anexar_exames(encaminhamentos, rows):
+    por_id = {e.id_encaminhamento: e for e in encaminhamentos}
+    for r in rows:
+        por_id[r[0]].exames.append(ExameInfo(id_exame=r[1], nome=r[2]))
+
+def anexar_consultas(encaminhamentos, rows):
+    por_id = {e.id_encaminhamento: e for e in encaminhamentos}
+    for r in rows:
+        por_id[r[0]].consulta_agendada = AgendamentoInfo(id_agendamento=r[1], id_paciente=r[2], data=r[3])
+
+def carregar_detalhes(cursor, encaminhamentos):
+    ids = ids_com_exames(encaminhamentos)
+    if ids:
+        cursor.execute(SQL_EXAMES_ENCAMINHAMENTOS, (ids,))
+        anexar_exames(encaminhamentos, cursor.fetchall())
+    ids = ids_com_consulta(encaminhamentos)
+    if ids:
+        cursor.execute(SQL_CONSULTAS_ENCAMINHAMENTOS, (ids,))
+        anexar_consultas(encaminhamentos, cursor.fetchall())
+
+async def carregar_detalhes_async(db, encaminhamentos):
+    ids = ids_com_exames(encaminhamentos)
+    if ids:
+        anexar_exames(encaminhamentos, await fetchall_async(db, SQL_EXAMES_ENCAMINHAMENTOS, (ids,)))
+    ids = ids_com_consulta(encaminhamentos)
+    if ids:
+        anexar_consultas(encaminhamentos, await fetchall_async(db, SQL_CONSULTAS_ENCAMINHAMENTOS, (ids,)))
+
+def sql_listar_encaminhamentos(limit, cursor, id_paciente, id_agendamento, tipo):
+    condicao, params = keyset(CHAVE_ENCAMINHAMENTO, cursor)
+    filtros = [condicao] if condicao else []
+    if id_paciente is not None:
+        filtros.append("id_paciente = %s")
+        params.append(id_paciente)
+    if id_agendamento is not None:
+        filtros.append("id_agendamento = %s")
+        params.append(id_agendamento)
+    if tipo is not None:
+        filtros.append("tipo = %s")
+        params.append(tipo.value)
+    sql = SQL_ENCAMINHAMENTO
+    if filtros:
+        sql += " WHERE " + " AND ".join(filtros)
+    sql += order_by(CHAVE_ENCAMINHAMENTO) + " LIMIT %s"
+    return sql, params + [limit + 1]
+
+def pagina_encaminhamentos(rows, limit):
+    rows, next_cursor = paginar(rows, limit, lambda r: [r[0]])
+    return EncaminhamentoPage(items=[encaminhamento_response_from_row(r) for r in rows], next_cursor=next_cursor)
+
+@router.get("/", response_model=EncaminhamentoPage)
+def listar_encaminhamentos(
+    id_paciente: Optional[int] = None,
+    id_agendamento: Optional[int] = None,
+    tipo: Optional[TipoEncaminhamento] = None,
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+    db=Depends(get_db_leitura)
+):
+    sql, params = sql_listar_encaminhamentos(limit, cursor, id_paciente, id_agendamento, tipo)
+    db_cursor = db.cursor()
+    try:
+        db_cursor.execute(sql, params)
+        pagina = pagina_encaminhamentos(db_cursor.fetchall(), limit)
+        carregar_detalhes(db_cursor, pagina.items)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao listar encaminhamentos: {e}")
+    finally:
+        db_cursor.close()
+    return pagina
+
 @router.get("/{id_encaminhamento}", response_model=EncaminhamentoResponse)
-def obter_encaminhamento(id_encaminhamento: int, db=Depends(get_db)):
+def obter_encaminhamento(id_encaminhamento: int, db=Depends(get_db_leitura)):
     cursor = db.cursor()
     try:
-        cursor.execute("SELECT id_encaminhamento, id_agendamento, id_paciente, tipo, observacoes FROM Encaminhamento WHERE id_encaminhamento = %s", (id_encaminhamento,))
+        preparadas.executar(cursor, PREP_GET_ENCAMINHAMENTO, (id_encaminhamento,))
         enc_base = cursor.fetchone()
         if not enc_base:
             raise HTTPException(status_code=404, detail="Encaminhamento não encontrado.")
 
-        enc_obj = Encaminhamento(
-            id_encaminhamento=enc_base[0],
-            id_agendamento=enc_base[1],
-            id_paciente=enc_base[2],
-            tipo=enc_base[3],
-            observacoes=enc_base[4]
-        )
-        response = EncaminhamentoResponse(**enc_obj.dict())
-
-        if enc_obj.tipo == TipoEncaminhamento.EXAME or enc_obj.tipo == TipoEncaminhamento.AMBOS:
-            cursor.execute("""
-                SELECT e.id_exame, e.nome FROM Exame e
-                JOIN Encaminhamento_Exame ee ON e.id_exame = ee.id_exame
-                WHERE ee.id_encaminhamento = %s
-            """, (id_encaminhamento,))
-            response.exames = [ExameInfo(id_exame=r[0], nome=r[1]) for r in cursor.fetchall()]
-
-        if enc_obj.tipo == TipoEncaminhamento.CONSULTA or enc_obj.tipo == TipoEncaminhamento.AMBOS:
-            cursor.execute("""
-                SELECT a.id_agendamento, a.id_paciente, a.data FROM Agendamento a
-                JOIN Encaminhamento_Consulta ec ON a.id_agendamento = ec.id_agendamento AND a.id_paciente = ec.id_paciente
-                WHERE ec.id_encaminhamento = %s
-            """, (id_encaminhamento,))
-            row = cursor.fetchone()
-            if row:
-                response.consulta_agendada = AgendamentoInfo(id_agendamento=row[0], id_paciente=row[1], data=row[2])
+        response = encaminhamento_response_from_row(enc_base)
+        carregar_detalhes(cursor, [response])
     finally:
         cursor.close()
-    return response
\ No newline at end of file
+    return response
+
+
+router_async = APIRouter(route_class=RotaInstrumentada, dependencies=[Depends(etag_async("Encaminhamento", "Encaminhamento_Exame", "Encaminhamento_Consulta", "Exame", "Agendamento"))])
+
+@router_async.get("/", response_model=EncaminhamentoPage)
+async def listar_encaminhamentos_async(
+    id_paciente: Optional[int] = None,
+    id_agendamento: Optional[int] = None,
+    tipo: Optional[TipoEncaminhamento] = None,
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+    db=Depends(get_db_async)
+):
+    sql, params = sql_listar_encaminhamentos(limit, cursor, id_paciente, id_agendamento, tipo)
+    try:
+        pagina = pagina_encaminhamentos(await fetchall_async(db, sql, params), limit)
+        await carregar_detalhes_async(db, pagina.items)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao listar encaminhamentos: {e}")
+    return pagina
+
+@router_async.get("/{id_encaminhamento}", response_model=EncaminhamentoResponse)
+async def obter_encaminhamento_async(id_encaminhamento: int, db=Depends(get_db_async)):
+    enc_base = await fetchone_async(db, SQL_GET_ENCAMINHAMENTO, (id_encaminhamento,))
+    if not enc_base:
+        raise HTTPException(status_code=404, detail="Encaminhamento não encontrado.")
+
+    response = encaminhamento_response_from_row(enc_base)
+    await carregar_detalhes_async(db, [response])
+    return response
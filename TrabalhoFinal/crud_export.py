@@ -0,0 +1,116 @@
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from datetime import date, datetime
+from enum import Enum
+from replica import pool_leitura
+from metricas import RotaInstrumentada
+import csv
+import io
+import json
+
+router = APIRouter(route_class=RotaInstrumentada)
+
+class FormatoExport(str, Enum):
+    NDJSON = 'ndjson'
+    CSV = 'csv'
+
+EXPORTS = {
+    "agendamentos": {
+        "sql": "SELECT id_agendamento, id_paciente, data, observacoes, status FROM Agendamento",
+        "colunas": ["id_agendamento", "id_paciente", "data", "observacoes", "status"],
+        "coluna_data": "data",
+        "ordem": "id_agendamento, id_paciente",
+    },
+    "consultas": {
+        "sql": "SELECT crm, id_agendamento, id_paciente, data_hora, diagnostico, observacoes FROM Consulta",
+        "colunas": ["crm", "id_agendamento", "id_paciente", "data_hora", "diagnostico", "observacoes"],
+        "coluna_data": "data_hora",
+        "ordem": "crm, id_agendamento, id_paciente",
+    },
+    "encaminhamentos": {
+        "sql": """
+            SELECT e.id_encaminhamento, e.id_agendamento, e.id_paciente, e.tipo, e.observacoes, a.data
+            FROM Encaminhamento e
+            JOIN Agendamento a ON a.id_agendamento = e.id_agendamento AND a.id_paciente = e.id_paciente
+        """,
+        "colunas": ["id_encaminhamento", "id_agendamento", "id_paciente", "tipo", "observacoes", "data_agendamento"],
+        "coluna_data": "a.data",
+        "ordem": "e.id_encaminhamento",
+    },
+}
+
+def _valor_json(valor):
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    return valor
+
+def _linhas(pool, tabela, sql, params, colunas, formato, itersize):
+    # A conexão é obtida só quando o envio começa e fica presa ao cursor nomeado
+    # (server-side) até o fim do stream; o Postgres entrega itersize linhas por vez.
+    conn = pool.getconn()
+    try:
+        cursor = conn.cursor(name=f"export_{tabela}")
+        cursor.itersize = itersize
+        cursor.execute(sql, params)
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if formato == FormatoExport.CSV:
+            writer.writerow(colunas)
+
+        pendentes = 0
+        for row in cursor:
+            if formato == FormatoExport.CSV:
+                writer.writerow(row)
+            else:
+                buffer.write(json.dumps({c: _valor_json(v) for c, v in zip(colunas, row)}, ensure_ascii=False))
+                buffer.write("\n")
+            pendentes += 1
+            if pendentes >= itersize:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+                pendentes = 0
+        if buffer.tell():
+            yield buffer.getvalue()
+        cursor.close()
+    finally:
+        pool.putconn(conn)
+
+@router.get("/{tabela}", summary="Exportação completa em NDJSON ou CSV (agendamentos, consultas, encaminhamentos)")
+def exportar(
+    request: Request,
+    tabela: str,
+    formato: FormatoExport = FormatoExport.NDJSON,
+    inicio: Optional[datetime] = None,
+    fim: Optional[datetime] = None,
+    itersize: int = Query(2000, ge=100, le=50000)
+):
+    export = EXPORTS.get(tabela)
+    if not export:
+        raise HTTPException(status_code=404, detail=f"Exportação não disponível para '{tabela}'.")
+
+    filtros = []
+    params = []
+    if inicio:
+        filtros.append(f"{export['coluna_data']} >= %s")
+        params.append(inicio)
+    if fim:
+        filtros.append(f"{export['coluna_data']} < %s")
+        params.append(fim)
+
+    sql = export["sql"]
+    if filtros:
+        sql += " WHERE " + " AND ".join(filtros)
+    sql += " ORDER BY " + export["ordem"]
+
+    if formato == FormatoExport.CSV:
+        media_type = "text/csv; charset=utf-8"
+    else:
+        media_type = "application/x-ndjson"
+    return StreamingResponse(
+        _linhas(pool_leitura(request), tabela, sql, params, export["colunas"], formato, itersize),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{tabela}.{formato.value}"'}
+    )
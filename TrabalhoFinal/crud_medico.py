@@ -1,9 +1,25 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Query, status
 from typing import List, Optional
-from models import Medico, MedicoCreate, MedicoUpdate
+from datetime import datetime, timedelta
+from models import Medico, MedicoCreate, MedicoUpdate, MedicoPage, DisponibilidadeMedico, IntervaloLivre
 from db import get_db
+from replica import get_db_leitura
+from metricas import RotaInstrumentada
+from db_async import get_db_async, fetchall_async, fetchone_async
+from alteracoes import notificar_alteracao
+from etag import etag, etag_async
+from preparadas import preparadas
+from paginacao import LIMITE_PADRAO, LIMITE_MAXIMO, keyset, order_by, paginar
+from atualizacao import campos_alterados, sql_atualizar
+from disponibilidade import (
+    DISPONIBILIDADE_MAX_DIAS, SQL_OCUPADOS, agrupar_por_medico, hora_local, intervalos_livres, params_ocupados
+)
 
-router = APIRouter()
+router = APIRouter(route_class=RotaInstrumentada, dependencies=[Depends(etag("Medico"))])
+# /disponibilidade lê também Consulta: fica num router próprio, incluído em
+# main.py antes deste (e de /{crm}), para que a ETag venha de uma só leitura
+# das versões.
+router_disponibilidade = APIRouter(route_class=RotaInstrumentada, dependencies=[Depends(etag("Medico", "Consulta"))])
 
 @router.post("/", response_model=Medico, status_code=status.HTTP_201_CREATED)
 def criar_medico(medico: MedicoCreate, db=Depends(get_db)):
@@ -15,6 +31,7 @@ def criar_medico(medico: MedicoCreate, db=Depends(get_db)):
         )
         new_medico_data = cursor.fetchone()
         db.commit()
+        notificar_alteracao("Medico")
     except Exception as e:
         db.rollback()
         if "duplicate key value violates unique constraint" in str(e):
@@ -25,61 +42,102 @@ def criar_medico(medico: MedicoCreate, db=Depends(get_db)):
 
     return Medico(crm=new_medico_data[0], nome=new_medico_data[1], especialidade=new_medico_data[2])
 
-@router.get("/", response_model=List[Medico])
-def listar_medicos(db=Depends(get_db)):
-    cursor = db.cursor()
+SQL_MEDICO = "SELECT crm, nome, especialidade FROM Medico"
+SQL_GET_MEDICO = SQL_MEDICO + " WHERE crm=%s"
+PREP_GET_MEDICO = preparadas.registrar("get_medico", SQL_GET_MEDICO)
+CHAVE_MEDICO = ["crm"]
+
+def medico_from_row(r):
+    return Medico(crm=r[0], nome=r[1], especialidade=r[2])
+
+def sql_listar_medicos(limit, cursor):
+    condicao, params = keyset(CHAVE_MEDICO, cursor)
+    sql = SQL_MEDICO
+    if condicao:
+        sql += " WHERE " + condicao
+    sql += order_by(CHAVE_MEDICO) + " LIMIT %s"
+    return sql, params + [limit + 1]
+
+def pagina_medicos(rows, limit):
+    rows, next_cursor = paginar(rows, limit, lambda r: [r[0]])
+    return MedicoPage(items=[medico_from_row(r) for r in rows], next_cursor=next_cursor)
+
+@router.get("/", response_model=MedicoPage)
+def listar_medicos(
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+    db=Depends(get_db_leitura)
+):
+    sql, params = sql_listar_medicos(limit, cursor)
+    db_cursor = db.cursor()
     try:
-        cursor.execute("SELECT crm, nome, especialidade FROM Medico")
-        rows = cursor.fetchall()
+        db_cursor.execute(sql, params)
+        rows = db_cursor.fetchall()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao listar médicos: {e}")
     finally:
-        cursor.close()
+        db_cursor.close()
+
+    return pagina_medicos(rows, limit)
+
+def periodo_disponibilidade(inicio, fim):
+    inicio, fim = hora_local(inicio), hora_local(fim)
+    if fim <= inicio:
+        raise HTTPException(status_code=400, detail="'fim' deve ser posterior a 'inicio'.")
+    if fim - inicio > timedelta(days=DISPONIBILIDADE_MAX_DIAS):
+        raise HTTPException(status_code=400, detail=f"Intervalo máximo da disponibilidade é de {DISPONIBILIDADE_MAX_DIAS} dias.")
+    return inicio, fim
 
+def disponibilidade_from_rows(inicio, fim, rows):
     return [
-        Medico(crm=r[0], nome=r[1], especialidade=r[2]) for r in rows
+        DisponibilidadeMedico(
+            crm=crm,
+            nome=nome,
+            livres=[IntervaloLivre(inicio=a, fim=b) for a, b in intervalos_livres(inicio, fim, ocupados)]
+        )
+        for crm, (nome, ocupados) in agrupar_por_medico(rows).items()
     ]
 
+@router_disponibilidade.get("/disponibilidade", response_model=List[DisponibilidadeMedico])
+def disponibilidade_medicos(
+    especialidade: str,
+    inicio: datetime,
+    fim: datetime,
+    db=Depends(get_db_leitura)
+):
+    inicio, fim = periodo_disponibilidade(inicio, fim)
+    cursor = db.cursor()
+    try:
+        cursor.execute(SQL_OCUPADOS, params_ocupados(especialidade, inicio, fim))
+        rows = cursor.fetchall()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao calcular disponibilidade: {e}")
+    finally:
+        cursor.close()
+
+    return disponibilidade_from_rows(inicio, fim, rows)
+
 @router.get("/{crm}", response_model=Medico)
-def get_medico(crm: str, db=Depends(get_db)):
+def get_medico(crm: str, db=Depends(get_db_leitura)):
     cursor = db.cursor()
-    cursor.execute(
-        "SELECT crm, nome, especialidade FROM Medico WHERE crm=%s",
-        (crm,)
-    )
+    preparadas.executar(cursor, PREP_GET_MEDICO, (crm,))
     row = cursor.fetchone()
     cursor.close()
     if not row:
         raise HTTPException(status_code=404, detail="Médico não encontrado.")
-    return Medico(crm=row[0], nome=row[1], especialidade=row[2])
+    return medico_from_row(row)
 
 @router.patch("/{crm}", response_model=Medico)
 def atualizar_medico(crm: str, medico_update: MedicoUpdate, db=Depends(get_db)):
-    cursor = db.cursor()
-    cursor.execute(
-        "SELECT crm, nome, especialidade FROM Medico WHERE crm=%s",
-        (crm,)
-    )
-    row = cursor.fetchone()
-    if not row:
-        cursor.close()
-        raise HTTPException(status_code=404, detail="Médico não encontrado.")
-
-    medico_existente = Medico(
-        crm=row[0],
-        nome=row[1],
-        especialidade=row[2]
-    )
-
-    update_data = medico_update.dict(exclude_unset=True)
-
-    medico_atualizado = medico_existente.copy(update=update_data)
+    campos = campos_alterados(medico_update)
+    if not campos:
+        return get_medico(crm, db)
 
+    sql, params = sql_atualizar("Medico", campos, {"crm": crm}, ["crm", "nome", "especialidade"])
+    cursor = db.cursor()
     try:
-        cursor.execute(
-            "UPDATE Medico SET nome=%s WHERE crm=%s",
-            (medico_atualizado.nome, crm)
-        )
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
         db.commit()
     except Exception as e:
         db.rollback()
@@ -87,7 +145,10 @@ def atualizar_medico(crm: str, medico_update: MedicoUpdate, db=Depends(get_db)):
     finally:
         cursor.close()
 
-    return Medico(crm=crm, nome=medico_atualizado.nome, especialidade=medico_existente.especialidade)
+    if not row:
+        raise HTTPException(status_code=404, detail="Médico não encontrado.")
+    notificar_alteracao("Medico")
+    return medico_from_row(row)
 
 @router.delete("/{crm}", status_code=status.HTTP_204_NO_CONTENT)
 def deletar_medico(crm: str, db=Depends(get_db)):
@@ -100,10 +161,51 @@ def deletar_medico(crm: str, db=Depends(get_db)):
         if cursor.rowcount == 0:
             raise HTTPException(status_code=404, detail="Médico não encontrado.")
         db.commit()
+        notificar_alteracao("Medico")
     except Exception as e:
         db.rollback()
         if "violates foreign key constraint" in str(e):
             raise HTTPException(status_code=409, detail="Não é possível deletar médico com consultas associadas.")
         raise HTTPException(status_code=400, detail=f"Erro ao deletar médico: {e}")
     finally:
-        cursor.close()
\ No newline at end of file
+        cursor.close()
+
+
+router_async = APIRouter(route_class=RotaInstrumentada, dependencies=[Depends(etag_async("Medico"))])
+router_disponibilidade_async = APIRouter(route_class=RotaInstrumentada, dependencies=[Depends(etag_async("Medico", "Consulta"))])
+
+@router_async.get("/", response_model=MedicoPage)
+async def listar_medicos_async(
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+    db=Depends(get_db_async)
+):
+    sql, params = sql_listar_medicos(limit, cursor)
+    try:
+        rows = await fetchall_async(db, sql, params)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao listar médicos: {e}")
+    return pagina_medicos(rows, limit)
+
+# Com DB_MODE=async os routers async vêm primeiro; sem esta rota,
+# /medicos/disponibilidade cairia em get_medico_async.
+@router_disponibilidade_async.get("/disponibilidade", response_model=List[DisponibilidadeMedico])
+async def disponibilidade_medicos_async(
+    especialidade: str,
+    inicio: datetime,
+    fim: datetime,
+    db=Depends(get_db_async)
+):
+    inicio, fim = periodo_disponibilidade(inicio, fim)
+    try:
+        rows = await fetchall_async(db, SQL_OCUPADOS, params_ocupados(especialidade, inicio, fim))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao calcular disponibilidade: {e}")
+    return disponibilidade_from_rows(inicio, fim, rows)
+
+@router_async.get("/{crm}", response_model=Medico)
+async def get_medico_async(crm: str, db=Depends(get_db_async)):
+    row = await fetchone_async(db, SQL_GET_MEDICO, (crm,))
+    if not row:
+        raise HTTPException(status_code=404, detail="Médico não encontrado.")
+    return medico_from_row(row)
@@ -1,9 +1,20 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Query, status
 from typing import List, Optional
-from models import Paciente, PacienteCreate, PacienteUpdate, TelefonePaciente, TelefonePacienteCreate, PacienteResponse, SexoEnum, TipoTelefoneEnum
+from models import Paciente, PacienteCreate, PacienteUpdate, TelefonePaciente, TelefonePacienteCreate, PacienteResponse, PacientePage, SexoEnum, TipoTelefoneEnum, BulkCreateResponse, BulkCreatedItem, BulkRowError
 from db import get_db
+from replica import get_db_leitura
+from metricas import RotaInstrumentada
+from db_async import get_db_async, fetchall_async, fetchone_async
+from alteracoes import notificar_alteracao
+from respostas import JSON_RAPIDO, resposta_pagina
+from etag import etag, etag_async
+from preparadas import preparadas
+from paginacao import LIMITE_PADRAO, LIMITE_MAXIMO, keyset, order_by, paginar
+from atualizacao import campos_alterados, sql_atualizar
+from lote import ler_lote, validar_lote, inserir_lote
+from psycopg2.extras import execute_values
 
-router = APIRouter()
+router = APIRouter(route_class=RotaInstrumentada, dependencies=[Depends(etag("Paciente", "Telefone_Paciente"))])
 
 @router.post("/", response_model=PacienteResponse, status_code=status.HTTP_201_CREATED)
 def criar_paciente(paciente_data: PacienteCreate, db=Depends(get_db)):
@@ -17,6 +28,7 @@ def criar_paciente(paciente_data: PacienteCreate, db=Depends(get_db)):
 
   
         db.commit()
+        notificar_alteracao("Paciente", "Telefone_Paciente")
     except Exception as e:
         db.rollback()
         if "duplicate key value violates unique constraint" in str(e) and "cpf" in str(e).lower():
@@ -27,124 +39,245 @@ def criar_paciente(paciente_data: PacienteCreate, db=Depends(get_db)):
 
     return obter_paciente(new_paciente_id, db)
 
-@router.get("/", response_model=List[PacienteResponse])
-def listar_pacientes(db=Depends(get_db)):
-    cursor = db.cursor()
-    try:
-        cursor.execute("SELECT id_paciente, nome, data_nascimento, sexo, email, cpf FROM Paciente")
-        rows = cursor.fetchall()
+@router.post("/bulk", response_model=BulkCreateResponse, summary="Cria pacientes em lote (array JSON ou NDJSON)")
+def criar_pacientes_em_lote(itens=Depends(ler_lote), db=Depends(get_db)):
+    validos, erros = validar_lote(itens, PacienteCreate)
 
-        pacientes_list = []
-        for p_row in rows:
-            paciente_obj = Paciente(
-                id_paciente=p_row[0],
-                nome=p_row[1],
-                data_nascimento=p_row[2],
-                sexo=SexoEnum(p_row[3]),
-                email=p_row[4],
-                cpf=p_row[5]
-            )
-            response = PacienteResponse(**paciente_obj.dict())
+    unicos = []
+    cpfs = set()
+    for indice, paciente in validos:
+        if paciente.cpf in cpfs:
+            erros.append((indice, "CPF duplicado no lote."))
+        else:
+            cpfs.add(paciente.cpf)
+            unicos.append((indice, paciente))
 
-            cursor.execute(
-                "SELECT numero, tipo FROM Telefone_Paciente WHERE id_paciente = %s",
-                (paciente_obj.id_paciente,)
+    criados = []
+    if unicos:
+        cursor = db.cursor()
+        try:
+            # CPFs já cadastrados são ignorados pelo ON CONFLICT e reportados por linha,
+            # sem abortar o restante do lote.
+            inseridos, rows, falhas = inserir_lote(
+                cursor,
+                "INSERT INTO Paciente (nome, data_nascimento, sexo, email, cpf) VALUES %s ON CONFLICT (cpf) DO NOTHING RETURNING id_paciente, cpf",
+                unicos,
+                lambda p: (p.nome, p.data_nascimento, p.sexo.value, p.email, p.cpf)
             )
-            phone_rows = cursor.fetchall()
-            response.telefones = [TelefonePaciente(id_paciente=paciente_obj.id_paciente, numero=r[0], tipo=TipoTelefoneEnum(r[1])) for r in phone_rows]
-            pacientes_list.append(response)
+            db.commit()
+            notificar_alteracao("Paciente")
+        except Exception as e:
+            db.rollback()
+            raise HTTPException(status_code=400, detail=f"Erro ao criar pacientes em lote: {e}")
+        finally:
+            cursor.close()
+
+        erros += falhas
+        ids_por_cpf = {cpf: id_paciente for id_paciente, cpf in rows}
+        for indice, paciente in inseridos:
+            if paciente.cpf in ids_por_cpf:
+                criados.append(BulkCreatedItem(indice=indice, id=ids_por_cpf[paciente.cpf]))
+            else:
+                erros.append((indice, "CPF já cadastrado."))
+
+    return BulkCreateResponse(
+        criados=criados,
+        erros=[BulkRowError(indice=i, detalhe=d) for i, d in sorted(erros)]
+    )
+
+SQL_PACIENTE_COM_TELEFONES = """
+    SELECT p.id_paciente, p.nome, p.data_nascimento, p.sexo, p.email, p.cpf,
+           COALESCE(
+               json_agg(json_build_object('numero', t.numero, 'tipo', t.tipo) ORDER BY t.numero)
+                   FILTER (WHERE t.id_paciente IS NOT NULL),
+               '[]'
+           ) AS telefones
+    FROM Paciente p
+    LEFT JOIN Telefone_Paciente t ON t.id_paciente = p.id_paciente
+"""
+
+def paciente_response_from_row(p_row):
+    return PacienteResponse(
+        id_paciente=p_row[0],
+        nome=p_row[1],
+        data_nascimento=p_row[2],
+        sexo=SexoEnum(p_row[3]),
+        email=p_row[4],
+        cpf=p_row[5],
+        telefones=[
+            TelefonePaciente(id_paciente=p_row[0], numero=t["numero"], tipo=TipoTelefoneEnum(t["tipo"]))
+            for t in p_row[6]
+        ]
+    )
 
+def paciente_dict_from_row(p_row):
+    return {
+        "id_paciente": p_row[0],
+        "nome": p_row[1],
+        "data_nascimento": p_row[2],
+        "sexo": p_row[3],
+        "email": p_row[4],
+        "cpf": p_row[5],
+        "telefones": [{"id_paciente": p_row[0], "numero": t["numero"], "tipo": t["tipo"]} for t in p_row[6]]
+    }
+
+SQL_GET_PACIENTE = SQL_PACIENTE_COM_TELEFONES + " WHERE p.id_paciente=%s GROUP BY p.id_paciente"
+PREP_GET_PACIENTE = preparadas.registrar("get_paciente", SQL_GET_PACIENTE)
+CHAVE_PACIENTE = ["p.id_paciente"]
+
+def sql_listar_pacientes(limit, cursor):
+    condicao, params = keyset(CHAVE_PACIENTE, cursor)
+    sql = SQL_PACIENTE_COM_TELEFONES
+    if condicao:
+        sql += " WHERE " + condicao
+    sql += " GROUP BY p.id_paciente" + order_by(CHAVE_PACIENTE) + " LIMIT %s"
+    return sql, params + [limit + 1]
+
+def pagina_pacientes(rows, limit):
+    rows, next_cursor = paginar(rows, limit, lambda r: [r[0]])
+    if JSON_RAPIDO:
+        return resposta_pagina([paciente_dict_from_row(r) for r in rows], next_cursor)
+    return PacientePage(items=[paciente_response_from_row(r) for r in rows], next_cursor=next_cursor)
+
+@router.get("/", response_model=PacientePage)
+def listar_pacientes(
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+    db=Depends(get_db_leitura)
+):
+    sql, params = sql_listar_pacientes(limit, cursor)
+    db_cursor = db.cursor()
+    try:
+        db_cursor.execute(sql, params)
+        rows = db_cursor.fetchall()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao listar pacientes: {e}")
     finally:
-        cursor.close()
+        db_cursor.close()
+
+    return pagina_pacientes(rows, limit)
 
-    return pacientes_list
+# Busca por nome (prefixo ou aproximada, sem acentos), CPF exato ou e-mail.
+# Cada ramo usa seu índice (pg_trgm sobre lower(f_unaccent(nome)), lower(email)
+# e o índice único de cpf); ver migracoes/0002_busca_pacientes.sql.
+SQL_BUSCAR_PACIENTES = SQL_PACIENTE_COM_TELEFONES + """
+    JOIN (
+        SELECT id_paciente, MAX(score) AS score FROM (
+            SELECT id_paciente, 3.0 AS score FROM Paciente WHERE cpf = ANY(%(cpfs)s)
+            UNION ALL
+            SELECT id_paciente, 2.0 FROM Paciente WHERE lower(email) = %(email)s
+            UNION ALL
+            SELECT id_paciente, 1.0 + similarity(lower(f_unaccent(nome)), lower(f_unaccent(%(termo)s)))
+            FROM Paciente WHERE lower(f_unaccent(nome)) LIKE lower(f_unaccent(%(prefixo)s))
+            UNION ALL
+            SELECT id_paciente, word_similarity(lower(f_unaccent(%(termo)s)), lower(f_unaccent(nome)))
+            FROM Paciente WHERE lower(f_unaccent(%(termo)s)) <%% lower(f_unaccent(nome))
+        ) candidatos
+        GROUP BY id_paciente
+        ORDER BY score DESC, id_paciente
+        LIMIT %(limit)s
+    ) r ON r.id_paciente = p.id_paciente
+    GROUP BY p.id_paciente, r.score
+    ORDER BY r.score DESC, p.id_paciente
+"""
+
+def params_buscar_pacientes(q, limit):
+    termo = q.strip().lower()
+    prefixo = termo.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    digitos = "".join(c for c in termo if c.isdigit())
+    return {
+        "cpfs": [q.strip(), digitos],
+        "email": termo,
+        "termo": termo,
+        "prefixo": prefixo,
+        "limit": limit,
+    }
+
+@router.get("/search", response_model=List[PacienteResponse], summary="Busca pacientes por nome, CPF ou e-mail")
+def buscar_pacientes(
+    q: str = Query(..., min_length=2),
+    limit: int = Query(20, ge=1, le=100),
+    db=Depends(get_db_leitura)
+):
+    cursor = db.cursor()
+    try:
+        cursor.execute(SQL_BUSCAR_PACIENTES, params_buscar_pacientes(q, limit))
+        rows = cursor.fetchall()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao buscar pacientes: {e}")
+    finally:
+        cursor.close()
+    return [paciente_response_from_row(r) for r in rows]
 
 @router.get("/{id_paciente}", response_model=PacienteResponse)
-def obter_paciente(id_paciente: int, db=Depends(get_db)):
+def obter_paciente(id_paciente: int, db=Depends(get_db_leitura)):
     cursor = db.cursor()
     try:
-        cursor.execute(
-            "SELECT id_paciente, nome, data_nascimento, sexo, email, cpf FROM Paciente WHERE id_paciente=%s",
-            (id_paciente,)
-        )
+        preparadas.executar(cursor, PREP_GET_PACIENTE, (id_paciente,))
         p_row = cursor.fetchone()
         if not p_row:
             raise HTTPException(status_code=404, detail="Paciente não encontrado.")
-
-        paciente_obj = Paciente(
-            id_paciente=p_row[0],
-            nome=p_row[1],
-            data_nascimento=p_row[2],
-            sexo=SexoEnum(p_row[3]),
-            email=p_row[4],
-            cpf=p_row[5]
-        )
-        response = PacienteResponse(**paciente_obj.dict())
-
-        cursor.execute(
-            "SELECT numero, tipo FROM Telefone_Paciente WHERE id_paciente = %s",
-            (id_paciente,)
-        )
-        phone_rows = cursor.fetchall()
-        response.telefones = [TelefonePaciente(id_paciente=id_paciente, numero=r[0], tipo=TipoTelefoneEnum(r[1])) for r in phone_rows]
+        response = paciente_response_from_row(p_row)
     finally:
         cursor.close()
     return response
 
+# O UPDATE devolve a linha já com os telefones (como em SQL_PACIENTE_COM_TELEFONES),
+# então um PATCH sem telefones é uma única ida ao banco.
+SQL_RETORNO_PACIENTE = """
+    SELECT p.id_paciente, p.nome, p.data_nascimento, p.sexo, p.email, p.cpf,
+           COALESCE(
+               (SELECT json_agg(json_build_object('numero', t.numero, 'tipo', t.tipo) ORDER BY t.numero)
+                FROM Telefone_Paciente t WHERE t.id_paciente = p.id_paciente),
+               '[]'
+           ) AS telefones
+    FROM atualizado p
+"""
+
+def atualizar_telefones(cursor, id_paciente, telefones):
+    # Aplica a lista nova como diferença: remove só os números que saíram e
+    # insere só os que entraram (ou mudaram de tipo); os demais não são tocados.
+    desejados = {tel.numero: tel.tipo.value for tel in telefones}
+    cursor.execute(
+        "DELETE FROM Telefone_Paciente WHERE id_paciente = %s AND NOT (numero = ANY(%s))",
+        (id_paciente, list(desejados))
+    )
+    if desejados:
+        execute_values(
+            cursor,
+            """
+            INSERT INTO Telefone_Paciente (id_paciente, numero, tipo) VALUES %s
+            ON CONFLICT (id_paciente, numero) DO UPDATE SET tipo = EXCLUDED.tipo
+            WHERE Telefone_Paciente.tipo IS DISTINCT FROM EXCLUDED.tipo
+            """,
+            [(id_paciente, numero, tipo) for numero, tipo in desejados.items()]
+        )
+    return [
+        TelefonePaciente(id_paciente=id_paciente, numero=numero, tipo=TipoTelefoneEnum(tipo))
+        for numero, tipo in sorted(desejados.items())
+    ]
+
 @router.patch("/{id_paciente}", response_model=PacienteResponse)
 def atualizar_paciente(id_paciente: int, paciente_update: PacienteUpdate, db=Depends(get_db)):
+    campos = campos_alterados(paciente_update, ignorar=("telefones",))
     cursor = db.cursor()
     try:
-        cursor.execute(
-            "SELECT id_paciente, nome, data_nascimento, sexo, email, cpf FROM Paciente WHERE id_paciente=%s",
-            (id_paciente,)
-        )
+        if campos:
+            sql, params = sql_atualizar("Paciente", campos, {"id_paciente": id_paciente}, ["*"])
+            cursor.execute(f"WITH atualizado AS ({sql}) {SQL_RETORNO_PACIENTE}", params)
+        else:
+            preparadas.executar(cursor, PREP_GET_PACIENTE, (id_paciente,))
         p_row = cursor.fetchone()
         if not p_row:
             raise HTTPException(status_code=404, detail="Paciente não encontrado.")
-
-        paciente_existente = Paciente(
-            id_paciente=p_row[0],
-            nome=p_row[1],
-            data_nascimento=p_row[2],
-            sexo=SexoEnum(p_row[3]),
-            email=p_row[4],
-            cpf=p_row[5]
-        )
-
-        update_data = paciente_update.dict(exclude_unset=True)
-
-        if 'sexo' in update_data:
-            update_data['sexo'] = update_data['sexo'].value
-
-        paciente_atualizado = paciente_existente.copy(update=update_data)
-
-        sql_update_paciente = """
-            UPDATE Paciente SET
-                nome=%s, sexo=%s, email=%s
-            WHERE id_paciente=%s
-        """
-        cursor.execute(
-            sql_update_paciente,
-            (
-                paciente_atualizado.nome,
-                paciente_atualizado.sexo.value,
-                paciente_atualizado.email,
-                id_paciente
-            )
-        )
+        response = paciente_response_from_row(p_row)
 
         if paciente_update.telefones is not None:
-            cursor.execute("DELETE FROM Telefone_Paciente WHERE id_paciente = %s", (id_paciente,))
-            if paciente_update.telefones:
-                for tel in paciente_update.telefones:
-                    cursor.execute(
-                        "INSERT INTO Telefone_Paciente (id_paciente, numero, tipo) VALUES (%s, %s, %s)",
-                        (id_paciente, tel.numero, tel.tipo.value)
-                    )
+            response.telefones = atualizar_telefones(cursor, id_paciente, paciente_update.telefones)
         db.commit()
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         if "duplicate key value violates unique constraint" in str(e) and "cpf" in str(e).lower():
@@ -153,7 +286,9 @@ def atualizar_paciente(id_paciente: int, paciente_update: PacienteUpdate, db=Dep
     finally:
         cursor.close()
 
-    return obter_paciente(id_paciente, db)
+    if campos or paciente_update.telefones is not None:
+        notificar_alteracao("Paciente", "Telefone_Paciente")
+    return response
 
 @router.delete("/{id_paciente}", status_code=status.HTTP_204_NO_CONTENT)
 def deletar_paciente(id_paciente: int, db=Depends(get_db)):
@@ -170,10 +305,46 @@ def deletar_paciente(id_paciente: int, db=Depends(get_db)):
         if cursor.rowcount == 0:
             raise HTTPException(status_code=404, detail="Paciente não encontrado.")
         db.commit()
+        notificar_alteracao("Paciente", "Telefone_Paciente")
     except Exception as e:
         db.rollback()
         if "violates foreign key constraint" in str(e):
             raise HTTPException(status_code=409, detail="Não é possível deletar paciente com agendamentos, consultas ou encaminhamentos associados. Remova as associações primeiro.")
         raise HTTPException(status_code=400, detail=f"Erro ao deletar paciente: {e}")
     finally:
-        cursor.close()
\ No newline at end of file
+        cursor.close()
+
+
+router_async = APIRouter(route_class=RotaInstrumentada, dependencies=[Depends(etag_async("Paciente", "Telefone_Paciente"))])
+
+@router_async.get("/", response_model=PacientePage)
+async def listar_pacientes_async(
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+    db=Depends(get_db_async)
+):
+    sql, params = sql_listar_pacientes(limit, cursor)
+    try:
+        rows = await fetchall_async(db, sql, params)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao listar pacientes: {e}")
+    return pagina_pacientes(rows, limit)
+
+@router_async.get("/search", response_model=List[PacienteResponse], summary="Busca pacientes por nome, CPF ou e-mail")
+async def buscar_pacientes_async(
+    q: str = Query(..., min_length=2),
+    limit: int = Query(20, ge=1, le=100),
+    db=Depends(get_db_async)
+):
+    try:
+        rows = await fetchall_async(db, SQL_BUSCAR_PACIENTES, params_buscar_pacientes(q, limit))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao buscar pacientes: {e}")
+    return [paciente_response_from_row(r) for r in rows]
+
+@router_async.get("/{id_paciente}", response_model=PacienteResponse)
+async def obter_paciente_async(id_paciente: int, db=Depends(get_db_async)):
+    p_row = await fetchone_async(db, SQL_GET_PACIENTE, (id_paciente,))
+    if not p_row:
+        raise HTTPException(status_code=404, detail="Paciente não encontrado.")
+    return paciente_response_from_row(p_row)
@@ -1,69 +1,51 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
-from db import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List, Optional
+from replica import get_db_leitura
+from metricas import RotaInstrumentada
+from db_async import get_db_async, fetchall_async, fetchone_async
+from views_materializadas import scheduler, staleness
+from cache import cacheado
+from etag import etag, etag_async
 from models import (
     AgendamentoStatusReport, MedicoTotalConsultasReport, EncaminhamentoTipoReport,
     PacienteCardiologiaReport, CategoriaPacienteReport, UltimoAgendamentoPacienteReport,
-    ConsultasEncaminhamentosReport, ExamesConsultasPacienteReport
+    ConsultasEncaminhamentosReport, ExamesConsultasPacienteReport, DashboardResponse
 )
 
-router = APIRouter()
+router = APIRouter(route_class=RotaInstrumentada)
 
-@router.get("/agendamentos-por-status", response_model=List[AgendamentoStatusReport], summary="Número de agendamentos por status")
-def get_agendamentos_por_status(db=Depends(get_db)):
-    cursor = db.cursor()
-    try:
-        cursor.execute("REFRESH MATERIALIZED VIEW categoria_paciente") 
-        cursor.execute("REFRESH MATERIALIZED VIEW ultimo_agendamento_paciente")
-        cursor.execute("REFRESH MATERIALIZED VIEW consultas_encaminhamentos")
-        cursor.execute("REFRESH MATERIALIZED VIEW exames_consultas_por_paciente")
-        db.commit() 
-
-        cursor.execute("SELECT status, COUNT(*) AS total FROM Agendamento GROUP BY status")
-        rows = cursor.fetchall()
-        return [AgendamentoStatusReport(status=r[0], total=r[1]) for r in rows]
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao obter agendamentos por status: {e}")
-    finally:
-        cursor.close()
-
-@router.get("/medicos-total-consultas", response_model=List[MedicoTotalConsultasReport], summary="Médicos que realizaram consultas, com contagem")
-def get_medicos_total_consultas(db=Depends(get_db)):
-    cursor = db.cursor()
-    try:
-        cursor.execute("""
+# Os três primeiros relatórios leem as contagens mantidas por gatilho
+# (migracoes/0007_contadores.sql) em vez de agrupar as tabelas inteiras.
+RELATORIOS = {
+    "agendamentos-por-status": {
+        "sql": "SELECT status, SUM(total)::bigint AS total FROM contagem_agendamento_status GROUP BY status HAVING SUM(total) > 0",
+        "from_row": lambda r: AgendamentoStatusReport(status=r[0], total=r[1]),
+        "erro": "Erro ao obter agendamentos por status",
+        "tabelas": ("Agendamento",),
+    },
+    "medicos-total-consultas": {
+        "sql": """
             SELECT
                 m.nome AS medico,
-                COUNT(*) AS total_consultas
-            FROM Consulta c
+                SUM(c.total)::bigint AS total_consultas
+            FROM contagem_consultas_medico c
             JOIN Medico m ON c.crm = m.crm
             GROUP BY m.nome
+            HAVING SUM(c.total) > 0
             ORDER BY total_consultas DESC
-        """)
-        rows = cursor.fetchall()
-        return [MedicoTotalConsultasReport(medico=r[0], total_consultas=r[1]) for r in rows]
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao obter médicos e total de consultas: {e}")
-    finally:
-        cursor.close()
-
-@router.get("/encaminhamentos-por-tipo", response_model=List[EncaminhamentoTipoReport], summary="Quantidade de encaminhamentos por tipo")
-def get_encaminhamentos_por_tipo(db=Depends(get_db)):
-    cursor = db.cursor()
-    try:
-        cursor.execute("SELECT tipo, COUNT(*) AS quantidade FROM Encaminhamento GROUP BY tipo")
-        rows = cursor.fetchall()
-        return [EncaminhamentoTipoReport(tipo=r[0], quantidade=r[1]) for r in rows]
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao obter encaminhamentos por tipo: {e}")
-    finally:
-        cursor.close()
-
-@router.get("/pacientes-cardiologia", response_model=List[PacienteCardiologiaReport], summary="Pacientes que fizeram consultas com médicos da especialidade 'Cardiologia'")
-def get_pacientes_cardiologia(db=Depends(get_db)):
-    cursor = db.cursor()
-    try:
-        cursor.execute("""
+        """,
+        "from_row": lambda r: MedicoTotalConsultasReport(medico=r[0], total_consultas=r[1]),
+        "erro": "Erro ao obter médicos e total de consultas",
+        "tabelas": ("Consulta", "Medico"),
+    },
+    "encaminhamentos-por-tipo": {
+        "sql": "SELECT tipo, SUM(total)::bigint AS quantidade FROM contagem_encaminhamento_tipo GROUP BY tipo HAVING SUM(total) > 0",
+        "from_row": lambda r: EncaminhamentoTipoReport(tipo=r[0], quantidade=r[1]),
+        "erro": "Erro ao obter encaminhamentos por tipo",
+        "tabelas": ("Encaminhamento",),
+    },
+    "pacientes-cardiologia": {
+        "sql": """
             SELECT DISTINCT
                 p.nome AS paciente,
                 m.nome AS medico,
@@ -73,74 +55,227 @@ def get_pacientes_cardiologia(db=Depends(get_db)):
             JOIN Agendamento a ON c.id_agendamento = a.id_agendamento AND c.id_paciente = a.id_paciente
             JOIN Paciente p ON a.id_paciente = p.id_paciente
             WHERE m.especialidade = 'Cardiologia'
-        """)
-        rows = cursor.fetchall()
-        return [PacienteCardiologiaReport(paciente=r[0], medico=r[1], especialidade=r[2]) for r in rows]
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao obter pacientes da cardiologia: {e}")
-    finally:
-        cursor.close()
+        """,
+        "from_row": lambda r: PacienteCardiologiaReport(paciente=r[0], medico=r[1], especialidade=r[2]),
+        "erro": "Erro ao obter pacientes da cardiologia",
+        "tabelas": ("Consulta", "Medico", "Agendamento", "Paciente"),
+    },
+    "categoria-paciente": {
+        "sql": "SELECT nome, total_agendamentos, categoria FROM categoria_paciente",
+        "from_row": lambda r: CategoriaPacienteReport(nome=r[0], total_agendamentos=r[1], categoria=r[2]),
+        "erro": "Erro ao obter categoria de paciente",
+        "tabelas": ("categoria_paciente",),
+        "view": "categoria_paciente",
+    },
+    "ultimo-agendamento-paciente": {
+        "sql": "SELECT nome, telefone_paciente, tipo_telefone, status FROM ultimo_agendamento_paciente",
+        "from_row": lambda r: UltimoAgendamentoPacienteReport(nome=r[0], telefone_paciente=r[1], tipo_telefone=r[2], status=r[3]),
+        "erro": "Erro ao obter último agendamento por paciente",
+        "tabelas": ("ultimo_agendamento_paciente",),
+        "view": "ultimo_agendamento_paciente",
+    },
+    "consultas-encaminhamentos": {
+        "sql": "SELECT nome_medico, especialidade, nome_paciente, diagnostico, data_consulta, tipo_encaminhamento FROM consultas_encaminhamentos",
+        "from_row": lambda r: ConsultasEncaminhamentosReport(
+            nome_medico=r[0],
+            especialidade=r[1],
+            nome_paciente=r[2],
+            diagnostico=r[3],
+            data_consulta=r[4],
+            tipo_encaminhamento=r[5]
+        ),
+        "erro": "Erro ao obter consultas e encaminhamentos",
+        "tabelas": ("consultas_encaminhamentos",),
+        "view": "consultas_encaminhamentos",
+    },
+    "exames-consultas-por-paciente": {
+        "sql": "SELECT nome_paciente, count, exames_realizados, total_consultas FROM exames_consultas_por_paciente",
+        "from_row": lambda r: ExamesConsultasPacienteReport(
+            nome_paciente=r[0],
+            count=r[1],
+            exames_realizados=r[2],
+            total_consultas=r[3]
+        ),
+        "erro": "Erro ao obter exames e consultas por paciente",
+        "tabelas": ("exames_consultas_por_paciente",),
+        "view": "exames_consultas_por_paciente",
+    },
+}
 
-@router.get("/categoria-paciente", response_model=List[CategoriaPacienteReport], summary="Visão de categorização de pacientes por frequência de agendamentos")
-def get_categoria_paciente(db=Depends(get_db)):
+def executar_relatorio(db, nome):
+    relatorio = RELATORIOS[nome]
     cursor = db.cursor()
     try:
-
-        cursor.execute("SELECT nome, total_agendamentos, categoria FROM categoria_paciente")
+        cursor.execute(relatorio["sql"])
         rows = cursor.fetchall()
-        return [CategoriaPacienteReport(nome=r[0], total_agendamentos=r[1], categoria=r[2]) for r in rows]
+        return [relatorio["from_row"](r) for r in rows]
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao obter categoria de paciente: {e}")
+        raise HTTPException(status_code=500, detail=f"{relatorio['erro']}: {e}")
     finally:
         cursor.close()
 
-@router.get("/ultimo-agendamento-paciente", response_model=List[UltimoAgendamentoPacienteReport], summary="Visão do último agendamento e contato do paciente")
-def get_ultimo_agendamento_paciente(db=Depends(get_db)):
-    cursor = db.cursor()
+async def executar_relatorio_async(db, nome):
+    relatorio = RELATORIOS[nome]
     try:
-
-        cursor.execute("SELECT nome, telefone_paciente, tipo_telefone, status FROM ultimo_agendamento_paciente")
-        rows = cursor.fetchall()
-        return [UltimoAgendamentoPacienteReport(nome=r[0], telefone_paciente=r[1], tipo_telefone=r[2], status=r[3]) for r in rows]
+        rows = await fetchall_async(db, relatorio["sql"])
+        return [relatorio["from_row"](r) for r in rows]
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao obter último agendamento por paciente: {e}")
-    finally:
-        cursor.close()
+        raise HTTPException(status_code=500, detail=f"{relatorio['erro']}: {e}")
+
+def selecionar_relatorios(reports):
+    if not reports:
+        return tuple(RELATORIOS)
+    nomes = tuple(dict.fromkeys(n.strip() for n in reports.split(",") if n.strip()))
+    desconhecidos = [n for n in nomes if n not in RELATORIOS]
+    if desconhecidos:
+        raise HTTPException(status_code=400, detail=f"Relatório desconhecido: {', '.join(desconhecidos)}")
+    return nomes
+
+def sql_dashboard(nomes):
+    # Um único SELECT com um json_agg por relatório: uma ida ao banco para o painel inteiro.
+    colunas = ",\n".join(
+        f"(SELECT COALESCE(json_agg(r), '[]') FROM ({RELATORIOS[nome]['sql']}) r)" for nome in nomes
+    )
+    return f"SELECT {colunas}"
+
+def dashboard_from_row(nomes, row):
+    return {
+        nome: [RELATORIOS[nome]["from_row"](list(item.values())) for item in itens]
+        for nome, itens in zip(nomes, row)
+    }
+
+def tabelas_dashboard(nomes):
+    return {t for nome in nomes for t in RELATORIOS[nome]["tabelas"]}
+
+def views_dashboard(nomes):
+    views = {}
+    for nome in nomes:
+        view = RELATORIOS[nome].get("view")
+        if view:
+            estado = scheduler.estados[view]
+            views[view] = {"ultimo_refresh": estado.ultimo_refresh, "staleness_s": estado.staleness()}
+    return views
 
-@router.get("/consultas-encaminhamentos", response_model=List[ConsultasEncaminhamentosReport], summary="Visão de consultas e tipos de encaminhamentos gerados")
-def get_consultas_encaminhamentos(db=Depends(get_db)):
+def calcular_dashboard(db, nomes):
     cursor = db.cursor()
     try:
-
-        cursor.execute("SELECT nome_medico, especialidade, nome_paciente, diagnostico, data_consulta, tipo_encaminhamento FROM consultas_encaminhamentos")
-        rows = cursor.fetchall()
-        return [ConsultasEncaminhamentosReport(
-            nome_medico=r[0],
-            especialidade=r[1],
-            nome_paciente=r[2],
-            diagnostico=r[3],
-            data_consulta=r[4],
-            tipo_encaminhamento=r[5]
-        ) for r in rows]
+        cursor.execute(sql_dashboard(nomes))
+        return dashboard_from_row(nomes, cursor.fetchone())
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao obter consultas e encaminhamentos: {e}")
+        raise HTTPException(status_code=500, detail=f"Erro ao obter painel de relatórios: {e}")
     finally:
         cursor.close()
 
-@router.get("/exames-consultas-por-paciente", response_model=List[ExamesConsultasPacienteReport], summary="Visão de exames e consultas por paciente")
-def get_exames_consultas_por_paciente(db=Depends(get_db)):
-    cursor = db.cursor()
+async def calcular_dashboard_async(db, nomes):
     try:
-        
-        cursor.execute("SELECT nome_paciente, count, exames_realizados, total_consultas FROM exames_consultas_por_paciente")
-        rows = cursor.fetchall()
-        return [ExamesConsultasPacienteReport(
-            nome_paciente=r[0],
-            count=r[1],
-            exames_realizados=r[2],
-            total_consultas=r[3]
-        ) for r in rows]
+        row = await fetchone_async(db, sql_dashboard(nomes))
+        return dashboard_from_row(nomes, row)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao obter exames e consultas por paciente: {e}")
-    finally:
-        cursor.close()
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Erro ao obter painel de relatórios: {e}")
+
+@cacheado(*tabelas_dashboard(RELATORIOS))
+def _dashboard(nomes, db):
+    return calcular_dashboard(db, nomes)
+
+@cacheado(*tabelas_dashboard(RELATORIOS))
+async def _dashboard_async(nomes, db):
+    return await calcular_dashboard_async(db, nomes)
+
+@router.get("/dashboard", response_model=DashboardResponse, summary="Todos os relatórios (ou os escolhidos em ?reports=) em uma só requisição", dependencies=[Depends(etag(*tabelas_dashboard(RELATORIOS)))])
+def get_dashboard(
+    reports: Optional[str] = Query(None, description="Relatórios separados por vírgula; todos se omitido"),
+    db=Depends(get_db_leitura)
+):
+    nomes = selecionar_relatorios(reports)
+    return {"relatorios": _dashboard(nomes, db=db), "views": views_dashboard(nomes)}
+
+@router.get("/agendamentos-por-status", response_model=List[AgendamentoStatusReport], summary="Número de agendamentos por status", dependencies=[Depends(etag(*RELATORIOS["agendamentos-por-status"]["tabelas"]))])
+@cacheado(*RELATORIOS["agendamentos-por-status"]["tabelas"])
+def get_agendamentos_por_status(db=Depends(get_db_leitura)):
+    return executar_relatorio(db, "agendamentos-por-status")
+
+@router.get("/medicos-total-consultas", response_model=List[MedicoTotalConsultasReport], summary="Médicos que realizaram consultas, com contagem", dependencies=[Depends(etag(*RELATORIOS["medicos-total-consultas"]["tabelas"]))])
+@cacheado(*RELATORIOS["medicos-total-consultas"]["tabelas"])
+def get_medicos_total_consultas(db=Depends(get_db_leitura)):
+    return executar_relatorio(db, "medicos-total-consultas")
+
+@router.get("/encaminhamentos-por-tipo", response_model=List[EncaminhamentoTipoReport], summary="Quantidade de encaminhamentos por tipo", dependencies=[Depends(etag(*RELATORIOS["encaminhamentos-por-tipo"]["tabelas"]))])
+@cacheado(*RELATORIOS["encaminhamentos-por-tipo"]["tabelas"])
+def get_encaminhamentos_por_tipo(db=Depends(get_db_leitura)):
+    return executar_relatorio(db, "encaminhamentos-por-tipo")
+
+@router.get("/pacientes-cardiologia", response_model=List[PacienteCardiologiaReport], summary="Pacientes que fizeram consultas com médicos da especialidade 'Cardiologia'", dependencies=[Depends(etag(*RELATORIOS["pacientes-cardiologia"]["tabelas"]))])
+@cacheado(*RELATORIOS["pacientes-cardiologia"]["tabelas"])
+def get_pacientes_cardiologia(db=Depends(get_db_leitura)):
+    return executar_relatorio(db, "pacientes-cardiologia")
+
+@router.get("/categoria-paciente", response_model=List[CategoriaPacienteReport], summary="Visão de categorização de pacientes por frequência de agendamentos", dependencies=[Depends(etag(*RELATORIOS["categoria-paciente"]["tabelas"])), Depends(staleness("categoria_paciente"))])
+@cacheado(*RELATORIOS["categoria-paciente"]["tabelas"])
+def get_categoria_paciente(db=Depends(get_db_leitura)):
+    return executar_relatorio(db, "categoria-paciente")
+
+@router.get("/ultimo-agendamento-paciente", response_model=List[UltimoAgendamentoPacienteReport], summary="Visão do último agendamento e contato do paciente", dependencies=[Depends(etag(*RELATORIOS["ultimo-agendamento-paciente"]["tabelas"])), Depends(staleness("ultimo_agendamento_paciente"))])
+@cacheado(*RELATORIOS["ultimo-agendamento-paciente"]["tabelas"])
+def get_ultimo_agendamento_paciente(db=Depends(get_db_leitura)):
+    return executar_relatorio(db, "ultimo-agendamento-paciente")
+
+@router.get("/consultas-encaminhamentos", response_model=List[ConsultasEncaminhamentosReport], summary="Visão de consultas e tipos de encaminhamentos gerados", dependencies=[Depends(etag(*RELATORIOS["consultas-encaminhamentos"]["tabelas"])), Depends(staleness("consultas_encaminhamentos"))])
+@cacheado(*RELATORIOS["consultas-encaminhamentos"]["tabelas"])
+def get_consultas_encaminhamentos(db=Depends(get_db_leitura)):
+    return executar_relatorio(db, "consultas-encaminhamentos")
+
+@router.get("/exames-consultas-por-paciente", response_model=List[ExamesConsultasPacienteReport], summary="Visão de exames e consultas por paciente", dependencies=[Depends(etag(*RELATORIOS["exames-consultas-por-paciente"]["tabelas"])), Depends(staleness("exames_consultas_por_paciente"))])
+@cacheado(*RELATORIOS["exames-consultas-por-paciente"]["tabelas"])
+def get_exames_consultas_por_paciente(db=Depends(get_db_leitura)):
+    return executar_relatorio(db, "exames-consultas-por-paciente")
+
+
+router_async = APIRouter(route_class=RotaInstrumentada)
+
+@router_async.get("/dashboard", response_model=DashboardResponse, summary="Todos os relatórios (ou os escolhidos em ?reports=) em uma só requisição", dependencies=[Depends(etag_async(*tabelas_dashboard(RELATORIOS)))])
+async def get_dashboard_async(
+    reports: Optional[str] = Query(None, description="Relatórios separados por vírgula; todos se omitido"),
+    db=Depends(get_db_async)
+):
+    nomes = selecionar_relatorios(reports)
+    return {"relatorios": await _dashboard_async(nomes, db=db), "views": views_dashboard(nomes)}
+
+@router_async.get("/agendamentos-por-status", response_model=List[AgendamentoStatusReport], summary="Número de agendamentos por status", dependencies=[Depends(etag_async(*RELATORIOS["agendamentos-por-status"]["tabelas"]))])
+@cacheado(*RELATORIOS["agendamentos-por-status"]["tabelas"])
+async def get_agendamentos_por_status_async(db=Depends(get_db_async)):
+    return await executar_relatorio_async(db, "agendamentos-por-status")
+
+@router_async.get("/medicos-total-consultas", response_model=List[MedicoTotalConsultasReport], summary="Médicos que realizaram consultas, com contagem", dependencies=[Depends(etag_async(*RELATORIOS["medicos-total-consultas"]["tabelas"]))])
+@cacheado(*RELATORIOS["medicos-total-consultas"]["tabelas"])
+async def get_medicos_total_consultas_async(db=Depends(get_db_async)):
+    return await executar_relatorio_async(db, "medicos-total-consultas")
+
+@router_async.get("/encaminhamentos-por-tipo", response_model=List[EncaminhamentoTipoReport], summary="Quantidade de encaminhamentos por tipo", dependencies=[Depends(etag_async(*RELATORIOS["encaminhamentos-por-tipo"]["tabelas"]))])
+@cacheado(*RELATORIOS["encaminhamentos-por-tipo"]["tabelas"])
+async def get_encaminhamentos_por_tipo_async(db=Depends(get_db_async)):
+    return await executar_relatorio_async(db, "encaminhamentos-por-tipo")
+
+@router_async.get("/pacientes-cardiologia", response_model=List[PacienteCardiologiaReport], summary="Pacientes que fizeram consultas com médicos da especialidade 'Cardiologia'", dependencies=[Depends(etag_async(*RELATORIOS["pacientes-cardiologia"]["tabelas"]))])
+@cacheado(*RELATORIOS["pacientes-cardiologia"]["tabelas"])
+async def get_pacientes_cardiologia_async(db=Depends(get_db_async)):
+    return await executar_relatorio_async(db, "pacientes-cardiologia")
+
+@router_async.get("/categoria-paciente", response_model=List[CategoriaPacienteReport], summary="Visão de categorização de pacientes por frequência de agendamentos", dependencies=[Depends(etag_async(*RELATORIOS["categoria-paciente"]["tabelas"])), Depends(staleness("categoria_paciente"))])
+@cacheado(*RELATORIOS["categoria-paciente"]["tabelas"])
+async def get_categoria_paciente_async(db=Depends(get_db_async)):
+    return await executar_relatorio_async(db, "categoria-paciente")
+
+@router_async.get("/ultimo-agendamento-paciente", response_model=List[UltimoAgendamentoPacienteReport], summary="Visão do último agendamento e contato do paciente", dependencies=[Depends(etag_async(*RELATORIOS["ultimo-agendamento-paciente"]["tabelas"])), Depends(staleness("ultimo_agendamento_paciente"))])
+@cacheado(*RELATORIOS["ultimo-agendamento-paciente"]["tabelas"])
+async def get_ultimo_agendamento_paciente_async(db=Depends(get_db_async)):
+    return await executar_relatorio_async(db, "ultimo-agendamento-paciente")
+
+@router_async.get("/consultas-encaminhamentos", response_model=List[ConsultasEncaminhamentosReport], summary="Visão de consultas e tipos de encaminhamentos gerados", dependencies=[Depends(etag_async(*RELATORIOS["consultas-encaminhamentos"]["tabelas"])), Depends(staleness("consultas_encaminhamentos"))])
+@cacheado(*RELATORIOS["consultas-encaminhamentos"]["tabelas"])
+async def get_consultas_encaminhamentos_async(db=Depends(get_db_async)):
+    return await executar_relatorio_async(db, "consultas-encaminhamentos")
+
+@router_async.get("/exames-consultas-por-paciente", response_model=List[ExamesConsultasPacienteReport], summary="Visão de exames e consultas por paciente", dependencies=[Depends(etag_async(*RELATORIOS["exames-consultas-por-paciente"]["tabelas"])), Depends(staleness("exames_consultas_por_paciente"))])
+@cacheado(*RELATORIOS["exames-consultas-por-paciente"]["tabelas"])
+async def get_exames_consultas_por_paciente_async(db=Depends(get_db_async)):
+    return await executar_relatorio_async(db, "exames-consultas-por-paciente")
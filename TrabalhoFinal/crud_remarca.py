@@ -1,9 +1,16 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Query, status
 from typing import List, Optional
-from models import Remarca, RemarcaCreate
+from models import Remarca, RemarcaCreate, RemarcaPage, ReagendamentoCreate, ReagendamentoResponse, StatusAgendamento
 from db import get_db
+from replica import get_db_leitura
+from metricas import RotaInstrumentada
+from db_async import get_db_async, fetchall_async
+from alteracoes import notificar_alteracao
+from etag import etag, etag_async
+from paginacao import LIMITE_PADRAO, LIMITE_MAXIMO, keyset, order_by, paginar
+from crud_agendamento import agendamento_from_row
 
-router = APIRouter()
+router = APIRouter(route_class=RotaInstrumentada, dependencies=[Depends(etag("Remarca"))])
 
 @router.post("/", response_model=Remarca, status_code=status.HTTP_201_CREATED)
 def criar_remarca(remarca_data: RemarcaCreate, db=Depends(get_db)):
@@ -28,6 +35,7 @@ def criar_remarca(remarca_data: RemarcaCreate, db=Depends(get_db)):
         )
         new_remarca_data = cursor.fetchone()
         db.commit()
+        notificar_alteracao("Remarca")
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=f"Erro ao criar remarca: {e}")
@@ -45,28 +53,122 @@ def criar_remarca(remarca_data: RemarcaCreate, db=Depends(get_db)):
         quem_solicitou=new_remarca_data[7]
     )
 
-@router.get("/", response_model=List[Remarca])
-def listar_remarcas(db=Depends(get_db)):
+SQL_REMARCA = "SELECT id_remarca, antigo_id_agendamento, antigo_id_paciente, novo_id_agendamento, novo_id_paciente, motivo, data_remarcacao, quem_solicitou FROM Remarca"
+CHAVE_REMARCA = ["id_remarca"]
+
+def remarca_from_row(r):
+    return Remarca(
+        id_remarca=r[0],
+        antigo_id_agendamento=r[1],
+        antigo_id_paciente=r[2],
+        novo_id_agendamento=r[3],
+        novo_id_paciente=r[4],
+        motivo=r[5],
+        data_remarcacao=r[6],
+        quem_solicitou=r[7]
+    )
+
+def sql_listar_remarcas(limit, cursor):
+    condicao, params = keyset(CHAVE_REMARCA, cursor)
+    sql = SQL_REMARCA
+    if condicao:
+        sql += " WHERE " + condicao
+    sql += order_by(CHAVE_REMARCA) + " LIMIT %s"
+    return sql, params + [limit + 1]
+
+def pagina_remarcas(rows, limit):
+    rows, next_cursor = paginar(rows, limit, lambda r: [r[0]])
+    return RemarcaPage(items=[remarca_from_row(r) for r in rows], next_cursor=next_cursor)
+
+# Só agendamentos ainda em aberto podem ser remarcados.
+STATUS_REAGENDAVEIS = [StatusAgendamento.MARCADA.value, StatusAgendamento.AUSENTE.value]
+
+# Remarcação em um único comando: o UPDATE trava a linha do agendamento antigo
+# e só o marca como 'Remarcada' se ele ainda estiver em aberto. Numa remarcação
+# concorrente do mesmo agendamento, a segunda espera a trava, reavalia o status
+# e não encontra linha, então nenhum agendamento novo nem Remarca é criado.
+SQL_REAGENDAR = """
+    WITH antigo AS (
+        UPDATE Agendamento SET status = 'Remarcada'
+        WHERE id_agendamento = %(id_agendamento)s AND id_paciente = %(id_paciente)s
+          AND status = ANY(%(reagendaveis)s)
+        RETURNING id_agendamento, id_paciente, observacoes
+    ), novo AS (
+        INSERT INTO Agendamento (id_paciente, data, observacoes, status)
+        SELECT id_paciente, %(nova_data)s, COALESCE(%(observacoes)s, observacoes), 'Marcada' FROM antigo
+        RETURNING id_agendamento, id_paciente, data, observacoes, status
+    ), remarca AS (
+        INSERT INTO Remarca (antigo_id_agendamento, antigo_id_paciente,
+                             novo_id_agendamento, novo_id_paciente,
+                             motivo, data_remarcacao, quem_solicitou)
+        SELECT antigo.id_agendamento, antigo.id_paciente, novo.id_agendamento, novo.id_paciente,
+               %(motivo)s, COALESCE(%(data_remarcacao)s, CURRENT_DATE), %(quem_solicitou)s
+        FROM antigo, novo
+        RETURNING id_remarca, antigo_id_agendamento, antigo_id_paciente, novo_id_agendamento, novo_id_paciente, motivo, data_remarcacao, quem_solicitou
+    )
+    SELECT novo.id_agendamento, novo.id_paciente, novo.data, novo.observacoes, novo.status, remarca.*
+    FROM novo, remarca
+"""
+
+@router.post("/reagendar", response_model=ReagendamentoResponse, status_code=status.HTTP_201_CREATED,
+             summary="Remarca um agendamento: cria o novo, marca o antigo e registra a Remarca numa transação")
+def reagendar(dados: ReagendamentoCreate, db=Depends(get_db)):
     cursor = db.cursor()
     try:
-        cursor.execute(
-            "SELECT id_remarca, antigo_id_agendamento, antigo_id_paciente, novo_id_agendamento, novo_id_paciente, motivo, data_remarcacao, quem_solicitou FROM Remarca"
-        )
-        rows = cursor.fetchall()
+        cursor.execute(SQL_REAGENDAR, dict(dados.dict(), reagendaveis=STATUS_REAGENDAVEIS))
+        row = cursor.fetchone()
+        if row is None:
+            cursor.execute(
+                "SELECT status FROM Agendamento WHERE id_agendamento=%s AND id_paciente=%s",
+                (dados.id_agendamento, dados.id_paciente)
+            )
+            atual = cursor.fetchone()
+            db.rollback()
+            if atual is None:
+                raise HTTPException(status_code=404, detail="Agendamento não encontrado")
+            raise HTTPException(status_code=409, detail=f"Agendamento com status '{atual[0]}' não pode ser remarcado")
+        db.commit()
+        notificar_alteracao("Agendamento", "Remarca")
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao listar remarcas: {e}")
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Erro ao remarcar agendamento: {e}")
     finally:
         cursor.close()
 
-    return [
-        Remarca(
-            id_remarca=r[0],
-            antigo_id_agendamento=r[1],
-            antigo_id_paciente=r[2],
-            novo_id_agendamento=r[3],
-            novo_id_paciente=r[4],
-            motivo=r[5],
-            data_remarcacao=r[6],
-            quem_solicitou=r[7]
-        ) for r in rows
-    ]
\ No newline at end of file
+    return ReagendamentoResponse(agendamento=agendamento_from_row(row[:5]), remarca=remarca_from_row(row[5:]))
+
+@router.get("/", response_model=RemarcaPage)
+def listar_remarcas(
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+    db=Depends(get_db_leitura)
+):
+    sql, params = sql_listar_remarcas(limit, cursor)
+    db_cursor = db.cursor()
+    try:
+        db_cursor.execute(sql, params)
+        rows = db_cursor.fetchall()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao listar remarcas: {e}")
+    finally:
+        db_cursor.close()
+
+    return pagina_remarcas(rows, limit)
+
+
+router_async = APIRouter(route_class=RotaInstrumentada, dependencies=[Depends(etag_async("Remarca"))])
+
+@router_async.get("/", response_model=RemarcaPage)
+async def listar_remarcas_async(
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+    db=Depends(get_db_async)
+):
+    sql, params = sql_listar_remarcas(limit, cursor)
+    try:
+        rows = await fetchall_async(db, sql, params)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao listar remarcas: {e}")
+    return pagina_remarcas(rows, limit)
@@ -1,17 +1,217 @@
 import psycopg2
+from psycopg2 import extensions
+from fastapi import HTTPException
+from metricas import CursorInstrumentado, registrar_espera_conexao
 import os
+import threading
+import time
 
-def get_connection():
-    return psycopg2.connect(
-        dbname="SistemaClinico",
-        user="postgres",
-        password="felipe123", 
-        host="localhost"
-    )
+DATABASE_URL = os.getenv(
+    "DATABASE_URL",
+    "dbname=SistemaClinico user=postgres password=felipe123 host=localhost"
+)
 
-def get_db():
-    conn = get_connection()
+def get_connection(dsn=None):
+    return psycopg2.connect(dsn or DATABASE_URL, cursor_factory=CursorInstrumentado)
+
+
+class PoolError(Exception):
+    pass
+
+class PoolTimeout(PoolError):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, dsn, minconn=1, maxconn=10, timeout=10.0, max_lifetime=1800.0, ping_after=5.0):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Tamanho de pool inválido: min=%s max=%s" % (minconn, maxconn))
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.ping_after = ping_after
+
+        self._cond = threading.Condition()
+        self._idle = []
+        self._in_use = {}
+        self._size = 0
+        self._waiting = 0
+        self._closed = False
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._recycled = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+        for _ in range(minconn):
+            conn = get_connection(dsn)
+            agora = time.monotonic()
+            self._idle.append((conn, agora, agora))
+            self._size += 1
+
+    def _expirada(self, criada_em):
+        return self.max_lifetime > 0 and time.monotonic() - criada_em > self.max_lifetime
+
+    def _viva(self, conn, usada_em):
+        if conn.closed:
+            return False
+        if time.monotonic() - usada_em < self.ping_after:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _descartar(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def getconn(self):
+        inicio = time.monotonic()
+        limite = inicio + self.timeout
+        conn = None
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolError("Pool de conexões fechado.")
+                if self._idle:
+                    conn, criada_em, usada_em = self._idle.pop()
+                    break
+                if self._size < self.maxconn:
+                    self._size += 1
+                    break
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout("Nenhuma conexão livre após %.1fs (max=%s)." % (self.timeout, self.maxconn))
+                self._waiting += 1
+                self._cond.wait(restante)
+                self._waiting -= 1
+
+        try:
+            if conn is not None and (self._expirada(criada_em) or not self._viva(conn, usada_em)):
+                self._descartar(conn)
+                conn = None
+                with self._cond:
+                    self._recycled += 1
+            if conn is None:
+                conn = get_connection(self.dsn)
+                criada_em = time.monotonic()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        espera = time.monotonic() - inicio
+        with self._cond:
+            self._in_use[id(conn)] = criada_em
+            self._checkouts += 1
+            self._wait_total += espera
+            self._wait_max = max(self._wait_max, espera)
+        return conn
+
+    def putconn(self, conn, discard=False):
+        with self._cond:
+            criada_em = self._in_use.pop(id(conn), None)
+        if criada_em is None:
+            raise PoolError("Conexão não pertence a este pool.")
+
+        if not discard and not conn.closed:
+            status = conn.get_transaction_status()
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                discard = True
+            elif status != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    discard = True
+
+        reciclar = conn.closed or discard or self._expirada(criada_em)
+        with self._cond:
+            if reciclar or self._closed:
+                self._size -= 1
+                if reciclar:
+                    self._recycled += 1
+            else:
+                self._idle.append((conn, criada_em, time.monotonic()))
+            self._cond.notify()
+        if reciclar or self._closed:
+            self._descartar(conn)
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            idle = self._idle
+            self._idle = []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _, _ in idle:
+            self._descartar(conn)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "min": self.minconn,
+                "max": self.maxconn,
+                "size": self._size,
+                "in_use": len(self._in_use),
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "recycled": self._recycled,
+                "wait_avg_ms": round(self._wait_total / self._checkouts * 1000, 3) if self._checkouts else 0.0,
+                "wait_max_ms": round(self._wait_max * 1000, 3),
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    DATABASE_URL,
+                    minconn=int(os.getenv("DB_POOL_MIN", "1")),
+                    maxconn=int(os.getenv("DB_POOL_MAX", "10")),
+                    timeout=float(os.getenv("DB_POOL_TIMEOUT", "10")),
+                    max_lifetime=float(os.getenv("DB_POOL_MAX_LIFETIME", "1800")),
+                    ping_after=float(os.getenv("DB_POOL_PING_AFTER", "5")),
+                )
+    return _pool
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+def conexao_do_pool(pool):
+    inicio = time.perf_counter()
+    try:
+        conn = pool.getconn()
+    except PoolTimeout as e:
+        raise HTTPException(status_code=503, detail=f"Banco de dados indisponível: {e}")
+    finally:
+        registrar_espera_conexao(time.perf_counter() - inicio)
     try:
         yield conn
     finally:
-        conn.close()
\ No newline at end of file
+        pool.putconn(conn)
+
+def get_db():
+    yield from conexao_do_pool(get_pool())
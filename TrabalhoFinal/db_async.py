@@ -0,0 +1,78 @@
+from fastapi import HTTPException
+from db import DATABASE_URL
+from metricas import registrar_query, registrar_espera_conexao
+import os
+import time
+
+# Caminho assíncrono opcional (psycopg 3 + psycopg_pool). Ativado com DB_MODE=async;
+# as rotas de leitura passam a usar os routers `router_async` dos módulos crud_*.
+DB_MODE = os.getenv("DB_MODE", "sync")
+
+_pool = None
+
+async def open_pool():
+    global _pool
+    try:
+        from psycopg_pool import AsyncConnectionPool
+    except ImportError:
+        raise RuntimeError("DB_MODE=async requer o pacote 'psycopg[binary,pool]'.")
+    if _pool is None:
+        _pool = AsyncConnectionPool(
+            DATABASE_URL,
+            min_size=int(os.getenv("DB_ASYNC_POOL_MIN", "1")),
+            max_size=int(os.getenv("DB_ASYNC_POOL_MAX", "20")),
+            timeout=float(os.getenv("DB_POOL_TIMEOUT", "10")),
+            max_lifetime=float(os.getenv("DB_POOL_MAX_LIFETIME", "1800")),
+            check=AsyncConnectionPool.check_connection,
+            # Só leituras passam por aqui: em autocommit a conexão volta ao pool
+            # ociosa, sem transação aberta para o pool desfazer (um ROLLBACK e
+            # um aviso no log a cada requisição).
+            kwargs={"autocommit": True},
+            open=False
+        )
+        await _pool.open(wait=True)
+    return _pool
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+def pool_stats():
+    if _pool is None:
+        return None
+    return _pool.get_stats()
+
+async def get_db_async():
+    from psycopg_pool import PoolTimeout
+    pool = await open_pool()
+    inicio = time.perf_counter()
+    try:
+        conn = await pool.getconn()
+    except PoolTimeout as e:
+        raise HTTPException(status_code=503, detail=f"Banco de dados indisponível: {e}")
+    finally:
+        registrar_espera_conexao(time.perf_counter() - inicio)
+    try:
+        yield conn
+    finally:
+        await pool.putconn(conn)
+
+async def fetchall_async(db, sql, params=None):
+    inicio = time.perf_counter()
+    try:
+        async with db.cursor() as cursor:
+            await cursor.execute(sql, params)
+            return await cursor.fetchall()
+    finally:
+        registrar_query(time.perf_counter() - inicio, sql, params)
+
+async def fetchone_async(db, sql, params=None):
+    inicio = time.perf_counter()
+    try:
+        async with db.cursor() as cursor:
+            await cursor.execute(sql, params)
+            return await cursor.fetchone()
+    finally:
+        registrar_query(time.perf_counter() - inicio, sql, params)
@@ -0,0 +1,81 @@
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo
+import os
+
+# Agenda dos médicos: toda consulta ocupa [data_hora, data_hora + DURACAO_CONSULTA)
+# e os horários livres são oferecidos dentro do expediente. Com duração fixa,
+# duas consultas do mesmo médico se sobrepõem se e só se os inícios distam menos
+# de uma duração. Assim o índice (crm, data_hora) de migracoes/0004 atende tanto
+# à checagem de conflito quanto à busca de horários ocupados, com uma varredura
+# de intervalo por médico.
+DURACAO_CONSULTA = timedelta(minutes=int(os.getenv("CONSULTA_DURACAO_MIN", "30")))
+EXPEDIENTE_INICIO = time.fromisoformat(os.getenv("EXPEDIENTE_INICIO", "07:00"))
+EXPEDIENTE_FIM = time.fromisoformat(os.getenv("EXPEDIENTE_FIM", "19:00"))
+DISPONIBILIDADE_MAX_DIAS = int(os.getenv("DISPONIBILIDADE_MAX_DIAS", "31"))
+# Fuso em que Consulta.data_hora (TIMESTAMP sem fuso) é gravada; independe do fuso do servidor.
+CLINICA_TZ = os.getenv("CLINICA_TZ", "America/Sao_Paulo")
+
+# Trava por médico até o fim da transação: duas marcações simultâneas para o
+# mesmo CRM passam pela checagem uma de cada vez; médicos diferentes não esperam.
+SQL_TRAVAR_MEDICO = "SELECT pg_advisory_xact_lock(hashtext('consulta:' || %s))"
+
+SQL_CONFLITO = """
+    SELECT data_hora FROM Consulta
+    WHERE crm = %s AND data_hora > %s AND data_hora < %s
+    ORDER BY data_hora LIMIT 1
+"""
+
+SQL_OCUPADOS = """
+    SELECT m.crm, m.nome, c.data_hora
+    FROM Medico m
+    LEFT JOIN Consulta c ON c.crm = m.crm AND c.data_hora > %s AND c.data_hora < %s
+    WHERE m.especialidade = %s
+    ORDER BY m.crm, c.data_hora
+"""
+
+def params_conflito(crm, data_hora):
+    return (crm, data_hora - DURACAO_CONSULTA, data_hora + DURACAO_CONSULTA)
+
+def params_ocupados(especialidade, inicio, fim):
+    return (inicio - DURACAO_CONSULTA, fim, especialidade)
+
+def hora_local(data_hora):
+    if data_hora.tzinfo is None:
+        return data_hora
+    return data_hora.astimezone(ZoneInfo(CLINICA_TZ)).replace(tzinfo=None)
+
+def janelas_expediente(inicio, fim):
+    dia = inicio.date()
+    while dia <= fim.date():
+        abre = max(inicio, datetime.combine(dia, EXPEDIENTE_INICIO))
+        fecha = min(fim, datetime.combine(dia, EXPEDIENTE_FIM))
+        if fecha - abre >= DURACAO_CONSULTA:
+            yield abre, fecha
+        dia += timedelta(days=1)
+
+def intervalos_livres(inicio, fim, ocupados):
+    # ocupados: inícios das consultas do médico em ordem crescente. Varredura
+    # única, que avança pelas consultas junto com as janelas de expediente.
+    livres = []
+    i = 0
+    for abre, fecha in janelas_expediente(inicio, fim):
+        cursor = abre
+        while i < len(ocupados) and ocupados[i] + DURACAO_CONSULTA <= cursor:
+            i += 1
+        j = i
+        while j < len(ocupados) and ocupados[j] < fecha:
+            if ocupados[j] - cursor >= DURACAO_CONSULTA:
+                livres.append((cursor, ocupados[j]))
+            cursor = max(cursor, ocupados[j] + DURACAO_CONSULTA)
+            j += 1
+        if fecha - cursor >= DURACAO_CONSULTA:
+            livres.append((cursor, fecha))
+    return livres
+
+def agrupar_por_medico(rows):
+    medicos = {}
+    for crm, nome, data_hora in rows:
+        _, ocupados = medicos.setdefault(crm, (nome, []))
+        if data_hora is not None:
+            ocupados.append(data_hora)
+    return medicos
@@ -0,0 +1,156 @@
+from fastapi import Depends, HTTPException, Request, Response
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from contextvars import ContextVar
+from replica import conexao_leitura
+from db_async import get_db_async, fetchall_async
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# A ETag de um GET é derivada da URL e da versão de cada tabela que ele lê. As
+# versões ficam no banco (versao_tabela, migracoes/0006), somadas por gatilho
+# na mesma transação de cada escrita, e são lidas na mesma conexão que o
+# handler usa em seguida: valem entre processos, para escritas de fora da API
+# e para leituras na réplica, que nunca recebem uma versão que ainda não
+# alcançaram. Um 304 custa só essa leitura, sem a consulta nem a serialização.
+SQL_VERSOES = "SELECT tabela, SUM(versao)::bigint FROM versao_tabela WHERE tabela = ANY(%s) GROUP BY tabela"
+
+# A mesma ETag não pode valer para o corpo comprimido e o original:
+# ETagPorCodificacao acrescenta a codificação (`"...-gzip"`) e etag_confere
+# aceita as duas formas.
+CODIFICACOES = ("gzip", "br")
+
+# Headers da requisição corrente, para respostas montadas fora do response_model
+# (ver respostas.RespostaJSONRapida), que não herdam os do parâmetro `response`.
+headers_etag = ContextVar("headers_etag", default=None)
+# Versões lidas para a ETag da requisição corrente (ver cache.cacheado).
+versoes_lidas = ContextVar("versoes_lidas", default=None)
+
+_avisado = False
+
+def nomes_tabelas(tabelas):
+    return sorted({t.lower() for t in tabelas})
+
+def versoes_de_rows(nomes, rows):
+    lidas = dict(rows)
+    return tuple((nome, lidas.get(nome, 0)) for nome in nomes)
+
+def ler_versoes(conn, nomes):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(SQL_VERSOES, (nomes,))
+        return versoes_de_rows(nomes, cursor.fetchall())
+    finally:
+        cursor.close()
+
+def sem_versoes(erro):
+    # Sem versao_tabela (migracoes/0006 não aplicada) a resposta sai sem ETag.
+    global _avisado
+    if not _avisado:
+        logger.warning("ETags desligadas: não foi possível ler versao_tabela (%s)", erro)
+        _avisado = True
+
+def calcular_etag(request, versoes):
+    base = repr((request.url.path, sorted(request.query_params.multi_items()), versoes))
+    return '"' + hashlib.sha1(base.encode()).hexdigest() + '"'
+
+def sem_codificacao(tag):
+    for codificacao in CODIFICACOES:
+        sufixo = f'-{codificacao}"'
+        if tag.endswith(sufixo):
+            return tag[:-len(sufixo)] + '"'
+    return tag
+
+def etag_confere(if_none_match, tag):
+    # Devolve a ETag do cliente que confere (para repetir no 304) ou None.
+    if not if_none_match:
+        return None
+    for candidato in (c.strip().removeprefix("W/") for c in if_none_match.split(",")):
+        if candidato == "*":
+            return tag
+        if sem_codificacao(candidato) == tag:
+            return candidato
+    return None
+
+def responder_etag(request, response, versoes):
+    tag = calcular_etag(request, versoes)
+    confere = etag_confere(request.headers.get("if-none-match"), tag)
+    if confere:
+        raise HTTPException(status_code=304, headers={"ETag": confere, "Cache-Control": "no-cache"})
+    headers = {"ETag": tag, "Cache-Control": "no-cache"}
+    response.headers.update(headers)
+    headers_etag.set(headers)
+    versoes_lidas.set(versoes)
+
+def etag(*tabelas):
+    nomes = nomes_tabelas(tabelas)
+
+    async def dependencia(request: Request, response: Response):
+        if request.method not in ("GET", "HEAD"):
+            yield
+            return
+        # A conexão de leitura é aberta aqui e fica em request.state até o fim
+        # da requisição; o get_db_leitura do handler devolve essa mesma conexão.
+        # Escritas não passam por aqui e não pegam uma conexão a mais.
+        conn = getattr(request.state, "conexao_leitura", None)
+        gerador = None
+        if conn is None:
+            gerador = conexao_leitura(request)
+            conn = await run_in_threadpool(next, gerador)
+            request.state.conexao_leitura = conn
+        try:
+            try:
+                versoes = await run_in_threadpool(ler_versoes, conn, nomes)
+            except Exception as e:
+                await run_in_threadpool(conn.rollback)
+                sem_versoes(e)
+                versoes = None
+            if versoes is not None:
+                responder_etag(request, response, versoes)
+            yield
+        finally:
+            if gerador is not None:
+                request.state.conexao_leitura = None
+                await run_in_threadpool(gerador.close)
+    return dependencia
+
+def etag_async(*tabelas):
+    # Para os routers async: as versões são lidas na conexão psycopg 3 da
+    # requisição (o Depends é compartilhado com o handler).
+    nomes = nomes_tabelas(tabelas)
+
+    async def dependencia(request: Request, response: Response, db=Depends(get_db_async)):
+        if request.method not in ("GET", "HEAD"):
+            return
+        try:
+            rows = await fetchall_async(db, SQL_VERSOES, (nomes,))
+        except Exception as e:
+            sem_versoes(e)
+            return
+        responder_etag(request, response, versoes_de_rows(nomes, rows))
+    return dependencia
+
+
+class ETagPorCodificacao:
+    # Por fora do middleware de compressão: marca a ETag das respostas
+    # comprimidas com a codificação usada.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def enviar(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                tag = headers.get("etag")
+                codificacao = headers.get("content-encoding")
+                if tag and codificacao and not tag.startswith("W/") and sem_codificacao(tag) == tag:
+                    headers["etag"] = f'{tag[:-1]}-{codificacao}"'
+            await send(message)
+
+        await self.app(scope, receive, enviar)
@@ -0,0 +1,112 @@
+from fastapi import HTTPException, Request
+from pydantic import ValidationError
+from psycopg2.extras import execute_values
+import json
+import os
+import psycopg2
+
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", "50000"))
+BULK_MAX_BYTES = int(os.getenv("BULK_MAX_BYTES", str(32 * 1024 * 1024)))
+BULK_PAGE_SIZE = 1000
+
+async def ler_lote(request: Request):
+    # Aceita um array JSON ou NDJSON (Content-Type: application/x-ndjson), um objeto por linha.
+    content_type = request.headers.get("content-type", "")
+    itens = []
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        resto = b""
+        async for bloco in _ler_corpo(request):
+            linhas = (resto + bloco).split(b"\n")
+            resto = linhas.pop()
+            for linha in linhas:
+                if linha.strip():
+                    itens.append(_json_linha(linha, len(itens)))
+            if len(itens) > BULK_MAX_ROWS:
+                _lote_grande()
+        if resto.strip():
+            itens.append(_json_linha(resto, len(itens)))
+    else:
+        corpo = b"".join([bloco async for bloco in _ler_corpo(request)])
+        try:
+            itens = json.loads(corpo)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"JSON inválido: {e}")
+        if not isinstance(itens, list):
+            raise HTTPException(status_code=400, detail="O corpo deve ser um array JSON ou NDJSON.")
+    if len(itens) > BULK_MAX_ROWS:
+        _lote_grande()
+    return itens
+
+async def _ler_corpo(request):
+    # O corpo é lido aos blocos e recusado assim que passa de BULK_MAX_BYTES,
+    # antes de ir inteiro para a memória (o Content-Length pode faltar ou mentir).
+    if int(request.headers.get("content-length") or 0) > BULK_MAX_BYTES:
+        _lote_grande()
+    lidos = 0
+    async for bloco in request.stream():
+        lidos += len(bloco)
+        if lidos > BULK_MAX_BYTES:
+            _lote_grande()
+        yield bloco
+
+def _lote_grande():
+    raise HTTPException(
+        status_code=413,
+        detail=f"Lote maior que o limite de {BULK_MAX_ROWS} linhas ou {BULK_MAX_BYTES} bytes.",
+    )
+
+def _json_linha(linha, indice):
+    try:
+        return json.loads(linha)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Linha {indice} do NDJSON inválida: {e}")
+
+def validar_lote(itens, model):
+    validos = []
+    erros = []
+    for indice, item in enumerate(itens):
+        if not isinstance(item, dict):
+            erros.append((indice, "Cada item deve ser um objeto JSON."))
+            continue
+        try:
+            validos.append((indice, model(**item)))
+        except ValidationError as e:
+            erros.append((indice, "; ".join(
+                f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()
+            )))
+    return validos, erros
+
+def inserir_lote(cursor, sql, itens, valores):
+    # Cada bloco de BULK_PAGE_SIZE linhas vai num INSERT ... VALUES sob um
+    # SAVEPOINT. Se o banco recusar o bloco (texto maior que a coluna, CHECK,
+    # chave estrangeira...), só ele é desfeito e refeito linha a linha, para o
+    # erro sair na linha certa; o resto do lote segue na mesma transação.
+    # Devolve os itens inseridos (na ordem do RETURNING), as linhas retornadas
+    # e os erros por índice.
+    inseridos, rows, erros = [], [], []
+    for inicio in range(0, len(itens), BULK_PAGE_SIZE):
+        bloco = itens[inicio:inicio + BULK_PAGE_SIZE]
+        try:
+            rows += _inserir(cursor, sql, [valores(item) for _, item in bloco])
+            inseridos += bloco
+        except psycopg2.Error:
+            for indice, item in bloco:
+                try:
+                    rows += _inserir(cursor, sql, [valores(item)])
+                    inseridos.append((indice, item))
+                except psycopg2.Error as e:
+                    erros.append((indice, erro_banco(e)))
+    return inseridos, rows, erros
+
+def _inserir(cursor, sql, linhas):
+    cursor.execute("SAVEPOINT lote")
+    try:
+        rows = execute_values(cursor, sql, linhas, page_size=len(linhas), fetch=True)
+    except psycopg2.Error:
+        cursor.execute("ROLLBACK TO SAVEPOINT lote")
+        raise
+    cursor.execute("RELEASE SAVEPOINT lote")
+    return rows
+
+def erro_banco(e):
+    return (e.diag.message_primary if e.diag else None) or str(e).strip()
@@ -1,19 +1,50 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from crud_clinica import router as clinica_router
-from crud_agendamento import router as agendamento_router
-from crud_encaminhamento import router as encaminhamento_router
-from crud_relatorios import router as relatorios_router
-from crud_medico import router as medico_router
-from crud_paciente import router as paciente_router
-from crud_remarca import router as remarca_router
+from crud_clinica import router as clinica_router, router_async as clinica_router_async
+from crud_agendamento import router as agendamento_router, router_async as agendamento_router_async
+from crud_encaminhamento import router as encaminhamento_router, router_async as encaminhamento_router_async
+from crud_relatorios import router as relatorios_router, router_async as relatorios_router_async
+from crud_medico import (
+  router as medico_router, router_async as medico_router_async,
+  router_disponibilidade as disponibilidade_router, router_disponibilidade_async as disponibilidade_router_async
+)
+from crud_paciente import router as paciente_router, router_async as paciente_router_async
+from crud_remarca import router as remarca_router, router_async as remarca_router_async
+from crud_admin import router as admin_router
+from crud_export import router as export_router
+from db import close_pool
+from replica import close_pool_replica, middleware_read_your_writes
+import db_async
+import migrar
+from views_materializadas import scheduler as views_scheduler
+from respostas import configurar_compressao
+from metricas import middleware_metricas, router as metricas_router
+import os
+
+@asynccontextmanager
+async def lifespan(app):
+  migrar.ao_iniciar()
+  if db_async.DB_MODE == "async":
+    await db_async.open_pool()
+  if os.getenv("MV_REFRESH_ENABLED", "1") == "1":
+    views_scheduler.start()
+  yield
+  views_scheduler.stop()
+  await db_async.close_pool()
+  close_pool()
+  close_pool_replica()
 
 app = FastAPI(
   title="SpeedMED - Sistema Clínico",
   version="1.0.0",
-  description="API para gerenciamento de agendamentos, consultas e encaminhamentos em um sistema clínico."
+  description="API para gerenciamento de agendamentos, consultas e encaminhamentos em um sistema clínico.",
+  lifespan=lifespan
 )
 
+app.middleware("http")(middleware_read_your_writes)
+app.middleware("http")(middleware_metricas)
+
 origins = ["*"]
 app.add_middleware(
     CORSMiddleware,
@@ -21,7 +52,24 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Server-Timing", "X-Last-Refreshed-At", "X-Staleness-Seconds", "X-Ultima-Escrita"],
 )
+configurar_compressao(app)
+
+# Com DB_MODE=async as rotas de leitura (async def + psycopg 3) são registradas
+# antes das síncronas e têm prioridade; as escritas continuam no caminho síncrono.
+if db_async.DB_MODE == "async":
+  for router_async, prefix in [
+    (clinica_router_async, "/consultas"),
+    (agendamento_router_async, "/agendamentos"),
+    (encaminhamento_router_async, "/encaminhamentos"),
+    (relatorios_router_async, "/relatorios"),
+    (disponibilidade_router_async, "/medicos"),
+    (medico_router_async, "/medicos"),
+    (paciente_router_async, "/pacientes"),
+    (remarca_router_async, "/remarcas"),
+  ]:
+    app.include_router(router_async, prefix=prefix, include_in_schema=False)
 
 app.include_router(
   clinica_router,
@@ -47,6 +95,12 @@ app.include_router(
   tags=["Relatórios"]
 )
 
+app.include_router(
+  disponibilidade_router,
+  prefix="/medicos",
+  tags=["Médicos"]
+)
+
 app.include_router(
   medico_router,
   prefix="/medicos",
@@ -63,4 +117,18 @@ app.include_router(
   remarca_router,
   prefix="/remarcas",
   tags=["Remarcas"]
-)
\ No newline at end of file
+)
+
+app.include_router(
+  export_router,
+  prefix="/export",
+  tags=["Exportação"]
+)
+
+app.include_router(
+  admin_router,
+  prefix="/admin",
+  tags=["Administração"]
+)
+
+app.include_router(metricas_router, include_in_schema=False)
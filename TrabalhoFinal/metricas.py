@@ -0,0 +1,254 @@
+from contextvars import ContextVar
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from fastapi.routing import APIRoute
+from functools import wraps
+from psycopg2 import extensions
+from consultas_lentas import log_consultas_lentas
+import inspect
+import threading
+import time
+
+# Instrumentação por requisição: o middleware cria uma MetricasRequisicao e a
+# deixa em `requisicao_atual`; o cursor do psycopg2, o get_db e a rota
+# (RotaInstrumentada) acumulam nela o tempo de banco, de espera por conexão e
+# de serialização. No fim da requisição os valores viram o header
+# Server-Timing e entram nos histogramas servidos em /metrics.
+
+requisicao_atual = ContextVar("requisicao_atual", default=None)
+
+
+class MetricasRequisicao:
+    def __init__(self):
+        self.rota = None
+        self.queries = 0
+        self.db = 0.0
+        self.espera_conexao = 0.0
+        self.serializacao = 0.0
+        self.fim_endpoint = None
+        self.banco = None
+
+    def server_timing(self, total):
+        origem = f" ({self.banco})" if self.banco else ""
+        return ", ".join([
+            f'db;dur={self.db * 1000:.2f};desc="{self.queries} queries{origem}"',
+            f"pool;dur={self.espera_conexao * 1000:.2f}",
+            f"serializacao;dur={self.serializacao * 1000:.2f}",
+            f"total;dur={total * 1000:.2f}",
+        ])
+
+def registrar_query(duracao, sql=None, params=None):
+    metricas = requisicao_atual.get()
+    if metricas is not None:
+        metricas.queries += 1
+        metricas.db += duracao
+    if sql is not None:
+        log_consultas_lentas.observar(sql, params, duracao, metricas.rota if metricas is not None else None)
+
+def registrar_espera_conexao(duracao):
+    metricas = requisicao_atual.get()
+    if metricas is not None:
+        metricas.espera_conexao += duracao
+
+
+class CursorInstrumentado(extensions.cursor):
+    def execute(self, query, vars=None):
+        inicio = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            registrar_query(time.perf_counter() - inicio, query, vars)
+
+    def executemany(self, query, vars_list):
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            registrar_query(time.perf_counter() - inicio, query)
+
+    def copy_expert(self, sql, file, size=8192):
+        inicio = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            registrar_query(time.perf_counter() - inicio, sql)
+
+
+def _marcar_fim_endpoint():
+    metricas = requisicao_atual.get()
+    if metricas is not None:
+        metricas.fim_endpoint = time.perf_counter()
+
+def _cronometrar_endpoint(endpoint):
+    if getattr(endpoint, "_cronometrado", False):
+        return endpoint
+    if inspect.iscoroutinefunction(endpoint):
+        @wraps(endpoint)
+        async def wrapper_async(*args, **kwargs):
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _marcar_fim_endpoint()
+        wrapper_async._cronometrado = True
+        return wrapper_async
+
+    @wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            _marcar_fim_endpoint()
+    wrapper._cronometrado = True
+    return wrapper
+
+def rota_completa(request, path_format):
+    # Dependendo da versão do FastAPI, a rota incluída com include_router não
+    # carrega o prefixo; ele é o que sobra do path depois do trecho da rota.
+    trecho = path_format.format(**request.path_params)
+    path = request.scope["path"]
+    prefixo = path[:-len(trecho)] if trecho and path.endswith(trecho) else ""
+    return prefixo + path_format
+
+class RotaInstrumentada(APIRoute):
+    # Registra o template da rota e o tempo entre o retorno do endpoint e a
+    # resposta pronta (validação do response_model + serialização).
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, _cronometrar_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        path_format = self.path_format
+
+        async def handler_instrumentado(request):
+            metricas = requisicao_atual.get()
+            if metricas is not None:
+                metricas.rota = rota_completa(request, path_format)
+            resposta = await handler(request)
+            if metricas is not None and metricas.fim_endpoint is not None:
+                metricas.serializacao = time.perf_counter() - metricas.fim_endpoint
+            return resposta
+
+        return handler_instrumentado
+
+
+BUCKETS_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_QUERIES = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+class Histograma:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.contagens = [0] * len(buckets)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.soma += valor
+        self.total += 1
+        for i, limite in enumerate(self.buckets):
+            if valor <= limite:
+                self.contagens[i] += 1
+                break
+
+    def linhas(self, nome, labels):
+        acumulado = 0
+        for limite, contagem in zip(self.buckets, self.contagens):
+            acumulado += contagem
+            yield f'{nome}_bucket{{{labels},le="{limite}"}} {acumulado}'
+        yield f'{nome}_bucket{{{labels},le="+Inf"}} {self.total}'
+        yield f"{nome}_sum{{{labels}}} {self.soma}"
+        yield f"{nome}_count{{{labels}}} {self.total}"
+
+
+HISTOGRAMAS = {
+    "clinica_http_request_duration_seconds": ("Duração total da requisição", BUCKETS_SEGUNDOS),
+    "clinica_db_query_duration_seconds": ("Tempo em queries no banco por requisição", BUCKETS_SEGUNDOS),
+    "clinica_db_pool_wait_seconds": ("Espera por uma conexão do pool por requisição", BUCKETS_SEGUNDOS),
+    "clinica_serialization_duration_seconds": ("Validação e serialização da resposta por requisição", BUCKETS_SEGUNDOS),
+    "clinica_db_queries_per_request": ("Queries executadas por requisição", BUCKETS_QUERIES),
+}
+
+class Agregador:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histogramas = {}
+        self._respostas = {}
+
+    def registrar(self, metodo, rota, status, total, metricas):
+        valores = {
+            "clinica_http_request_duration_seconds": total,
+            "clinica_db_query_duration_seconds": metricas.db,
+            "clinica_db_pool_wait_seconds": metricas.espera_conexao,
+            "clinica_serialization_duration_seconds": metricas.serializacao,
+            "clinica_db_queries_per_request": metricas.queries,
+        }
+        with self._lock:
+            chave = (metodo, rota)
+            histogramas = self._histogramas.get(chave)
+            if histogramas is None:
+                histogramas = self._histogramas[chave] = {
+                    nome: Histograma(buckets) for nome, (_, buckets) in HISTOGRAMAS.items()
+                }
+            for nome, valor in valores.items():
+                histogramas[nome].observar(valor)
+            chave_status = (metodo, rota, status)
+            self._respostas[chave_status] = self._respostas.get(chave_status, 0) + 1
+
+    def exportar(self):
+        linhas = []
+        with self._lock:
+            for nome, (ajuda, _) in HISTOGRAMAS.items():
+                linhas.append(f"# HELP {nome} {ajuda}")
+                linhas.append(f"# TYPE {nome} histogram")
+                for (metodo, rota), histogramas in sorted(self._histogramas.items()):
+                    linhas.extend(histogramas[nome].linhas(nome, f'method="{metodo}",route="{rota}"'))
+            linhas.append("# HELP clinica_http_requests_total Requisições atendidas por rota e status")
+            linhas.append("# TYPE clinica_http_requests_total counter")
+            for (metodo, rota, status), total in sorted(self._respostas.items()):
+                linhas.append(f'clinica_http_requests_total{{method="{metodo}",route="{rota}",status="{status}"}} {total}')
+        return linhas
+
+
+agregador = Agregador()
+
+async def middleware_metricas(request, call_next):
+    metricas = MetricasRequisicao()
+    token = requisicao_atual.set(metricas)
+    inicio = time.perf_counter()
+    try:
+        resposta = await call_next(request)
+    finally:
+        requisicao_atual.reset(token)
+    total = time.perf_counter() - inicio
+    resposta.headers["Server-Timing"] = metricas.server_timing(total)
+    agregador.registrar(request.method, metricas.rota or "nao_encontrada", resposta.status_code, total, metricas)
+    return resposta
+
+
+router = APIRouter()
+
+@router.get("/metrics", response_class=PlainTextResponse, summary="Métricas no formato texto do Prometheus")
+def get_metrics():
+    from db import get_pool
+    from cache import cache_relatorios
+    from replica import monitor
+
+    linhas = agregador.exportar()
+    pool = get_pool().stats()
+    for chave in ("size", "in_use", "idle", "waiting"):
+        linhas.append(f"# TYPE clinica_db_pool_{chave} gauge")
+        linhas.append(f"clinica_db_pool_{chave} {pool[chave]}")
+    for chave in ("checkouts", "timeouts", "recycled"):
+        linhas.append(f"# TYPE clinica_db_pool_{chave}_total counter")
+        linhas.append(f"clinica_db_pool_{chave}_total {pool[chave]}")
+    replica = monitor.stats()
+    if replica["configurada"]:
+        linhas.append("# TYPE clinica_db_replica_lag_seconds gauge")
+        linhas.append(f"clinica_db_replica_lag_seconds {replica['lag_s'] if replica['lag_s'] is not None else 'NaN'}")
+        linhas.append("# TYPE clinica_db_reads_total counter")
+        for origem, total in replica["leituras"].items():
+            linhas.append(f'clinica_db_reads_total{{target="{origem}"}} {total}')
+    cache = cache_relatorios.stats()
+    for chave in ("hits", "misses", "evictions", "invalidations"):
+        linhas.append(f"# TYPE clinica_report_cache_{chave}_total counter")
+        linhas.append(f"clinica_report_cache_{chave}_total {cache[chave]}")
+    return PlainTextResponse("\n".join(linhas) + "\n", media_type="text/plain; version=0.0.4")
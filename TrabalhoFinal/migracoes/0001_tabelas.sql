@@ -0,0 +1,87 @@
+-- Tabelas do SistemaClinico. IF NOT EXISTS permite aplicar sobre uma base
+-- criada antes das migrações: ela só passa a constar em schema_migracoes.
+CREATE TABLE IF NOT EXISTS Paciente (
+    id_paciente     SERIAL PRIMARY KEY,
+    nome            VARCHAR(100) NOT NULL,
+    data_nascimento DATE NOT NULL,
+    sexo            CHAR(1) NOT NULL CHECK (sexo IN ('F', 'M', 'O')),
+    email           VARCHAR(100),
+    cpf             VARCHAR(14) NOT NULL UNIQUE
+);
+
+-- A chave primária (id_paciente, numero) atende a busca de telefones por paciente.
+CREATE TABLE IF NOT EXISTS Telefone_Paciente (
+    id_paciente INT NOT NULL REFERENCES Paciente (id_paciente),
+    numero      VARCHAR(20) NOT NULL,
+    tipo        VARCHAR(11) NOT NULL CHECK (tipo IN ('Celular', 'Residencial')),
+    PRIMARY KEY (id_paciente, numero)
+);
+
+CREATE TABLE IF NOT EXISTS Medico (
+    crm           VARCHAR(20) PRIMARY KEY,
+    nome          VARCHAR(100) NOT NULL,
+    especialidade VARCHAR(100) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS Agendamento (
+    id_agendamento SERIAL,
+    id_paciente    INT NOT NULL REFERENCES Paciente (id_paciente),
+    data           TIMESTAMP NOT NULL,
+    observacoes    TEXT,
+    status         VARCHAR(10) NOT NULL DEFAULT 'Marcada'
+                   CHECK (status IN ('Marcada', 'Ausente', 'Cancelada', 'Realizada', 'Remarcada')),
+    PRIMARY KEY (id_agendamento, id_paciente)
+);
+
+CREATE TABLE IF NOT EXISTS Consulta (
+    crm            VARCHAR(20) NOT NULL REFERENCES Medico (crm),
+    id_agendamento INT NOT NULL,
+    id_paciente    INT NOT NULL,
+    data_hora      TIMESTAMP NOT NULL,
+    diagnostico    TEXT NOT NULL,
+    observacoes    TEXT,
+    PRIMARY KEY (crm, id_agendamento, id_paciente),
+    FOREIGN KEY (id_agendamento, id_paciente) REFERENCES Agendamento (id_agendamento, id_paciente)
+);
+
+CREATE TABLE IF NOT EXISTS Remarca (
+    id_remarca            SERIAL PRIMARY KEY,
+    antigo_id_agendamento INT NOT NULL,
+    antigo_id_paciente    INT NOT NULL,
+    novo_id_agendamento   INT NOT NULL,
+    novo_id_paciente      INT NOT NULL,
+    motivo                TEXT,
+    data_remarcacao       DATE NOT NULL DEFAULT CURRENT_DATE,
+    quem_solicitou        VARCHAR(100),
+    FOREIGN KEY (antigo_id_agendamento, antigo_id_paciente) REFERENCES Agendamento (id_agendamento, id_paciente),
+    FOREIGN KEY (novo_id_agendamento, novo_id_paciente) REFERENCES Agendamento (id_agendamento, id_paciente)
+);
+
+CREATE TABLE IF NOT EXISTS Exame (
+    id_exame  SERIAL PRIMARY KEY,
+    nome      VARCHAR(100) NOT NULL,
+    descricao TEXT
+);
+
+CREATE TABLE IF NOT EXISTS Encaminhamento (
+    id_encaminhamento SERIAL PRIMARY KEY,
+    id_agendamento    INT NOT NULL,
+    id_paciente       INT NOT NULL,
+    tipo              VARCHAR(8) NOT NULL CHECK (tipo IN ('Exame', 'Consulta', 'Ambos')),
+    observacoes       TEXT,
+    FOREIGN KEY (id_agendamento, id_paciente) REFERENCES Agendamento (id_agendamento, id_paciente)
+);
+
+-- A chave primária (id_encaminhamento, id_exame) atende a busca de exames por encaminhamento.
+CREATE TABLE IF NOT EXISTS Encaminhamento_Exame (
+    id_encaminhamento INT NOT NULL REFERENCES Encaminhamento (id_encaminhamento),
+    id_exame          INT NOT NULL REFERENCES Exame (id_exame),
+    PRIMARY KEY (id_encaminhamento, id_exame)
+);
+
+CREATE TABLE IF NOT EXISTS Encaminhamento_Consulta (
+    id_encaminhamento INT PRIMARY KEY REFERENCES Encaminhamento (id_encaminhamento),
+    id_agendamento    INT NOT NULL,
+    id_paciente       INT NOT NULL,
+    FOREIGN KEY (id_agendamento, id_paciente) REFERENCES Agendamento (id_agendamento, id_paciente)
+);
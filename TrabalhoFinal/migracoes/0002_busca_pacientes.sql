@@ -0,0 +1,16 @@
+-- Índices usados por GET /pacientes/search.
+CREATE EXTENSION IF NOT EXISTS unaccent;
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- unaccent() é STABLE; o wrapper IMMUTABLE permite usá-lo em índices de expressão.
+CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+AS $$ SELECT public.unaccent('public.unaccent', $1) $$;
+
+CREATE INDEX IF NOT EXISTS idx_paciente_nome_trgm
+    ON Paciente USING gin (lower(f_unaccent(nome)) gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_paciente_email_lower
+    ON Paciente (lower(email));
+
+-- cpf já é coberto pelo índice da restrição UNIQUE.
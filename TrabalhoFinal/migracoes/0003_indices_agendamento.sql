@@ -0,0 +1,9 @@
+-- Índices usados pelos filtros de GET /agendamentos/ e por /agendamentos/calendario.
+CREATE INDEX IF NOT EXISTS idx_agendamento_data
+    ON Agendamento (data, id_agendamento, id_paciente);
+
+CREATE INDEX IF NOT EXISTS idx_agendamento_status_data
+    ON Agendamento (status, data);
+
+CREATE INDEX IF NOT EXISTS idx_agendamento_paciente_data
+    ON Agendamento (id_paciente, data);
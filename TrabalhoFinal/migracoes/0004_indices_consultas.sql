@@ -0,0 +1,24 @@
+-- Consultas de um médico por horário (agenda e relatórios por médico).
+CREATE INDEX IF NOT EXISTS idx_consulta_crm_data_hora
+    ON Consulta (crm, data_hora);
+
+-- Consulta de um agendamento (a chave primária começa por crm e não serve aqui).
+CREATE INDEX IF NOT EXISTS idx_consulta_agendamento
+    ON Consulta (id_agendamento, id_paciente);
+
+-- Filtros de GET /encaminhamentos/ e as chaves estrangeiras para Agendamento,
+-- que sem índice tornam cada DELETE de agendamento uma varredura.
+CREATE INDEX IF NOT EXISTS idx_encaminhamento_agendamento
+    ON Encaminhamento (id_agendamento, id_paciente);
+
+CREATE INDEX IF NOT EXISTS idx_encaminhamento_paciente
+    ON Encaminhamento (id_paciente);
+
+CREATE INDEX IF NOT EXISTS idx_encaminhamento_consulta_agendamento
+    ON Encaminhamento_Consulta (id_agendamento, id_paciente);
+
+CREATE INDEX IF NOT EXISTS idx_remarca_antigo_agendamento
+    ON Remarca (antigo_id_agendamento, antigo_id_paciente);
+
+CREATE INDEX IF NOT EXISTS idx_remarca_novo_agendamento
+    ON Remarca (novo_id_agendamento, novo_id_paciente);
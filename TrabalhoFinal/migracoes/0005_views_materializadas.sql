@@ -0,0 +1,75 @@
+-- Views materializadas lidas por /relatorios e atualizadas pelo
+-- views_materializadas.RefreshScheduler. Cada uma tem um índice único para
+-- permitir REFRESH MATERIALIZED VIEW CONCURRENTLY (sem bloquear as leituras).
+CREATE MATERIALIZED VIEW IF NOT EXISTS categoria_paciente AS
+SELECT
+    p.id_paciente,
+    p.nome,
+    COUNT(a.id_agendamento) AS total_agendamentos,
+    CASE
+        WHEN COUNT(a.id_agendamento) >= 10 THEN 'Frequente'
+        WHEN COUNT(a.id_agendamento) >= 3 THEN 'Regular'
+        ELSE 'Ocasional'
+    END AS categoria
+FROM Paciente p
+LEFT JOIN Agendamento a ON a.id_paciente = p.id_paciente
+GROUP BY p.id_paciente, p.nome;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_categoria_paciente_id
+    ON categoria_paciente (id_paciente);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS ultimo_agendamento_paciente AS
+SELECT
+    p.id_paciente,
+    p.nome,
+    t.numero AS telefone_paciente,
+    t.tipo AS tipo_telefone,
+    u.status
+FROM Paciente p
+JOIN Telefone_Paciente t ON t.id_paciente = p.id_paciente
+JOIN LATERAL (
+    SELECT a.status
+    FROM Agendamento a
+    WHERE a.id_paciente = p.id_paciente
+    ORDER BY a.data DESC, a.id_agendamento DESC
+    LIMIT 1
+) u ON TRUE;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_ultimo_agendamento_paciente_id
+    ON ultimo_agendamento_paciente (id_paciente, telefone_paciente);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS consultas_encaminhamentos AS
+SELECT
+    c.crm,
+    c.id_agendamento,
+    c.id_paciente,
+    e.id_encaminhamento,
+    m.nome AS nome_medico,
+    m.especialidade,
+    p.nome AS nome_paciente,
+    c.diagnostico,
+    c.data_hora AS data_consulta,
+    e.tipo AS tipo_encaminhamento
+FROM Consulta c
+JOIN Medico m ON m.crm = c.crm
+JOIN Paciente p ON p.id_paciente = c.id_paciente
+JOIN Encaminhamento e ON e.id_agendamento = c.id_agendamento AND e.id_paciente = c.id_paciente;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_consultas_encaminhamentos_id
+    ON consultas_encaminhamentos (crm, id_agendamento, id_paciente, id_encaminhamento);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS exames_consultas_por_paciente AS
+SELECT
+    p.id_paciente,
+    p.nome AS nome_paciente,
+    COUNT(ee.id_exame) AS count,
+    string_agg(DISTINCT ex.nome, ', ' ORDER BY ex.nome) AS exames_realizados,
+    (SELECT COUNT(*) FROM Consulta c WHERE c.id_paciente = p.id_paciente) AS total_consultas
+FROM Paciente p
+JOIN Encaminhamento e ON e.id_paciente = p.id_paciente
+JOIN Encaminhamento_Exame ee ON ee.id_encaminhamento = e.id_encaminhamento
+JOIN Exame ex ON ex.id_exame = ee.id_exame
+GROUP BY p.id_paciente, p.nome;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_exames_consultas_por_paciente_id
+    ON exames_consultas_por_paciente (id_paciente);
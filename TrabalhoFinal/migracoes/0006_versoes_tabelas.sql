@@ -0,0 +1,60 @@
+-- Versão de cada tabela (e view materializada) lida pelas ETags (etag.py).
+-- Um gatilho por comando soma 1 na mesma transação da escrita, então a versão
+-- só aparece junto com os dados e vale para qualquer processo, inclusive
+-- escritas de fora da API (psql, cargas). Cada conexão escreve no seu slot
+-- (pg_backend_pid() % 16), para que escritas concorrentes não disputem a mesma
+-- linha, e a versão é a soma dos slots.
+-- O slot -1 guarda uma base tirada do relógio, para que uma base recriada não
+-- repita as versões (e as ETags) da anterior.
+CREATE TABLE IF NOT EXISTS versao_tabela (
+    tabela TEXT NOT NULL,
+    slot   SMALLINT NOT NULL,
+    versao BIGINT NOT NULL,
+    PRIMARY KEY (tabela, slot)
+);
+
+CREATE OR REPLACE FUNCTION incrementar_versao(nome text) RETURNS void
+    LANGUAGE sql
+AS $$
+    INSERT INTO versao_tabela (tabela, slot, versao)
+    VALUES (lower(nome), pg_backend_pid() % 16, 1)
+    ON CONFLICT (tabela, slot) DO UPDATE SET versao = versao_tabela.versao + 1
+$$;
+
+CREATE OR REPLACE FUNCTION versao_alterada() RETURNS trigger
+    LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM incrementar_versao(TG_TABLE_NAME);
+    RETURN NULL;
+END
+$$;
+
+DO $$
+DECLARE
+    t text;
+BEGIN
+    FOREACH t IN ARRAY ARRAY[
+        'paciente', 'telefone_paciente', 'medico', 'agendamento', 'consulta', 'remarca',
+        'exame', 'encaminhamento', 'encaminhamento_exame', 'encaminhamento_consulta'
+    ] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', t || '_versao', t);
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I
+             FOR EACH STATEMENT EXECUTE FUNCTION versao_alterada()',
+            t || '_versao', t);
+    END LOOP;
+END
+$$;
+
+-- As views materializadas não disparam gatilhos: o refresh
+-- (views_materializadas.py) chama incrementar_versao com o nome da view.
+INSERT INTO versao_tabela (tabela, slot, versao)
+SELECT t, -1, (EXTRACT(EPOCH FROM clock_timestamp()) * 1000)::bigint
+FROM unnest(ARRAY[
+    'paciente', 'telefone_paciente', 'medico', 'agendamento', 'consulta', 'remarca',
+    'exame', 'encaminhamento', 'encaminhamento_exame', 'encaminhamento_consulta',
+    'categoria_paciente', 'ultimo_agendamento_paciente', 'consultas_encaminhamentos',
+    'exames_consultas_por_paciente'
+]) AS t
+ON CONFLICT (tabela, slot) DO NOTHING;
@@ -0,0 +1,98 @@
+-- Contagens mantidas incrementalmente para /relatorios (agendamentos por status,
+-- encaminhamentos por tipo, consultas por médico), lidas sem varrer as tabelas.
+-- Cada conexão soma no seu "slot" (pg_backend_pid() % 16) para que inserções
+-- concorrentes não disputem a mesma linha; a leitura soma os slots. O
+-- `python contadores.py reconciliar` confere com a contagem completa e compacta.
+CREATE TABLE IF NOT EXISTS contagem_agendamento_status (
+    status TEXT NOT NULL,
+    slot   SMALLINT NOT NULL,
+    total  BIGINT NOT NULL,
+    PRIMARY KEY (status, slot)
+);
+
+CREATE TABLE IF NOT EXISTS contagem_encaminhamento_tipo (
+    tipo  TEXT NOT NULL,
+    slot  SMALLINT NOT NULL,
+    total BIGINT NOT NULL,
+    PRIMARY KEY (tipo, slot)
+);
+
+CREATE TABLE IF NOT EXISTS contagem_consultas_medico (
+    crm   TEXT NOT NULL,
+    slot  SMALLINT NOT NULL,
+    total BIGINT NOT NULL,
+    PRIMARY KEY (crm, slot)
+);
+
+-- Gatilho por comando (não por linha), com as tabelas de transição: um INSERT
+-- em lote ou um COPY atualiza cada contagem uma vez só.
+-- TG_ARGV[0]: tabela de contagem; TG_ARGV[1]: coluna agrupada.
+CREATE OR REPLACE FUNCTION atualizar_contagem() RETURNS trigger
+    LANGUAGE plpgsql
+AS $$
+DECLARE
+    contagem text := TG_ARGV[0];
+    coluna text := TG_ARGV[1];
+    deltas text[] := '{}';
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        EXECUTE format('DELETE FROM %I', contagem);
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        deltas := deltas || format('SELECT %I::text AS chave, 1 AS delta FROM novas', coluna);
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        deltas := deltas || format('SELECT %I::text AS chave, -1 AS delta FROM antigas', coluna);
+    END IF;
+    EXECUTE format(
+        'INSERT INTO %1$I (%2$I, slot, total)
+         SELECT chave, $1, SUM(delta) FROM (%3$s) d
+         GROUP BY chave HAVING SUM(delta) <> 0 ORDER BY chave
+         ON CONFLICT (%2$I, slot) DO UPDATE SET total = %1$I.total + EXCLUDED.total',
+        contagem, coluna, array_to_string(deltas, ' UNION ALL ')
+    ) USING pg_backend_pid() % 16;
+    RETURN NULL;
+END
+$$;
+
+-- Tabelas de transição não podem ser usadas num gatilho com mais de um evento,
+-- então há um gatilho por evento. CREATE TRIGGER bloqueia escritas na tabela
+-- até o fim da migração, o que mantém a carga inicial consistente.
+DO $$
+DECLARE
+    c RECORD;
+BEGIN
+    FOR c IN SELECT * FROM (VALUES
+        ('agendamento', 'contagem_agendamento_status', 'status'),
+        ('encaminhamento', 'contagem_encaminhamento_tipo', 'tipo'),
+        ('consulta', 'contagem_consultas_medico', 'crm')
+    ) AS v(tabela, contagem, coluna) LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', c.tabela || '_contagem_ins', c.tabela);
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', c.tabela || '_contagem_upd', c.tabela);
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', c.tabela || '_contagem_del', c.tabela);
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', c.tabela || '_contagem_trunc', c.tabela);
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER INSERT ON %I REFERENCING NEW TABLE AS novas
+             FOR EACH STATEMENT EXECUTE FUNCTION atualizar_contagem(%L, %L)',
+            c.tabela || '_contagem_ins', c.tabela, c.contagem, c.coluna);
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER UPDATE ON %I REFERENCING OLD TABLE AS antigas NEW TABLE AS novas
+             FOR EACH STATEMENT EXECUTE FUNCTION atualizar_contagem(%L, %L)',
+            c.tabela || '_contagem_upd', c.tabela, c.contagem, c.coluna);
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER DELETE ON %I REFERENCING OLD TABLE AS antigas
+             FOR EACH STATEMENT EXECUTE FUNCTION atualizar_contagem(%L, %L)',
+            c.tabela || '_contagem_del', c.tabela, c.contagem, c.coluna);
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER TRUNCATE ON %I
+             FOR EACH STATEMENT EXECUTE FUNCTION atualizar_contagem(%L, %L)',
+            c.tabela || '_contagem_trunc', c.tabela, c.contagem, c.coluna);
+
+        EXECUTE format('DELETE FROM %I', c.contagem);
+        EXECUTE format(
+            'INSERT INTO %1$I (%2$I, slot, total) SELECT %2$I::text, 0, COUNT(*) FROM %3$I GROUP BY 1',
+            c.contagem, c.coluna, c.tabela);
+    END LOOP;
+END
+$$;
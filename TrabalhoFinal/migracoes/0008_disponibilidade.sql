@@ -0,0 +1,4 @@
+-- GET /medicos/disponibilidade parte dos médicos de uma especialidade; as
+-- consultas de cada um vêm de idx_consulta_crm_data_hora (0004).
+CREATE INDEX IF NOT EXISTS idx_medico_especialidade
+    ON Medico (especialidade, crm);
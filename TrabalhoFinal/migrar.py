@@ -0,0 +1,206 @@
+"""Migrações versionadas do SistemaClinico (tabelas, índices e views materializadas).
+
+Os arquivos em migracoes/ (NNNN_nome.sql) são aplicados em ordem, cada um em
+uma transação, e registrados em schema_migracoes com o checksum do conteúdo.
+
+    python migrar.py aplicar     # aplica as pendentes
+    python migrar.py verificar   # versões, checksums, índices e views; sai com 1 se faltar algo
+    python migrar.py status
+
+Com DB_MIGRATIONS=apply a API aplica as pendentes ao subir; o padrão (verify)
+só registra no log o que estiver faltando, e off desliga.
+"""
+import argparse
+import hashlib
+import logging
+import os
+import re
+import sys
+
+from db import get_connection
+
+logger = logging.getLogger(__name__)
+
+DIRETORIO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migracoes")
+DB_MIGRATIONS = os.getenv("DB_MIGRATIONS", "verify")
+
+# Chave do pg_advisory_lock: várias instâncias subindo juntas aplicam uma de cada vez.
+TRAVA = 7_301_020
+
+RE_ARQUIVO = re.compile(r"^(\d{4})_(\w+)\.sql$")
+RE_INDICE = re.compile(r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+(?:CONCURRENTLY\s+)?(?:IF\s+NOT\s+EXISTS\s+)?(\w+)", re.IGNORECASE)
+RE_VIEW = re.compile(r"CREATE\s+MATERIALIZED\s+VIEW\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)", re.IGNORECASE)
+
+
+def listar_migracoes(diretorio=DIRETORIO):
+    migracoes = []
+    for arquivo in sorted(os.listdir(diretorio)):
+        m = RE_ARQUIVO.match(arquivo)
+        if not m:
+            continue
+        with open(os.path.join(diretorio, arquivo), encoding="utf-8") as f:
+            sql = f.read()
+        migracoes.append({
+            "versao": int(m.group(1)),
+            "nome": m.group(2),
+            "sql": sql,
+            "checksum": hashlib.sha256(sql.replace("\r\n", "\n").encode()).hexdigest(),
+        })
+    versoes = [m["versao"] for m in migracoes]
+    if len(set(versoes)) != len(versoes):
+        raise RuntimeError(f"Versões de migração repetidas em {diretorio}.")
+    return migracoes
+
+def criar_controle(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migracoes (
+            versao     INT PRIMARY KEY,
+            nome       TEXT NOT NULL,
+            checksum   TEXT NOT NULL,
+            aplicada_em TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """)
+
+def aplicadas(cursor):
+    cursor.execute("SELECT versao, nome, checksum, aplicada_em FROM schema_migracoes ORDER BY versao")
+    return {r[0]: {"nome": r[1], "checksum": r[2], "aplicada_em": r[3]} for r in cursor.fetchall()}
+
+def aplicar(conn, migracoes=None):
+    migracoes = migracoes if migracoes is not None else listar_migracoes()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT pg_advisory_lock(%s)", (TRAVA,))
+        try:
+            criar_controle(cursor)
+            conn.commit()
+            feitas = aplicadas(cursor)
+            alteradas = [m for m in migracoes if m["versao"] in feitas and feitas[m["versao"]]["checksum"] != m["checksum"]]
+            if alteradas:
+                raise RuntimeError(
+                    "Migrações já aplicadas foram alteradas: "
+                    + ", ".join(f"{m['versao']:04d}_{m['nome']}" for m in alteradas)
+                    + ". Crie uma nova versão em vez de editar uma aplicada."
+                )
+            novas = []
+            for m in migracoes:
+                if m["versao"] in feitas:
+                    continue
+                try:
+                    cursor.execute(m["sql"])
+                    cursor.execute(
+                        "INSERT INTO schema_migracoes (versao, nome, checksum) VALUES (%s, %s, %s)",
+                        (m["versao"], m["nome"], m["checksum"])
+                    )
+                    conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    raise RuntimeError(f"Falha ao aplicar {m['versao']:04d}_{m['nome']}: {e}") from e
+                logger.info("Migração %04d_%s aplicada", m["versao"], m["nome"])
+                novas.append(m)
+            return novas
+        finally:
+            conn.rollback()
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (TRAVA,))
+            conn.commit()
+    finally:
+        cursor.close()
+
+def verificar(conn, migracoes=None):
+    # Lista de problemas: migrações pendentes ou alteradas e índices/views que
+    # as migrações declaram mas não existem (ou ficaram inválidos) no banco.
+    migracoes = migracoes if migracoes is not None else listar_migracoes()
+    problemas = []
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT to_regclass('schema_migracoes') IS NOT NULL")
+        feitas = aplicadas(cursor) if cursor.fetchone()[0] else {}
+        conhecidas = {m["versao"] for m in migracoes}
+        for m in migracoes:
+            feita = feitas.get(m["versao"])
+            if feita is None:
+                problemas.append(f"pendente: {m['versao']:04d}_{m['nome']}")
+            elif feita["checksum"] != m["checksum"]:
+                problemas.append(f"alterada depois de aplicada: {m['versao']:04d}_{m['nome']}")
+        for versao in sorted(set(feitas) - conhecidas):
+            problemas.append(f"aplicada no banco mas ausente em migracoes/: {versao:04d}_{feitas[versao]['nome']}")
+
+        indices = sorted({n.lower() for m in migracoes for n in RE_INDICE.findall(m["sql"])})
+        cursor.execute(
+            """
+            SELECT c.relname, i.indisvalid
+            FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = ANY(%s)
+            """,
+            (indices,)
+        )
+        existentes = dict(cursor.fetchall())
+        for nome in indices:
+            if nome not in existentes:
+                problemas.append(f"índice ausente: {nome}")
+            elif not existentes[nome]:
+                problemas.append(f"índice inválido (recrie com REINDEX): {nome}")
+
+        views = sorted({n.lower() for m in migracoes for n in RE_VIEW.findall(m["sql"])})
+        cursor.execute("SELECT matviewname FROM pg_matviews WHERE matviewname = ANY(%s)", (views,))
+        existentes = {r[0] for r in cursor.fetchall()}
+        problemas += [f"view materializada ausente: {nome}" for nome in views if nome not in existentes]
+        return problemas
+    finally:
+        cursor.close()
+        conn.rollback()
+
+def ao_iniciar(modo=DB_MIGRATIONS):
+    # Chamado no lifespan da API. Falhas só vão para o log: a API sobe mesmo
+    # sem banco, como antes.
+    if modo == "off":
+        return
+    try:
+        conn = get_connection()
+    except Exception as e:
+        logger.warning("Migrações não verificadas: sem conexão com o banco (%s)", e)
+        return
+    try:
+        if modo == "apply":
+            aplicar(conn)
+        for problema in verificar(conn):
+            logger.warning("Migrações: %s", problema)
+    except Exception as e:
+        logger.error("Migrações: %s", e)
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("comando", choices=["aplicar", "verificar", "status"])
+    parser.add_argument("--dsn", default=os.getenv("DATABASE_URL"))
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    conn = get_connection(args.dsn)
+    try:
+        if args.comando == "aplicar":
+            novas = aplicar(conn)
+            print(f"{len(novas)} migração(ões) aplicada(s).")
+            args.comando = "verificar"
+        if args.comando == "status":
+            cursor = conn.cursor()
+            cursor.execute("SELECT to_regclass('schema_migracoes') IS NOT NULL")
+            feitas = aplicadas(cursor) if cursor.fetchone()[0] else {}
+            cursor.close()
+            for m in listar_migracoes():
+                feita = feitas.get(m["versao"])
+                situacao = feita["aplicada_em"].isoformat(timespec="seconds") if feita else "pendente"
+                print(f"{m['versao']:04d}_{m['nome']:<32} {situacao}")
+            return 0
+        problemas = verificar(conn)
+        for problema in problemas:
+            print(problema)
+        if not problemas:
+            print("Banco em dia com as migrações.")
+        return 1 if problemas else 0
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
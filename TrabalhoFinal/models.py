@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional 
+from typing import Dict, List, Optional 
 from datetime import date, datetime
 from enum import Enum
 
@@ -165,6 +165,19 @@ class RemarcaCreate(BaseModel):
     data_remarcacao: date
     quem_solicitou: Optional[str] = None
 
+class ReagendamentoCreate(BaseModel):
+    id_agendamento: int
+    id_paciente: int
+    nova_data: datetime
+    observacoes: Optional[str] = None
+    motivo: Optional[str] = None
+    data_remarcacao: Optional[date] = None
+    quem_solicitou: Optional[str] = None
+
+class ReagendamentoResponse(BaseModel):
+    agendamento: Agendamento
+    remarca: Remarca
+
 class ExameInfo(BaseModel):
     id_exame: int
     nome: str
@@ -221,4 +234,69 @@ class ExamesConsultasPacienteReport(BaseModel):
     nome_paciente: str
     count: int
     exames_realizados: str
-    total_consultas: int
\ No newline at end of file
+    total_consultas: int
+
+class PacientePage(BaseModel):
+    items: List[PacienteResponse]
+    next_cursor: Optional[str] = None
+
+class AgendamentoPage(BaseModel):
+    items: List[Agendamento]
+    next_cursor: Optional[str] = None
+
+class ConsultaPage(BaseModel):
+    items: List[Consulta]
+    next_cursor: Optional[str] = None
+
+class MedicoPage(BaseModel):
+    items: List[Medico]
+    next_cursor: Optional[str] = None
+
+class RemarcaPage(BaseModel):
+    items: List[Remarca]
+    next_cursor: Optional[str] = None
+
+class BulkCreatedItem(BaseModel):
+    indice: int
+    id: int
+
+class BulkRowError(BaseModel):
+    indice: int
+    detalhe: str
+
+class BulkCreateResponse(BaseModel):
+    criados: List[BulkCreatedItem] = []
+    erros: List[BulkRowError] = []
+
+class EncaminhamentoPage(BaseModel):
+    items: List[EncaminhamentoResponse]
+    next_cursor: Optional[str] = None
+
+class CalendarioSlot(BaseModel):
+    id_agendamento: int
+    id_paciente: int
+    data: datetime
+    status: StatusAgendamento
+
+class CalendarioDia(BaseModel):
+    dia: date
+    total: int
+    por_status: Dict[str, int] = {}
+    horarios: List[CalendarioSlot] = []
+
+class IntervaloLivre(BaseModel):
+    inicio: datetime
+    fim: datetime
+
+class DisponibilidadeMedico(BaseModel):
+    crm: str
+    nome: str
+    livres: List[IntervaloLivre] = []
+
+class DashboardView(BaseModel):
+    ultimo_refresh: Optional[datetime] = None
+    staleness_s: Optional[float] = None
+
+class DashboardResponse(BaseModel):
+    relatorios: Dict[str, list]
+    views: Dict[str, DashboardView] = {}
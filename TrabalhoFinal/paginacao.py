@@ -0,0 +1,37 @@
+from fastapi import HTTPException
+import base64
+import json
+
+LIMITE_PADRAO = 100
+LIMITE_MAXIMO = 1000
+
+def encode_cursor(valores):
+    return base64.urlsafe_b64encode(json.dumps(list(valores)).encode()).decode()
+
+def decode_cursor(cursor, tamanho):
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido.")
+    if not isinstance(valores, list) or len(valores) != tamanho:
+        raise HTTPException(status_code=400, detail="Cursor inválido.")
+    return valores
+
+def keyset(colunas, cursor):
+    # Condição "(a, b) > (%s, %s)" que continua a leitura após a última chave
+    # devolvida, aproveitando o índice da chave primária.
+    if not cursor:
+        return None, []
+    valores = decode_cursor(cursor, len(colunas))
+    condicao = "(%s) > (%s)" % (", ".join(colunas), ", ".join(["%s"] * len(colunas)))
+    return condicao, valores
+
+def order_by(colunas):
+    return " ORDER BY " + ", ".join(colunas)
+
+def paginar(rows, limit, chave):
+    # A consulta busca limit + 1 linhas; a linha extra só indica que há próxima página.
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(chave(rows[-1]))
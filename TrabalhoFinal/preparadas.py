@@ -0,0 +1,74 @@
+from psycopg2 import errors
+import os
+import re
+import threading
+import weakref
+
+# Consultas quentes de uma linha preparadas uma vez por conexão do pool
+# (PREPARE/EXECUTE) e reaproveitadas nas chamadas seguintes, sem reenviar nem
+# replanejar o SQL. DB_PREPARE=0 desliga (ex.: atrás de um pgbouncer em modo
+# transaction, em que a sessão muda a cada transação).
+PREPARE_ATIVO = os.getenv("DB_PREPARE", "1") == "1"
+
+
+class Preparadas:
+    def __init__(self, ativo=True):
+        self.ativo = ativo
+        self._sqls = {}
+        self._por_conexao = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def registrar(self, nome, sql):
+        # Os placeholders %s viram $1, $2, ... na ordem em que aparecem.
+        contador = iter(range(1, sql.count("%s") + 1))
+        preparado = re.sub(r"%s", lambda _: f"${next(contador)}", sql).replace("%%", "%")
+        self._sqls[nome] = (sql, preparado)
+        self._stats[nome] = {"prepares": 0, "executes": 0}
+        return nome
+
+    def _preparadas_em(self, conn):
+        with self._lock:
+            return self._por_conexao.setdefault(conn, set())
+
+    def executar(self, cursor, nome, params):
+        sql, preparado = self._sqls[nome]
+        if not self.ativo:
+            cursor.execute(sql, params)
+            return
+        feitas = self._preparadas_em(cursor.connection)
+        if nome not in feitas:
+            cursor.execute(f"PREPARE {nome} AS {preparado}")
+            feitas.add(nome)
+            with self._lock:
+                self._stats[nome]["prepares"] += 1
+        executar = f"EXECUTE {nome} ({', '.join(['%s'] * len(params))})" if params else f"EXECUTE {nome}"
+        try:
+            cursor.execute(executar, params)
+        except errors.InvalidSqlStatementName:
+            # A sessão perdeu as preparadas (DISCARD ALL, troca de backend): prepara de novo.
+            cursor.connection.rollback()
+            feitas.clear()
+            self.executar(cursor, nome, params)
+            return
+        with self._lock:
+            self._stats[nome]["executes"] += 1
+
+    def stats(self):
+        with self._lock:
+            por_consulta = {}
+            for nome, s in self._stats.items():
+                reusos = max(s["executes"] - s["prepares"], 0)
+                por_consulta[nome] = dict(
+                    s,
+                    reuses=reusos,
+                    reuse_ratio=round(reusos / s["executes"], 3) if s["executes"] else 0.0
+                )
+            return {
+                "ativo": self.ativo,
+                "conexoes": len(self._por_conexao),
+                "consultas": por_consulta,
+            }
+
+
+preparadas = Preparadas(ativo=PREPARE_ATIVO)
@@ -0,0 +1,199 @@
+from fastapi import Request
+from db import ConnectionPool, PoolError, get_db, get_pool
+from metricas import requisicao_atual, registrar_espera_conexao
+import logging
+import math
+import os
+import psycopg2
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Leituras em réplica: com DATABASE_REPLICA_URL definido, os GETs dos routers
+# (get_db_leitura) usam um segundo pool, apontado para a réplica. Voltam para a
+# primária quando:
+#   - o cliente escreveu há menos de DB_READ_YOUR_WRITES segundos, para ele ler
+#     o que acabou de gravar. Toda escrita bem-sucedida devolve o header
+#     X-Ultima-Escrita, que o cliente repete nas requisições seguintes (é o que
+#     o script.js faz: a API está em outra origem e o fetch não manda cookies),
+#     e também um cookie com o mesmo valor, para clientes da mesma origem;
+#   - o atraso de replicação passa de DB_REPLICA_MAX_LAG segundos, medido a
+#     cada DB_REPLICA_LAG_CHECK segundos, ou a réplica não responde.
+# Para testar localmente, uma segunda instância como standby da primeira:
+#   pg_basebackup -h localhost -U postgres -D /tmp/replica -R -X stream
+#   pg_ctl -D /tmp/replica -o "-p 5433" start
+#   DATABASE_REPLICA_URL="dbname=SistemaClinico user=postgres host=localhost port=5433"
+REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "5"))
+REPLICA_LAG_CHECK = float(os.getenv("DB_REPLICA_LAG_CHECK", "1"))
+READ_YOUR_WRITES = float(os.getenv("DB_READ_YOUR_WRITES", "5"))
+COOKIE_ESCRITA = "ultima_escrita"
+HEADER_ESCRITA = "X-Ultima-Escrita"
+
+SQL_LAG = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool_replica():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    REPLICA_URL,
+                    minconn=int(os.getenv("DB_REPLICA_POOL_MIN", "1")),
+                    maxconn=int(os.getenv("DB_REPLICA_POOL_MAX", os.getenv("DB_POOL_MAX", "10"))),
+                    timeout=float(os.getenv("DB_REPLICA_POOL_TIMEOUT", "2")),
+                    max_lifetime=float(os.getenv("DB_POOL_MAX_LIFETIME", "1800")),
+                    ping_after=float(os.getenv("DB_POOL_PING_AFTER", "5")),
+                )
+    return _pool
+
+def close_pool_replica():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+class MonitorReplica:
+    def __init__(self, lag_max=REPLICA_MAX_LAG, intervalo=REPLICA_LAG_CHECK):
+        self.lag_max = lag_max
+        self.intervalo = intervalo
+        self.lag = None
+        self.erro = None
+        self.verificado_em = None
+        self.leituras = {"replica": 0, "primaria": 0}
+        self._ultima_medicao = 0.0
+        self._lock = threading.Lock()
+
+    def disponivel(self):
+        # A medição é feita por quem chegar primeiro depois do intervalo; as
+        # demais requisições usam o último valor em vez de esperar por ela.
+        if time.monotonic() - self._ultima_medicao >= self.intervalo and self._lock.acquire(blocking=False):
+            try:
+                self._medir()
+            finally:
+                self._lock.release()
+        return self.erro is None and self.lag is not None and self.lag <= self.lag_max
+
+    def _medir(self):
+        self._ultima_medicao = time.monotonic()
+        try:
+            pool = get_pool_replica()
+            conn = pool.getconn()
+        except (PoolError, psycopg2.Error) as e:
+            self.falhou(e)
+            return
+        try:
+            cursor = conn.cursor()
+            cursor.execute(SQL_LAG)
+            lag = cursor.fetchone()[0]
+            cursor.close()
+            conn.rollback()
+            self.lag = float(lag) if lag is not None else None
+            self.erro = None
+        except psycopg2.Error as e:
+            self.falhou(e)
+        finally:
+            pool.putconn(conn)
+        self.verificado_em = time.time()
+
+    def falhou(self, erro):
+        if self.erro is None:
+            logger.warning("Réplica indisponível, leituras na primária: %s", erro)
+        self.erro = str(erro)
+        self.lag = None
+
+    def contar(self, origem):
+        self.leituras[origem] += 1
+        metricas = requisicao_atual.get()
+        if metricas is not None:
+            metricas.banco = origem
+
+    def stats(self):
+        return {
+            "configurada": REPLICA_URL is not None,
+            "lag_s": self.lag,
+            "lag_max_s": self.lag_max,
+            "disponivel": self.erro is None and self.lag is not None and self.lag <= self.lag_max,
+            "erro": self.erro,
+            "verificado_em": self.verificado_em,
+            "read_your_writes_s": READ_YOUR_WRITES,
+            "leituras": dict(self.leituras),
+            "pool": _pool.stats() if _pool is not None else None,
+        }
+
+
+monitor = MonitorReplica()
+
+def escreveu_recentemente(request):
+    valor = request.headers.get(HEADER_ESCRITA) or request.cookies.get(COOKIE_ESCRITA)
+    try:
+        ate = float(valor or 0)
+    except ValueError:
+        return False
+    agora = time.time()
+    # Valores além da janela não vêm desta API: não prendem o cliente na primária.
+    return agora < ate <= agora + READ_YOUR_WRITES
+
+def usar_replica(request):
+    return REPLICA_URL is not None and not escreveu_recentemente(request) and monitor.disponivel()
+
+def get_db_leitura(request: Request):
+    conn = getattr(request.state, "conexao_leitura", None)
+    if conn is not None:
+        # Já aberta pela ETag (etag.py): o handler lê no mesmo servidor, e
+        # depois, em que as versões da ETag foram lidas.
+        yield conn
+        return
+    yield from conexao_leitura(request)
+
+def conexao_leitura(request):
+    if usar_replica(request):
+        pool = get_pool_replica()
+        inicio = time.perf_counter()
+        try:
+            conn = pool.getconn()
+        except (PoolError, psycopg2.Error) as e:
+            monitor.falhou(e)
+            conn = None
+        finally:
+            registrar_espera_conexao(time.perf_counter() - inicio)
+        if conn is not None:
+            monitor.contar("replica")
+            try:
+                yield conn
+            finally:
+                pool.putconn(conn)
+            return
+    monitor.contar("primaria")
+    yield from get_db()
+
+def pool_leitura(request):
+    # Para quem gerencia a conexão por conta própria (exportações em stream).
+    if usar_replica(request):
+        monitor.contar("replica")
+        return get_pool_replica()
+    monitor.contar("primaria")
+    return get_pool()
+
+async def middleware_read_your_writes(request, call_next):
+    resposta = await call_next(request)
+    if REPLICA_URL is not None and request.method not in ("GET", "HEAD", "OPTIONS") and resposta.status_code < 400:
+        ate = f"{time.time() + READ_YOUR_WRITES:.3f}"
+        resposta.headers[HEADER_ESCRITA] = ate
+        resposta.set_cookie(
+            COOKIE_ESCRITA, ate,
+            max_age=math.ceil(READ_YOUR_WRITES), httponly=True, samesite="lax"
+        )
+    return resposta
@@ -0,0 +1,45 @@
+from fastapi import Response
+from etag import ETagPorCodificacao, headers_etag
+import os
+
+# Caminho rápido opcional para as listagens grandes (JSON_FAST=1): as linhas
+# viram dicts e são serializadas com orjson, sem construir os modelos pydantic
+# nem revalidar o response_model. O JSON produzido é o mesmo do caminho padrão.
+JSON_RAPIDO = os.getenv("JSON_FAST", "0") == "1"
+
+# Compressão da resposta: gzip (padrão), br (brotli, com gzip para clientes sem
+# suporte) ou off. Corpos menores que COMPRESS_MIN_SIZE bytes vão sem compressão.
+COMPRESSAO = os.getenv("COMPRESSION", "gzip")
+COMPRESSAO_MIN_BYTES = int(os.getenv("COMPRESS_MIN_SIZE", "1000"))
+
+if JSON_RAPIDO:
+    try:
+        import orjson
+    except ImportError:
+        raise RuntimeError("JSON_FAST=1 requer o pacote 'orjson'.")
+
+
+class RespostaJSONRapida(Response):
+    media_type = "application/json"
+
+    def render(self, content):
+        return orjson.dumps(content)
+
+def resposta_pagina(items, next_cursor):
+    return RespostaJSONRapida({"items": items, "next_cursor": next_cursor}, headers=headers_etag.get())
+
+def configurar_compressao(app):
+    if COMPRESSAO == "off":
+        return
+    if COMPRESSAO == "br":
+        try:
+            from brotli_asgi import BrotliMiddleware
+        except ImportError:
+            raise RuntimeError("COMPRESSION=br requer o pacote 'brotli-asgi'.")
+        app.add_middleware(BrotliMiddleware, minimum_size=COMPRESSAO_MIN_BYTES, gzip_fallback=True)
+    elif COMPRESSAO == "gzip":
+        from starlette.middleware.gzip import GZipMiddleware
+        app.add_middleware(GZipMiddleware, minimum_size=COMPRESSAO_MIN_BYTES, compresslevel=6)
+    else:
+        raise RuntimeError(f"COMPRESSION inválido: {COMPRESSAO!r} (use gzip, br ou off).")
+    app.add_middleware(ETagPorCodificacao)
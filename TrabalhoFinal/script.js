@@ -48,9 +48,19 @@ document.addEventListener('DOMContentLoaded', () => {
     });
 
 
+    // Read-your-writes com réplica (replica.py): depois de uma escrita a API
+    // devolve X-Ultima-Escrita, e enquanto o prazo vale o valor vai junto nas
+    // requisições seguintes, que então leem da primária.
+    let ultimaEscrita = null;
+
     const apiFetch = async (url, options = {}) => {
         try {
-            const response = await fetch(url, options);
+            const headers = { ...(options.headers || {}) };
+            if (ultimaEscrita && Number(ultimaEscrita) > Date.now() / 1000) {
+                headers['X-Ultima-Escrita'] = ultimaEscrita;
+            }
+            const response = await fetch(url, { ...options, headers });
+            ultimaEscrita = response.headers.get('X-Ultima-Escrita') || ultimaEscrita;
             if (!response.ok) {
                 const errorData = await response.json();
                 throw new Error(errorData.detail || `Erro HTTP: ${response.status}`);
@@ -63,12 +73,35 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     };
 
+    // Listas paginadas sob demanda: a primeira página vem ao abrir a seção e as
+    // seguintes só quando o usuário clica em "Carregar mais" (next_cursor da API).
+    const listaPaginada = (url, botaoId, render) => {
+        const botao = document.getElementById(botaoId);
+        let cursor = null;
+
+        const carregar = async (anexar) => {
+            const pageUrl = anexar && cursor ? `${url}${url.includes('?') ? '&' : '?'}cursor=${encodeURIComponent(cursor)}` : url;
+            botao.disabled = true;
+            try {
+                const page = await apiFetch(pageUrl);
+                render(page.items, anexar);
+                cursor = page.next_cursor;
+            } finally {
+                botao.disabled = false;
+                botao.style.display = cursor ? 'block' : 'none';
+            }
+        };
+
+        botao.addEventListener('click', () => carregar(true));
+        return () => carregar(false);
+    };
+
     const agendamentosTbody = document.getElementById('agendamentos-tbody');
     const agendamentoForm = document.getElementById('agendamento-form');
 
-    const renderAgendamentos = (agendamentos) => {
-        agendamentosTbody.innerHTML = '';
-        if (agendamentos.length === 0) {
+    const renderAgendamentos = (agendamentos, anexar = false) => {
+        if (!anexar) agendamentosTbody.innerHTML = '';
+        if (agendamentos.length === 0 && !anexar) {
             agendamentosTbody.innerHTML = '<tr><td colspan="5">Nenhum agendamento encontrado.</td></tr>';
             return;
         }
@@ -88,7 +121,7 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     };
 
-    const loadAgendamentos = () => apiFetch(`${API_BASE_URL}/agendamentos`).then(renderAgendamentos);
+    const loadAgendamentos = listaPaginada(`${API_BASE_URL}/agendamentos/`, 'agendamentos-mais-btn', renderAgendamentos);
 
     agendamentoForm.addEventListener('submit', async (e) => {
         e.preventDefault();
@@ -119,9 +152,9 @@ document.addEventListener('DOMContentLoaded', () => {
     const consultasTbody = document.getElementById('consultas-tbody');
     const consultaForm = document.getElementById('consulta-form');
 
-    const renderConsultas = (consultas) => {
-        consultasTbody.innerHTML = '';
-        if (consultas.length === 0) {
+    const renderConsultas = (consultas, anexar = false) => {
+        if (!anexar) consultasTbody.innerHTML = '';
+        if (consultas.length === 0 && !anexar) {
             consultasTbody.innerHTML = '<tr><td colspan="6">Nenhuma consulta encontrada.</td></tr>';
             return;
         }
@@ -145,7 +178,7 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     };
 
-    const loadConsultas = () => apiFetch(`${API_BASE_URL}/consultas`).then(renderConsultas);
+    const loadConsultas = listaPaginada(`${API_BASE_URL}/consultas/`, 'consultas-mais-btn', renderConsultas);
 
     consultaForm.addEventListener('submit', async (e) => {
         e.preventDefault();
@@ -269,9 +302,9 @@ document.addEventListener('DOMContentLoaded', () => {
     const medicosTbody = document.getElementById('medicos-tbody');
     const medicoForm = document.getElementById('medico-form');
 
-    const renderMedicos = (medicos) => {
-        medicosTbody.innerHTML = '';
-        if (medicos.length === 0) {
+    const renderMedicos = (medicos, anexar = false) => {
+        if (!anexar) medicosTbody.innerHTML = '';
+        if (medicos.length === 0 && !anexar) {
             medicosTbody.innerHTML = '<tr><td colspan="4">Nenhum médico encontrado.</td></tr>';
             return;
         }
@@ -290,7 +323,7 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     };
 
-    const loadMedicos = () => apiFetch(`${API_BASE_URL}/medicos`).then(renderMedicos);
+    const loadMedicos = listaPaginada(`${API_BASE_URL}/medicos/`, 'medicos-mais-btn', renderMedicos);
 
     medicoForm.addEventListener('submit', async (e) => {
         e.preventDefault();
@@ -315,9 +348,9 @@ document.addEventListener('DOMContentLoaded', () => {
     const telefonesContainer = document.getElementById('pac_telefones_container');
     const addTelefoneBtn = document.getElementById('add_telefone_btn');
 
-    const renderPacientes = (pacientes) => {
-        pacientesTbody.innerHTML = '';
-        if (pacientes.length === 0) {
+    const renderPacientes = (pacientes, anexar = false) => {
+        if (!anexar) pacientesTbody.innerHTML = '';
+        if (pacientes.length === 0 && !anexar) {
             pacientesTbody.innerHTML = '<tr><td colspan="8">Nenhum paciente encontrado.</td></tr>';
             return;
         }
@@ -343,7 +376,7 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     };
 
-    const loadPacientes = () => apiFetch(`${API_BASE_URL}/pacientes`).then(renderPacientes);
+    const loadPacientes = listaPaginada(`${API_BASE_URL}/pacientes/`, 'pacientes-mais-btn', renderPacientes);
 
     const addTelefoneInput = (numero = '', tipo = '') => {
         const div = document.createElement('div');
@@ -394,9 +427,9 @@ document.addEventListener('DOMContentLoaded', () => {
     const remarcasTbody = document.getElementById('remarcas-tbody');
     const remarcaForm = document.getElementById('remarca-form');
 
-    const renderRemarcas = (remarcas) => {
-        remarcasTbody.innerHTML = '';
-        if (remarcas.length === 0) {
+    const renderRemarcas = (remarcas, anexar = false) => {
+        if (!anexar) remarcasTbody.innerHTML = '';
+        if (remarcas.length === 0 && !anexar) {
             remarcasTbody.innerHTML = '<tr><td colspan="6">Nenhuma remarca encontrada.</td></tr>';
             return;
         }
@@ -414,7 +447,7 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     };
 
-    const loadRemarcas = () => apiFetch(`${API_BASE_URL}/remarcas`).then(renderRemarcas);
+    const loadRemarcas = listaPaginada(`${API_BASE_URL}/remarcas/`, 'remarcas-mais-btn', renderRemarcas);
 
     remarcaForm.addEventListener('submit', async (e) => {
         e.preventDefault();
@@ -446,44 +479,46 @@ document.addEventListener('DOMContentLoaded', () => {
 
     const loadReports = async () => {
         try {
-            const statusData = await apiFetch(`${API_BASE_URL}/relatorios/agendamentos-por-status`);
+            const { relatorios } = await apiFetch(`${API_BASE_URL}/relatorios/dashboard`);
+
+            const statusData = relatorios['agendamentos-por-status'];
             reportAgendamentosStatus.innerHTML = '<ul>' + statusData.map(item => `<li><strong>${item.status}:</strong> ${item.total}</li>`).join('') + '</ul>';
 
-            const medicosData = await apiFetch(`${API_BASE_URL}/relatorios/medicos-total-consultas`);
+            const medicosData = relatorios['medicos-total-consultas'];
             reportMedicosConsultas.innerHTML = '<ul>' + medicosData.map(item => `<li><strong>${item.medico}:</strong> ${item.total_consultas} consultas</li>`).join('') + '</ul>';
 
-            const encaminhamentosData = await apiFetch(`${API_BASE_URL}/relatorios/encaminhamentos-por-tipo`);
+            const encaminhamentosData = relatorios['encaminhamentos-por-tipo'];
             reportEncaminhamentosTipo.innerHTML = '<ul>' + encaminhamentosData.map(item => `<li><strong>${item.tipo}:</strong> ${item.quantidade}</li>`).join('') + '</ul>';
 
-            const pacientesCardioData = await apiFetch(`${API_BASE_URL}/relatorios/pacientes-cardiologia`);
+            const pacientesCardioData = relatorios['pacientes-cardiologia'];
             if (pacientesCardioData.length > 0) {
                 reportPacientesCardiologia.innerHTML = '<ul>' + pacientesCardioData.map(item => `<li><strong>${item.paciente}:</strong> ${item.medico} (${item.especialidade})</li>`).join('') + '</ul>';
             } else {
                 reportPacientesCardiologia.innerHTML = '<p>Nenhum paciente encontrado na cardiologia.</p>';
             }
 
-            const categoriaPacienteData = await apiFetch(`${API_BASE_URL}/relatorios/categoria-paciente`);
+            const categoriaPacienteData = relatorios['categoria-paciente'];
             if (categoriaPacienteData.length > 0) {
                 reportCategoriaPaciente.innerHTML = '<ul>' + categoriaPacienteData.map(item => `<li><strong>${item.nome}:</strong> ${item.categoria} (${item.total_agendamentos} agendamentos)</li>`).join('') + '</ul>';
             } else {
                 reportCategoriaPaciente.innerHTML = '<p>Nenhuma categorização de paciente disponível.</p>';
             }
 
-            const ultimoAgendamentoData = await apiFetch(`${API_BASE_URL}/relatorios/ultimo-agendamento-paciente`);
+            const ultimoAgendamentoData = relatorios['ultimo-agendamento-paciente'];
             if (ultimoAgendamentoData.length > 0) {
                 reportUltimoAgendamento.innerHTML = '<ul>' + ultimoAgendamentoData.map(item => `<li><strong>${item.nome}:</strong> ${item.status} (Tel: ${item.telefone_paciente})</li>`).join('') + '</ul>';
             } else {
                 reportUltimoAgendamento.innerHTML = '<p>Nenhum último agendamento disponível.</p>';
             }
 
-            const consultasEncaminhamentosData = await apiFetch(`${API_BASE_URL}/relatorios/consultas-encaminhamentos`);
+            const consultasEncaminhamentosData = relatorios['consultas-encaminhamentos'];
             if (consultasEncaminhamentosData.length > 0) {
                 reportConsultasEncaminhamentos.innerHTML = '<ul>' + consultasEncaminhamentosData.map(item => `<li><strong>Paciente:</strong> ${item.nome_paciente} | <strong>Médico:</strong> ${item.nome_medico} (${item.especialidade}) | <strong>Diagnóstico:</strong> ${item.diagnostico} | <strong>Encaminhamento:</strong> ${item.tipo_encaminhamento}</li>`).join('') + '</ul>';
             } else {
                 reportConsultasEncaminhamentos.innerHTML = '<p>Nenhum dado de consultas e encaminhamentos disponível.</p>';
             }
 
-            const examesConsultasPacienteData = await apiFetch(`${API_BASE_URL}/relatorios/exames-consultas-por-paciente`);
+            const examesConsultasPacienteData = relatorios['exames-consultas-por-paciente'];
             if (examesConsultasPacienteData.length > 0) {
                 reportExamesConsultasPaciente.innerHTML = '<ul>' + examesConsultasPacienteData.map(item => `<li><strong>Paciente:</strong> ${item.nome_paciente} | <strong>Total Exames:</strong> ${item.count} | <strong>Exames Realizados:</strong> ${item.exames_realizados} | <strong>Total Consultas:</strong> ${item.total_consultas}</li>`).join('') + '</ul>';
             } else {
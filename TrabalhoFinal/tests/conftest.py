@@ -0,0 +1,126 @@
+import os
+import sys
+import uuid
+
+import psycopg2
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+import db
+import etag
+import main
+import migrar
+import preparadas
+import replica
+
+
+class CursorFalso:
+    def __init__(self, conexao):
+        self.connection = conexao
+        self.rowcount = 0
+        self._rows = []
+
+    def execute(self, sql, params=None):
+        if sql == etag.SQL_VERSOES:
+            self.connection.leituras_versoes += 1
+            self._rows = [(t, self.connection.versoes[t]) for t in params[0] if t in self.connection.versoes]
+            return
+        self.connection.executados.append((sql, params))
+        self._rows = list(self.connection.responder(sql, params) or [])
+        self.rowcount = len(self._rows)
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def close(self):
+        pass
+
+
+class ConexaoFalsa:
+    """Conexão sem banco: registra cada execute e devolve o que `responder(sql, params)` retornar.
+
+    A leitura de versões das ETags é respondida à parte, a partir de `versoes`,
+    e não entra em `executados`.
+    """
+
+    def __init__(self, responder=None):
+        self.responder = responder or (lambda sql, params: [])
+        self.executados = []
+        self.versoes = {}
+        self.leituras_versoes = 0
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self, *args, **kwargs):
+        return CursorFalso(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+@pytest.fixture
+def conexao(monkeypatch):
+    monkeypatch.setattr(preparadas.preparadas, "ativo", False)
+    conn = ConexaoFalsa()
+    main.app.dependency_overrides[db.get_db] = lambda: conn
+    main.app.dependency_overrides[replica.get_db_leitura] = lambda: conn
+
+    def conexao_leitura(request):
+        yield conn
+    monkeypatch.setattr(etag, "conexao_leitura", conexao_leitura)
+    yield conn
+    main.app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def client(conexao):
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def banco():
+    """Conexão a um Postgres de verdade (DATABASE_URL), com as migrações
+    aplicadas num schema descartável. Sem DATABASE_URL o teste é pulado."""
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        pytest.skip("DATABASE_URL não definido")
+    schema = f"teste_{uuid.uuid4().hex[:12]}"
+    conn = psycopg2.connect(url, options=f"-c search_path={schema},public")
+    cursor = conn.cursor()
+    # 0002 chama public.unaccent: as extensões ficam em public, fora do schema descartável.
+    cursor.execute("CREATE EXTENSION IF NOT EXISTS unaccent SCHEMA public")
+    cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm SCHEMA public")
+    cursor.execute(f"CREATE SCHEMA {schema}")
+    conn.commit()
+    try:
+        migrar.aplicar(conn)
+        yield conn
+    finally:
+        conn.rollback()
+        cursor.execute(f"DROP SCHEMA {schema} CASCADE")
+        conn.commit()
+        conn.close()
+
+
+@pytest.fixture
+def client_banco(banco, monkeypatch):
+    # Como client/conexao, mas com as rotas ligadas ao banco de verdade.
+    monkeypatch.setattr(preparadas.preparadas, "ativo", False)
+    main.app.dependency_overrides[db.get_db] = lambda: banco
+    main.app.dependency_overrides[replica.get_db_leitura] = lambda: banco
+
+    def conexao_leitura(request):
+        yield banco
+    monkeypatch.setattr(etag, "conexao_leitura", conexao_leitura)
+    yield TestClient(main.app)
+    main.app.dependency_overrides.clear()
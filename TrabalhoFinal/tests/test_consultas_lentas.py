@@ -0,0 +1,49 @@
+import pytest
+
+from atualizacao import sql_atualizar
+from consultas_lentas import LogConsultasLentas, explicavel
+from crud_paciente import SQL_BUSCAR_PACIENTES, SQL_RETORNO_PACIENTE
+from crud_relatorios import RELATORIOS, sql_dashboard
+from crud_remarca import SQL_REAGENDAR
+from disponibilidade import SQL_CONFLITO, SQL_OCUPADOS, SQL_TRAVAR_MEDICO
+
+PATCH_PACIENTE = "WITH atualizado AS ({}) {}".format(
+    sql_atualizar("Paciente", {"nome": "x"}, {"id_paciente": 1}, ["*"])[0], SQL_RETORNO_PACIENTE
+)
+
+
+@pytest.mark.parametrize("sql", [
+    RELATORIOS["pacientes-cardiologia"]["sql"],
+    sql_dashboard(list(RELATORIOS)),
+    SQL_BUSCAR_PACIENTES,
+    SQL_OCUPADOS,
+    SQL_CONFLITO,
+    "SELECT * FROM Agendamento WHERE observacoes = 'Delete e update'",
+])
+def test_leituras_sao_explicaveis(sql):
+    assert explicavel(sql)
+
+
+@pytest.mark.parametrize("sql", [
+    SQL_REAGENDAR,
+    PATCH_PACIENTE,
+    SQL_TRAVAR_MEDICO,
+    "SELECT pg_try_advisory_lock(1)",
+    "SELECT * FROM Agendamento WHERE id_agendamento = 1 FOR UPDATE",
+    "SELECT * FROM Agendamento FOR NO KEY UPDATE",
+    "SELECT * INTO copia FROM Agendamento",
+    "SELECT nextval('agendamento_id_agendamento_seq')",
+    "UPDATE Agendamento SET status = 'Marcada'",
+])
+def test_escritas_e_travas_nao_sao_explicadas(sql):
+    assert not explicavel(sql)
+
+
+def test_consulta_lenta_com_efeito_nao_entra_na_amostra():
+    log = LogConsultasLentas(limiar_ms=1, amostragem=1.0)
+
+    log.observar(SQL_REAGENDAR, (1, 2), duracao=2.0, rota="POST /remarcas/reagendar")
+
+    entrada = log.listar()[0]
+    assert entrada["explain_status"] == "não amostrada"
+    assert entrada["parametros"] == ["int", "int"]
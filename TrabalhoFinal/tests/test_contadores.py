@@ -0,0 +1,45 @@
+from datetime import datetime
+
+import contadores
+
+
+def contagem_status(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT status, SUM(total)::int FROM contagem_agendamento_status GROUP BY status HAVING SUM(total) <> 0")
+    return dict(cursor.fetchall())
+
+
+def test_gatilhos_mantem_as_contagens(banco):
+    cursor = banco.cursor()
+    cursor.execute(
+        "INSERT INTO Paciente (nome, data_nascimento, sexo, cpf) VALUES ('Ana', '1990-01-01', 'F', '00000000001') RETURNING id_paciente"
+    )
+    id_paciente = cursor.fetchone()[0]
+    # Um INSERT de várias linhas, um UPDATE que move linhas entre chaves e um DELETE.
+    cursor.execute(
+        "INSERT INTO Agendamento (id_paciente, data, status) SELECT %s, %s, 'Marcada' FROM generate_series(1, 5)",
+        (id_paciente, datetime(2026, 1, 5, 8))
+    )
+    cursor.execute("UPDATE Agendamento SET status = 'Realizada' WHERE id_agendamento IN (SELECT id_agendamento FROM Agendamento ORDER BY 1 LIMIT 2)")
+    cursor.execute("DELETE FROM Agendamento WHERE id_agendamento = (SELECT MAX(id_agendamento) FROM Agendamento)")
+    banco.commit()
+
+    assert contagem_status(banco) == {"Marcada": 2, "Realizada": 2}
+    assert not any(contadores.divergencias(banco).values())
+
+
+def test_reconciliar_corrige_contagem_divergente(banco):
+    cursor = banco.cursor()
+    cursor.execute(
+        "INSERT INTO Paciente (nome, data_nascimento, sexo, cpf) VALUES ('Ana', '1990-01-01', 'F', '00000000001') RETURNING id_paciente"
+    )
+    cursor.execute("INSERT INTO Agendamento (id_paciente, data) VALUES (%s, now())", (cursor.fetchone()[0],))
+    cursor.execute("UPDATE contagem_agendamento_status SET total = total + 10")
+    banco.commit()
+
+    diferencas, reconstruidas = contadores.reconciliar(banco)
+
+    assert diferencas["contagem_agendamento_status"] == [{"chave": "Marcada", "esperado": 1, "contado": 11}]
+    assert reconstruidas == ["contagem_agendamento_status"]
+    assert contagem_status(banco) == {"Marcada": 1}
+    assert not any(contadores.divergencias(banco).values())
@@ -0,0 +1,143 @@
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import crud_medico
+import db_async
+import disponibilidade
+from disponibilidade import SQL_CONFLITO, hora_local, intervalos_livres
+
+
+def test_intervalos_livres_descontam_consultas_e_respeitam_o_expediente():
+    ocupados = [
+        datetime(2026, 1, 5, 7), datetime(2026, 1, 5, 7, 15), datetime(2026, 1, 5, 9),
+        datetime(2026, 1, 5, 18, 45), datetime(2026, 1, 6, 7, 30),
+    ]
+
+    livres = intervalos_livres(datetime(2026, 1, 5, 6), datetime(2026, 1, 6, 12), ocupados)
+
+    assert livres == [
+        (datetime(2026, 1, 5, 7, 45), datetime(2026, 1, 5, 9)),
+        (datetime(2026, 1, 5, 9, 30), datetime(2026, 1, 5, 18, 45)),
+        (datetime(2026, 1, 6, 7), datetime(2026, 1, 6, 7, 30)),
+        (datetime(2026, 1, 6, 8), datetime(2026, 1, 6, 12)),
+    ]
+
+
+def test_hora_local_usa_o_fuso_da_clinica(monkeypatch):
+    monkeypatch.setattr(disponibilidade, "CLINICA_TZ", "Europe/Lisbon")
+
+    assert hora_local(datetime.fromisoformat("2026-07-01T12:00:00-03:00")) == datetime(2026, 7, 1, 16)
+    assert hora_local(datetime(2026, 7, 1, 12)) == datetime(2026, 7, 1, 12)
+
+
+def consulta(data_hora):
+    return {"crm": "CRM1", "id_agendamento": 1, "id_paciente": 1, "data_hora": data_hora, "diagnostico": "x"}
+
+
+def test_criar_consulta_converte_o_fuso_antes_da_checagem(client, conexao, monkeypatch):
+    monkeypatch.setattr(disponibilidade, "CLINICA_TZ", "America/Sao_Paulo")
+
+    resposta = client.post("/consultas/", json=consulta("2026-01-05T14:00:00Z"))
+
+    assert resposta.status_code == 201
+    assert resposta.json()["data_hora"] == "2026-01-05T11:00:00"
+    conflito = next(params for sql, params in conexao.executados if sql == SQL_CONFLITO)
+    assert conflito == ("CRM1", datetime(2026, 1, 5, 10, 30), datetime(2026, 1, 5, 11, 30))
+    insert = next(params for sql, params in conexao.executados if "INSERT INTO Consulta" in sql)
+    assert insert[3] == datetime(2026, 1, 5, 11)
+
+
+def test_criar_consulta_com_fuso_recusa_sobreposicao(client, conexao, monkeypatch):
+    monkeypatch.setattr(disponibilidade, "CLINICA_TZ", "America/Sao_Paulo")
+    conexao.responder = lambda sql, params: [(datetime(2026, 1, 5, 11, 15),)] if sql == SQL_CONFLITO else []
+
+    resposta = client.post("/consultas/", json=consulta("2026-01-05T11:00:00-03:00"))
+
+    assert resposta.status_code == 409
+    assert conexao.commits == 0
+    assert not any("INSERT INTO Consulta" in sql for sql, _ in conexao.executados)
+
+
+class CursorAsyncFalso:
+    def __init__(self, responder):
+        self.responder = responder
+        self._rows = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, sql, params=None):
+        self._rows = self.responder(sql, params)
+
+    async def fetchall(self):
+        return self._rows
+
+    async def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+
+class ConexaoAsyncFalsa:
+    def __init__(self, responder):
+        self.responder = responder
+
+    def cursor(self):
+        return CursorAsyncFalso(self.responder)
+
+
+def test_disponibilidade_no_router_async_antes_de_crm():
+    # Mesma ordem do main.py com DB_MODE=async: o router async vem antes do síncrono.
+    app = FastAPI()
+    app.include_router(crud_medico.router_disponibilidade_async, prefix="/medicos")
+    app.include_router(crud_medico.router_async, prefix="/medicos")
+    app.include_router(crud_medico.router_disponibilidade, prefix="/medicos")
+    app.include_router(crud_medico.router, prefix="/medicos")
+    leituras_versoes = []
+
+    def responder(sql, params):
+        if "versao_tabela" in sql:
+            leituras_versoes.append(params[0])
+            return [("consulta", 3), ("medico", 2)]
+        return [("CRM1", "Ana", datetime(2026, 1, 5, 8)), ("CRM2", "Bia", None)]
+
+    async def get_db_async():
+        yield ConexaoAsyncFalsa(responder)
+
+    app.dependency_overrides[db_async.get_db_async] = get_db_async
+    resposta = TestClient(app).get("/medicos/disponibilidade", params={
+        "especialidade": "Cardiologia", "inicio": "2026-01-05T00:00", "fim": "2026-01-06T00:00",
+    })
+
+    assert resposta.status_code == 200
+    assert resposta.json() == [
+        {"crm": "CRM1", "nome": "Ana", "livres": [
+            {"inicio": "2026-01-05T07:00:00", "fim": "2026-01-05T08:00:00"},
+            {"inicio": "2026-01-05T08:30:00", "fim": "2026-01-05T19:00:00"},
+        ]},
+        {"crm": "CRM2", "nome": "Bia", "livres": [
+            {"inicio": "2026-01-05T07:00:00", "fim": "2026-01-05T19:00:00"},
+        ]},
+    ]
+    assert "etag" in resposta.headers
+    assert leituras_versoes == [["consulta", "medico"]]
+
+
+def test_disponibilidade_le_as_versoes_uma_vez(client, conexao):
+    conexao.versoes = {"medico": 2, "consulta": 3}
+
+    resposta = client.get("/medicos/disponibilidade", params={
+        "especialidade": "Cardiologia", "inicio": "2026-01-05T00:00", "fim": "2026-01-06T00:00",
+    })
+
+    assert resposta.status_code == 200
+    assert conexao.leituras_versoes == 1
+    conexao.versoes["consulta"] = 4
+    resposta = client.get("/medicos/disponibilidade", params={
+        "especialidade": "Cardiologia", "inicio": "2026-01-05T00:00", "fim": "2026-01-06T00:00",
+    }, headers={"If-None-Match": resposta.headers["etag"]})
+    assert resposta.status_code == 200
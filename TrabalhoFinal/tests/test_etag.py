@@ -0,0 +1,110 @@
+import pytest
+
+import etag
+import main
+import replica
+from cache import cache_relatorios
+
+
+def medicos(sql, params):
+    return [(f"CRM{i:07d}", f"Médico {i}", "Cardiologia") for i in range(3)]
+
+
+@pytest.fixture
+def leitura_real(conexao):
+    # Sem o override: o get_db_leitura do handler reaproveita a conexão aberta pela ETag.
+    del main.app.dependency_overrides[replica.get_db_leitura]
+    return conexao
+
+
+def test_304_nao_executa_o_handler(client, leitura_real):
+    leitura_real.versoes = {"medico": 5}
+    leitura_real.responder = medicos
+
+    primeira = client.get("/medicos/")
+    tag = primeira.headers["etag"]
+    segunda = client.get("/medicos/", headers={"If-None-Match": tag})
+
+    assert primeira.status_code == 200
+    assert segunda.status_code == 304
+    assert segunda.headers["etag"] == tag
+    assert len(leitura_real.executados) == 1
+    assert leitura_real.leituras_versoes == 2
+
+
+def test_escrita_de_outro_processo_muda_a_etag(client, leitura_real):
+    leitura_real.versoes = {"medico": 5}
+    leitura_real.responder = medicos
+    tag = client.get("/medicos/").headers["etag"]
+
+    leitura_real.versoes["medico"] += 1
+    resposta = client.get("/medicos/", headers={"If-None-Match": tag})
+
+    assert resposta.status_code == 200
+    assert resposta.headers["etag"] != tag
+
+
+def test_escrita_nao_le_versoes(client, conexao):
+    conexao.responder = lambda sql, params: [("CRM1", "Ana", "Cardiologia")]
+
+    resposta = client.post("/medicos/", json={"crm": "CRM1", "nome": "Ana", "especialidade": "Cardiologia"})
+
+    assert resposta.status_code == 201
+    assert "etag" not in resposta.headers
+    assert conexao.leituras_versoes == 0
+
+
+def test_etag_por_codificacao(client, leitura_real):
+    leitura_real.versoes = {"medico": 1}
+    leitura_real.responder = lambda sql, params: [(f"CRM{i:07d}", "Nome " * 20, "Cardiologia") for i in range(50)]
+
+    comprimida = client.get("/medicos/", headers={"Accept-Encoding": "gzip"})
+    original = client.get("/medicos/", headers={"Accept-Encoding": "identity"})
+
+    assert comprimida.headers["content-encoding"] == "gzip"
+    assert "content-encoding" not in original.headers
+    assert comprimida.headers["etag"] == original.headers["etag"][:-1] + '-gzip"'
+    revalidada = client.get("/medicos/", headers={"Accept-Encoding": "gzip", "If-None-Match": comprimida.headers["etag"]})
+    assert revalidada.status_code == 304
+    assert revalidada.headers["etag"] == comprimida.headers["etag"]
+
+
+def test_cache_de_relatorio_segue_a_versao_do_banco(client, leitura_real):
+    cache_relatorios.limpar()
+    leitura_real.versoes = {"agendamento": 1}
+    leitura_real.responder = lambda sql, params: [("Marcada", 3)]
+
+    client.get("/relatorios/agendamentos-por-status")
+    client.get("/relatorios/agendamentos-por-status")
+    assert len(leitura_real.executados) == 1
+
+    # Escrita feita fora deste processo: nenhuma invalidação local, só a versão mudou.
+    leitura_real.versoes["agendamento"] += 1
+    client.get("/relatorios/agendamentos-por-status")
+    assert len(leitura_real.executados) == 2
+    cache_relatorios.limpar()
+
+
+def test_gatilhos_no_banco_somam_a_versao_e_mudam_a_etag(client_banco, banco):
+    def versao():
+        return etag.ler_versoes(banco, ["medico"])[0][1]
+
+    inicial = versao()
+    tag = client_banco.get("/medicos/").headers["etag"]
+
+    criado = client_banco.post("/medicos/", json={"crm": "CRM1", "nome": "Ana", "especialidade": "Cardiologia"})
+    pela_api = versao()
+    cursor = banco.cursor()
+    cursor.execute("UPDATE Medico SET nome = 'Ana Maria' WHERE crm = 'CRM1'")
+    banco.rollback()
+    desfeita = versao()
+    cursor.execute("UPDATE Medico SET nome = 'Ana Maria' WHERE crm = 'CRM1'")
+    banco.commit()
+    de_fora = versao()
+    segunda = client_banco.get("/medicos/", headers={"If-None-Match": tag})
+
+    assert criado.status_code == 201
+    assert (pela_api, desfeita, de_fora) == (inicial + 1, inicial + 1, inicial + 2)
+    assert segunda.status_code == 200
+    assert segunda.headers["etag"] != tag
+    assert client_banco.get("/medicos/", headers={"If-None-Match": segunda.headers["etag"]}).status_code == 304
@@ -0,0 +1,64 @@
+import json
+
+import psycopg2
+import pytest
+
+import lote
+
+
+@pytest.fixture
+def insercoes(monkeypatch):
+    # Simula o banco: recusa qualquer INSERT que traga um nome com mais de 100 caracteres.
+    chamadas = []
+
+    def execute_values(cursor, sql, linhas, page_size, fetch):
+        chamadas.append(len(linhas))
+        if any(len(linha[0]) > 100 for linha in linhas):
+            raise psycopg2.errors.StringDataRightTruncation("value too long for type character varying(100)")
+        return [(1000 + int(linha[4]), linha[4]) for linha in linhas]
+
+    monkeypatch.setattr(lote, "execute_values", execute_values)
+    monkeypatch.setattr(lote, "BULK_PAGE_SIZE", 3)
+    return chamadas
+
+
+def paciente(cpf, nome="Fulano"):
+    return {"nome": nome, "data_nascimento": "1990-01-01", "sexo": "F", "cpf": cpf}
+
+
+def test_erro_do_banco_fica_na_linha_e_o_lote_segue(client, conexao, insercoes):
+    itens = [paciente(f"{i:011d}") for i in range(6)]
+    itens[4] = paciente("00000000004", nome="x" * 101)
+
+    resposta = client.post("/pacientes/bulk", json=itens)
+
+    assert resposta.status_code == 200
+    corpo = resposta.json()
+    assert [c["indice"] for c in corpo["criados"]] == [0, 1, 2, 3, 5]
+    assert corpo["erros"] == [{"indice": 4, "detalhe": "value too long for type character varying(100)"}]
+    assert conexao.commits == 1
+    # Primeiro bloco inteiro; o segundo falha e é refeito linha a linha.
+    assert insercoes == [3, 3, 1, 1, 1]
+    savepoints = [sql for sql, _ in conexao.executados if "SAVEPOINT" in sql]
+    assert savepoints.count("ROLLBACK TO SAVEPOINT lote") == 2
+
+
+def test_ndjson_acima_do_limite_de_linhas_da_413(client, conexao, monkeypatch):
+    monkeypatch.setattr(lote, "BULK_MAX_ROWS", 2)
+    linhas = [json.dumps(paciente(f"{i:011d}")) for i in range(4)]
+    # A última linha fica pela metade: o limite tem de valer antes de ela ser lida.
+    corpo = "\n".join(linhas)[:-10]
+
+    resposta = client.post("/pacientes/bulk", content=corpo, headers={"Content-Type": "application/x-ndjson"})
+
+    assert resposta.status_code == 413
+    assert conexao.commits == 0
+
+
+def test_array_acima_do_limite_de_bytes_da_413(client, conexao, monkeypatch):
+    monkeypatch.setattr(lote, "BULK_MAX_BYTES", 100)
+
+    resposta = client.post("/pacientes/bulk", json=[paciente(f"{i:011d}") for i in range(3)])
+
+    assert resposta.status_code == 413
+    assert conexao.commits == 0
@@ -0,0 +1,36 @@
+from datetime import date
+
+import pytest
+
+
+def linha_paciente(id_paciente):
+    telefones = [
+        {"numero": f"1199999{id_paciente:04d}", "tipo": "Celular"},
+        {"numero": f"1133333{id_paciente:04d}", "tipo": "Residencial"},
+    ]
+    return (id_paciente, f"Paciente {id_paciente}", date(1980, 1, 1), "F", None, f"{id_paciente:011d}", telefones)
+
+
+@pytest.mark.parametrize("total", [1, 50])
+def test_listar_pacientes_uma_consulta_independente_do_total(client, conexao, total):
+    conexao.responder = lambda sql, params: [linha_paciente(i) for i in range(1, total + 1)]
+
+    resposta = client.get("/pacientes/", params={"limit": 100})
+
+    assert resposta.status_code == 200
+    itens = resposta.json()["items"]
+    assert len(itens) == total
+    assert all(len(p["telefones"]) == 2 for p in itens)
+    assert len(conexao.executados) == 1
+
+
+@pytest.mark.parametrize("telefones", [0, 1, 20])
+def test_obter_paciente_uma_consulta_independente_dos_telefones(client, conexao, telefones):
+    linha = linha_paciente(7)[:6] + ([{"numero": f"11{i:09d}", "tipo": "Celular"} for i in range(telefones)],)
+    conexao.responder = lambda sql, params: [linha]
+
+    resposta = client.get("/pacientes/7")
+
+    assert resposta.status_code == 200
+    assert len(resposta.json()["telefones"]) == telefones
+    assert len(conexao.executados) == 1
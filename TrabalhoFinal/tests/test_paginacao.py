@@ -0,0 +1,43 @@
+from datetime import datetime
+
+
+def paciente(i):
+    return {"nome": f"Paciente {i}", "data_nascimento": "1990-01-01", "sexo": "F", "cpf": f"{i:011d}"}
+
+
+def percorrer(client, url, chave, **params):
+    # Segue next_cursor até a última página e devolve a chave de cada item, na ordem.
+    ids, cursor = [], None
+    while True:
+        resposta = client.get(url, params={**params, "cursor": cursor} if cursor else params)
+        assert resposta.status_code == 200
+        pagina = resposta.json()
+        ids += [item[chave] for item in pagina["items"]]
+        cursor = pagina["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+def test_keyset_percorre_pacientes_sem_repetir(client_banco):
+    criados = [client_banco.post("/pacientes/", json=paciente(i)).json()["id_paciente"] for i in range(7)]
+
+    assert percorrer(client_banco, "/pacientes/", "id_paciente", limit=3) == sorted(criados)
+
+
+def test_keyset_por_data_desempata_pela_chave(client_banco, banco):
+    id_paciente = client_banco.post("/pacientes/", json=paciente(1)).json()["id_paciente"]
+    cursor = banco.cursor()
+    # Várias linhas na mesma data: a página só anda certo se o cursor levar a chave inteira.
+    datas = [datetime(2026, 1, 5, 8)] * 4 + [datetime(2026, 1, 5, 9)] * 3
+    for data in datas:
+        cursor.execute(
+            "INSERT INTO Agendamento (id_paciente, data, status) VALUES (%s, %s, 'Marcada') RETURNING id_agendamento",
+            (id_paciente, data)
+        )
+    banco.commit()
+    cursor.execute("SELECT id_agendamento FROM Agendamento ORDER BY data, id_agendamento")
+    esperados = [r[0] for r in cursor.fetchall()]
+
+    ids = percorrer(client_banco, "/agendamentos/", "id_agendamento", limit=2, inicio="2026-01-05T00:00:00", fim="2026-01-06T00:00:00")
+
+    assert ids == esperados
@@ -0,0 +1,86 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import db
+import main
+import preparadas
+import replica
+from conftest import ConexaoFalsa
+
+
+class PoolFalso:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def getconn(self):
+        return self.conn
+
+    def putconn(self, conn):
+        pass
+
+
+def medicos(origem):
+    return lambda sql, params: [("CRM1", f"Médico da {origem}", "Cardiologia")]
+
+
+@pytest.fixture
+def bancos(monkeypatch):
+    # Réplica atrasada: ainda na versão 4 de Medico, a primária já está na 5.
+    primaria = ConexaoFalsa(medicos("primária"))
+    primaria.versoes = {"medico": 5}
+    copia = ConexaoFalsa(medicos("réplica"))
+    copia.versoes = {"medico": 4}
+
+    def get_db():
+        yield primaria
+
+    monkeypatch.setattr(preparadas.preparadas, "ativo", False)
+    monkeypatch.setattr(replica, "REPLICA_URL", "replica")
+    monkeypatch.setattr(replica, "get_db", get_db)
+    monkeypatch.setattr(replica, "get_pool_replica", lambda: PoolFalso(copia))
+    monkeypatch.setattr(replica.monitor, "disponivel", lambda: True)
+    main.app.dependency_overrides[db.get_db] = lambda: primaria
+    yield primaria, copia
+    main.app.dependency_overrides.clear()
+
+
+def test_leitura_na_replica_leva_a_versao_da_replica(bancos):
+    primaria, copia = bancos
+    client = TestClient(main.app)
+
+    na_replica = client.get("/medicos/")
+    na_primaria = client.get("/medicos/", headers={"X-Ultima-Escrita": f"{time.time() + 2:.3f}"})
+
+    assert na_replica.json()["items"][0]["nome"] == "Médico da réplica"
+    assert na_primaria.json()["items"][0]["nome"] == "Médico da primária"
+    # A ETag vem do mesmo servidor que os dados: a réplica não recebe a versão 5.
+    assert na_replica.headers["etag"] != na_primaria.headers["etag"]
+    assert copia.leituras_versoes == 1 and len(copia.executados) == 1
+    assert primaria.leituras_versoes == 1 and len(primaria.executados) == 1
+
+
+def test_escrita_devolve_o_prazo_de_read_your_writes(bancos):
+    primaria, _ = bancos
+    primaria.responder = lambda sql, params: [("CRM2", "Bia", "Pediatria")]
+    client = TestClient(main.app)
+
+    resposta = client.post("/medicos/", json={"crm": "CRM2", "nome": "Bia", "especialidade": "Pediatria"})
+
+    ate = float(resposta.headers[replica.HEADER_ESCRITA])
+    assert time.time() < ate <= time.time() + replica.READ_YOUR_WRITES
+
+
+@pytest.mark.parametrize("valor, esperado", [
+    (lambda: f"{time.time() + 1:.3f}", True),
+    (lambda: f"{time.time() - 1:.3f}", False),
+    (lambda: f"{time.time() + 3600:.3f}", False),
+    (lambda: "abc", False),
+])
+def test_escreveu_recentemente_pelo_header(valor, esperado):
+    class Requisicao:
+        headers = {replica.HEADER_ESCRITA: valor()}
+        cookies = {}
+
+    assert replica.escreveu_recentemente(Requisicao()) is esperado
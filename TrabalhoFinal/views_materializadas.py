@@ -0,0 +1,190 @@
+from datetime import datetime, timezone
+from fastapi import Response
+from alteracoes import ao_alterar, notificar_alteracao
+from db import get_pool
+from psycopg2 import errors
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+VIEWS = {
+    "categoria_paciente": {"Paciente", "Agendamento"},
+    "ultimo_agendamento_paciente": {"Paciente", "Telefone_Paciente", "Agendamento"},
+    "consultas_encaminhamentos": {"Medico", "Paciente", "Consulta", "Encaminhamento"},
+    "exames_consultas_por_paciente": {"Paciente", "Consulta", "Encaminhamento", "Encaminhamento_Exame", "Exame"},
+}
+
+def _intervalo(view):
+    padrao = os.getenv("MV_REFRESH_INTERVAL", "300")
+    return float(os.getenv("MV_REFRESH_INTERVAL_" + view.upper(), padrao))
+
+
+class EstadoView:
+    def __init__(self, nome, intervalo):
+        self.nome = nome
+        self.intervalo = intervalo
+        self.concurrently = True
+        self.pendente = True
+        self.ultima_escrita = 0.0
+        self.ultimo_refresh = None
+        self.ultimo_refresh_monotonic = None
+        self.duracao = None
+        self.erro = None
+        self.lock = threading.Lock()
+
+    def to_dict(self):
+        return {
+            "view": self.nome,
+            "intervalo_s": self.intervalo,
+            "concurrently": self.concurrently,
+            "pendente": self.pendente,
+            "last_refreshed_at": self.ultimo_refresh.isoformat() if self.ultimo_refresh else None,
+            "staleness_s": self.staleness(),
+            "duracao_ms": round(self.duracao * 1000, 1) if self.duracao is not None else None,
+            "erro": self.erro,
+        }
+
+    def staleness(self):
+        if self.ultimo_refresh_monotonic is None:
+            return None
+        return round(time.monotonic() - self.ultimo_refresh_monotonic, 1)
+
+
+class RefreshScheduler:
+    def __init__(self, views=VIEWS, debounce=None, tick=None):
+        self.debounce = debounce if debounce is not None else float(os.getenv("MV_REFRESH_DEBOUNCE", "30"))
+        self.tick = tick if tick is not None else float(os.getenv("MV_REFRESH_TICK", "5"))
+        self.dependencias = views
+        self.estados = {nome: EstadoView(nome, _intervalo(nome)) for nome in views}
+        self._parar = threading.Event()
+        self._thread = None
+
+    def marcar_alteracao(self, tabelas):
+        agora = time.monotonic()
+        for nome, dependencias in self.dependencias.items():
+            if dependencias.intersection(tabelas):
+                estado = self.estados[nome]
+                estado.pendente = True
+                estado.ultima_escrita = agora
+
+    def vencida(self, estado):
+        # Só atualiza views com escritas desde o último refresh, respeitando o
+        # intervalo da view. Espera as escritas ficarem quietas por `debounce`
+        # segundos, mas nunca além de duas vezes o intervalo.
+        if not estado.pendente:
+            return False
+        if estado.ultimo_refresh_monotonic is None:
+            return True
+        agora = time.monotonic()
+        decorrido = agora - estado.ultimo_refresh_monotonic
+        if decorrido < estado.intervalo:
+            return False
+        return agora - estado.ultima_escrita >= self.debounce or decorrido >= 2 * estado.intervalo
+
+    def refresh(self, nome, conn=None):
+        estado = self.estados[nome]
+        with estado.lock:
+            pool = None
+            if conn is None:
+                pool = get_pool()
+                conn = pool.getconn()
+            try:
+                self._executar_refresh(conn, estado)
+            finally:
+                if pool is not None:
+                    pool.putconn(conn)
+        return estado.to_dict()
+
+    def _executar_refresh(self, conn, estado):
+        estado.pendente = False
+        inicio = time.monotonic()
+        cursor = conn.cursor()
+        try:
+            if estado.concurrently:
+                try:
+                    cursor.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {estado.nome}")
+                except errors.ObjectNotInPrerequisiteState:
+                    # Sem índice único (ou ainda não populada): usa o refresh bloqueante.
+                    conn.rollback()
+                    estado.concurrently = False
+            if not estado.concurrently:
+                cursor.execute(f"REFRESH MATERIALIZED VIEW {estado.nome}")
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            estado.pendente = True
+            estado.erro = str(e)
+            logger.warning("Falha ao atualizar a view %s: %s", estado.nome, e)
+            raise
+        finally:
+            cursor.close()
+        self._incrementar_versao(conn, estado.nome)
+        estado.erro = None
+        estado.duracao = time.monotonic() - inicio
+        estado.ultimo_refresh = datetime.now(timezone.utc)
+        estado.ultimo_refresh_monotonic = inicio
+        notificar_alteracao(estado.nome)
+
+    def _incrementar_versao(self, conn, nome):
+        # Muda a ETag dos relatórios que leem a view (etag.py). Fica depois do
+        # commit do refresh: no intervalo entre os dois, um GET vê dados novos
+        # com a versão antiga, e a ETag só muda um pouco depois, nunca antes.
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT incrementar_versao(%s)", (nome,))
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.warning("Falha ao incrementar a versão da view %s: %s", nome, e)
+        finally:
+            cursor.close()
+
+    def _loop(self):
+        while not self._parar.is_set():
+            for nome, estado in self.estados.items():
+                if self._parar.is_set():
+                    break
+                if self.vencida(estado):
+                    try:
+                        self.refresh(nome)
+                    except Exception:
+                        logger.exception("refresh de %s falhou", nome)
+            self._parar.wait(self.tick)
+
+    def start(self):
+        if self._thread is None:
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._loop, name="refresh-views", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.tick + 1)
+            self._thread = None
+
+    def estado(self, nome=None):
+        if nome is not None:
+            return self.estados[nome].to_dict()
+        return [e.to_dict() for e in self.estados.values()]
+
+
+scheduler = RefreshScheduler()
+
+@ao_alterar
+def _marcar_views(tabelas):
+    scheduler.marcar_alteracao(tabelas)
+
+def headers_staleness(response, nome):
+    estado = scheduler.estados[nome]
+    if estado.ultimo_refresh is not None:
+        response.headers["X-Last-Refreshed-At"] = estado.ultimo_refresh.isoformat()
+        response.headers["X-Staleness-Seconds"] = str(estado.staleness())
+
+def staleness(nome):
+    def dependencia(response: Response):
+        headers_staleness(response, nome)
+    return dependencia